@@ -0,0 +1,145 @@
+"""
+Search benchmark: nodes, nodes per second and time to each depth over fixed positions
+
+Each position is searched through Game.minimax one depth at a time, the way iterative
+deepening would, so the transposition table carries over between depths. Results are
+printed as a table and written as JSON with the machine details, so runs on the Pi and
+the x86 host can be compared across versions.
+
+Run with:
+    python -m src.checkers_game.benchmark --depth 10 --output bench.json
+"""
+import argparse
+import json
+import platform
+import sys
+from time import perf_counter
+from .game import Game
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+# Positions in the custom layout format, with the color to move
+POSITIONS = [
+    {'name': 'start', 'mode': 'classic', 'layout': None, 'color': 'red'},
+    {'name': 'opening', 'mode': 'custom', 'color': 'red',
+     'layout': ['BA4', 'BA6', 'BA8', 'BC8', 'BD7', 'BE8', 'BF7', 'BG6', 'BG8', 'BH7',
+                'RA2', 'RB1', 'RC2', 'RD1', 'RD5', 'RE2', 'RF1', 'RG2', 'RG4', 'RH1']},
+    {'name': 'middlegame', 'mode': 'custom', 'color': 'red',
+     'layout': ['BA4', 'BA6', 'BA8', 'BB5', 'BB7', 'BD5', 'BF7', 'BG8', 'BH7',
+                'RA2', 'RB1', 'RB3', 'RC2', 'RD3', 'RF3', 'RF5', 'RG2', 'RH3']},
+    {'name': 'kings', 'mode': 'custom', 'color': 'red',
+     'layout': ['BA4', 'BA6', 'BA8', 'BB1K', 'BC8', 'BH1K', 'BH5', 'RA2', 'RD3']},
+    {'name': 'default', 'mode': 'custom', 'color': 'red',
+     'layout': ['RE2', 'BD3K', 'BB5', 'BB7', 'BD7', 'BF5']},
+]
+
+
+def peak_memory_mb():
+    """
+    Get the peak resident memory of this process
+
+    Returns:
+        float: Peak memory in megabytes, or None if the platform does not report it
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+
+def benchmark_position(position, max_depth, table_size_mb=16):
+    """
+    Search one position to each depth up to max_depth
+
+    Args:
+        position, dict: The position (name, mode, layout, color)
+        max_depth, int: The deepest search
+        table_size_mb, float: Memory for the transposition table in megabytes
+
+    Returns:
+        list of dicts: One result per depth (depth, nodes, quiescence nodes, seconds, nodes per second, cumulative seconds, score, move)
+    """
+    layout = position['layout'] or []
+    game = Game(board_mode=position['mode'], layout=layout, start_player=position['color'],
+                table_size_mb=table_size_mb, sinks=[])
+    board = game.board.to_bitboard()
+    results = []
+    total = 0.0
+    for depth in range(1, max_depth + 1):
+        start = perf_counter()
+        score, move = game.minimax(depth, board)
+        elapsed = perf_counter() - start
+        total += elapsed
+        nodes = game.engine.nodes
+        results.append({
+            'depth': depth,
+            'nodes': nodes,
+            'qnodes': game.engine.qnodes,
+            'seconds': round(elapsed, 6),
+            'nps': round(nodes / elapsed) if elapsed > 0 else None,
+            'time_to_depth': round(total, 6),
+            'score': score,
+            'move': list(move[3]) if move is not None else None,
+        })
+    return results
+
+
+def run(max_depth, table_size_mb=16, names=None):
+    """
+    Run the benchmark over the fixed positions
+
+    Args:
+        max_depth, int: The deepest search for each position
+        table_size_mb, float: Memory for the transposition table in megabytes
+        names, list of str: Only run these positions, None for all
+
+    Returns:
+        dict: Machine details, per-position results and totals
+    """
+    report = {
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'max_depth': max_depth,
+        'table_size_mb': table_size_mb,
+        'positions': {},
+    }
+    total_nodes = 0
+    total_seconds = 0.0
+    for position in POSITIONS:
+        if names and position['name'] not in names:
+            continue
+        results = benchmark_position(position, max_depth, table_size_mb)
+        report['positions'][position['name']] = results
+        total_nodes += sum(result['nodes'] for result in results)
+        total_seconds += results[-1]['time_to_depth']
+    report['total_nodes'] = total_nodes
+    report['total_seconds'] = round(total_seconds, 6)
+    report['nps'] = round(total_nodes / total_seconds) if total_seconds > 0 else None
+    report['peak_memory_mb'] = peak_memory_mb()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Minimax search over fixed positions")
+    parser.add_argument('--depth', type=int, default=10, help="Deepest search for each position")
+    parser.add_argument('--table-mb', type=float, default=16, help="Transposition table size in megabytes")
+    parser.add_argument('--positions', nargs='+', help="Only run these positions: " + ", ".join(p['name'] for p in POSITIONS))
+    parser.add_argument('--output', help="JSON file for the results")
+    args = parser.parse_args()
+
+    report = run(args.depth, args.table_mb, args.positions)
+    print(f"{'position':<12}{'depth':>6}{'nodes':>12}{'seconds':>10}{'nodes/s':>12}{'to depth':>10}")
+    for name, results in report['positions'].items():
+        for result in results:
+            print(f"{name:<12}{result['depth']:>6}{result['nodes']:>12}{result['seconds']:>10.3f}"
+                  f"{result['nps'] or 0:>12}{result['time_to_depth']:>10.3f}")
+    print(f"Total: {report['total_nodes']} nodes in {report['total_seconds']:.2f}s, "
+          f"{report['nps']} nodes/s, peak memory {report['peak_memory_mb']} MB")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,526 @@
+"""
+Bitboard representation of a checkers position
+
+Only the 32 dark squares are playable, so every piece type fits in a 32-bit mask.
+Squares are numbered row by row from the top of the board (row 0, red's back rank):
+    square = row * 4 + col // 2
+
+    row 0:     0   1   2   3     (cols 1, 3, 5, 7)
+    row 1:   4   5   6   7       (cols 0, 2, 4, 6)
+    ...
+    row 7:   28  29  30  31      (cols 0, 2, 4, 6)
+
+Red men move down the board (increasing row), black men move up (decreasing row).
+Moves and jumps are generated for all pieces of a color at once by shifting the
+masks one step in each diagonal direction.
+"""
+from .zobrist import PIECE_KEYS, RED_MAN, RED_KING, BLACK_MAN, BLACK_KING, hash_masks
+from .evaluation import SQUARE_SCORES, score_masks
+
+FULL_MASK = 0xFFFFFFFF
+RED_PROMOTION_MASK = 0xF0000000 # Row 7, red men are crowned here
+BLACK_PROMOTION_MASK = 0x0000000F # Row 0, black men are crowned here
+
+# Diagonal directions as (row step, col step)
+UP_LEFT = (-1, -1)
+UP_RIGHT = (-1, 1)
+DOWN_LEFT = (1, -1)
+DOWN_RIGHT = (1, 1)
+DIRECTIONS = (UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT)
+RED_MAN_DIRECTIONS = (DOWN_LEFT, DOWN_RIGHT)
+BLACK_MAN_DIRECTIONS = (UP_LEFT, UP_RIGHT)
+
+
+def location_to_square(row, col):
+    """
+    Convert a board location to a dark square index
+
+    Args:
+        row, int: The row of the board (0-7)
+        col, int: The column of the board (0-7)
+
+    Returns:
+        int: The square index (0-31)
+    """
+    return row * 4 + col // 2
+
+
+def square_to_location(square):
+    """
+    Convert a dark square index to a board location
+
+    Args:
+        square, int: The square index (0-31)
+
+    Returns:
+        tuple: (row, col) of the square
+    """
+    row = square // 4
+    return row, (square % 4) * 2 + (1 if row % 2 == 0 else 0)
+
+
+def _build_step_tables(direction, distance):
+    """
+    Build the shift table and neighbor table for a direction
+
+    Squares on even and odd rows shift by different amounts, so each direction
+    needs one (source mask, shift) pair per row parity. Squares whose step
+    would leave the board are left out of the masks.
+
+    Args:
+        direction, tuple: (row step, col step)
+        distance, int: Number of diagonal steps (1 for moves, 2 for jump landings)
+
+    Returns:
+        shifts, tuple: ((source mask, shift), ...) where a positive shift moves bits up
+        neighbors, tuple: The destination square for each square, or -1 if off the board
+    """
+    masks = {}
+    neighbors = []
+    for square in range(32):
+        row, col = square_to_location(square)
+        dest_row, dest_col = row + direction[0] * distance, col + direction[1] * distance
+        if 0 <= dest_row < 8 and 0 <= dest_col < 8:
+            shift = location_to_square(dest_row, dest_col) - square
+            masks[shift] = masks.get(shift, 0) | (1 << square)
+            neighbors.append(square + shift)
+        else:
+            neighbors.append(-1)
+    return tuple((mask, shift) for shift, mask in masks.items()), tuple(neighbors)
+
+
+STEP_SHIFTS = {}
+NEIGHBORS = {}
+for _direction in DIRECTIONS:
+    STEP_SHIFTS[_direction], NEIGHBORS[_direction] = _build_step_tables(_direction, 1)
+
+
+def shift_mask(bits, direction):
+    """
+    Move every set bit one diagonal step in a direction, dropping bits that leave the board
+
+    Args:
+        bits, int: The mask to shift
+        direction, tuple: (row step, col step)
+
+    Returns:
+        int: The shifted mask
+    """
+    result = 0
+    for mask, shift in STEP_SHIFTS[direction]:
+        if shift > 0:
+            result |= (bits & mask) << shift
+        else:
+            result |= (bits & mask) >> -shift
+    return result
+
+
+def iterate_squares(bits):
+    """
+    Yield the square index of every set bit in a mask
+
+    Args:
+        bits, int: The mask to iterate
+    """
+    while bits:
+        low_bit = bits & -bits
+        yield low_bit.bit_length() - 1
+        bits ^= low_bit
+
+
+class BitBoard:
+    def __init__(self, red_men=0, red_kings=0, black_men=0, black_kings=0, hash=None, score=None):
+        """
+        Initialize a bitboard from four 32-bit piece masks
+
+        Args:
+            red_men, int: Mask of red men
+            red_kings, int: Mask of red kings
+            black_men, int: Mask of black men
+            black_kings, int: Mask of black kings
+            hash, int: The Zobrist hash of the pieces if already known, computed otherwise
+            score, int: The piece-square score for red if already known, computed otherwise
+        """
+        self.red_men = red_men
+        self.red_kings = red_kings
+        self.black_men = black_men
+        self.black_kings = black_kings
+        self.hash = hash_masks(red_men, red_kings, black_men, black_kings) if hash is None else hash
+        self.score = score_masks(red_men, red_kings, black_men, black_kings) if score is None else score
+
+    @property
+    def red(self):
+        """
+        Mask of all red pieces
+        """
+        return self.red_men | self.red_kings
+
+    @property
+    def black(self):
+        """
+        Mask of all black pieces
+        """
+        return self.black_men | self.black_kings
+
+    @property
+    def occupied(self):
+        """
+        Mask of all occupied squares
+        """
+        return self.red_men | self.red_kings | self.black_men | self.black_kings
+
+    @property
+    def empty(self):
+        """
+        Mask of all empty squares
+        """
+        return ~self.occupied & FULL_MASK
+
+    # Counts mirror the attributes on Board so Game.evaluate works on either
+    @property
+    def red_count(self):
+        return (self.red_men | self.red_kings).bit_count()
+
+    @property
+    def black_count(self):
+        return (self.black_men | self.black_kings).bit_count()
+
+    @property
+    def red_king_count(self):
+        return self.red_kings.bit_count()
+
+    @property
+    def black_king_count(self):
+        return self.black_kings.bit_count()
+
+    def color_masks(self, color):
+        """
+        Get the masks for a color and its opponent
+
+        Args:
+            color, str: 'red' or 'black'
+
+        Returns:
+            men, int: Mask of the color's men
+            kings, int: Mask of the color's kings
+            opponents, int: Mask of all opponent pieces
+        """
+        if color == 'red':
+            return self.red_men, self.red_kings, self.black_men | self.black_kings
+        return self.black_men, self.black_kings, self.red_men | self.red_kings
+
+    def _movers(self, color):
+        """
+        Pair each direction with the pieces of a color that may step in it
+
+        Args:
+            color, str: 'red' or 'black'
+
+        Returns:
+            list of tuples: (direction, mask of pieces)
+        """
+        men, kings, _ = self.color_masks(color)
+        if color == 'red':
+            forward, backward = RED_MAN_DIRECTIONS, BLACK_MAN_DIRECTIONS
+        else:
+            forward, backward = BLACK_MAN_DIRECTIONS, RED_MAN_DIRECTIONS
+        return [(direction, men | kings) for direction in forward] + [(direction, kings) for direction in backward]
+
+    def find_moves(self, color):
+        """
+        Get all simple (non-capturing) moves for a color
+
+        Args:
+            color, str: 'red' or 'black'
+
+        Returns:
+            list of tuples: (source square, destination square, captured mask, path) with captured mask 0
+        """
+        empty = self.empty
+        moves = []
+        for direction, pieces in self._movers(color):
+            if not pieces:
+                continue
+            neighbors = NEIGHBORS[direction]
+            # Keep the pieces whose next square in this direction is empty
+            for src in iterate_squares(pieces & _step_back(empty, direction)):
+                moves.append((src, neighbors[src], 0, (src, neighbors[src])))
+        return moves
+
+    def find_jumps(self, color):
+        """
+        Get all single jumps for a color
+
+        Args:
+            color, str: 'red' or 'black'
+
+        Returns:
+            list of tuples: (source square, destination square, captured mask, path)
+        """
+        _, _, opponents = self.color_masks(color)
+        empty = self.empty
+        jumps = []
+        for direction, pieces in self._movers(color):
+            if not pieces:
+                continue
+            # A piece can jump if the next square holds an opponent and the one after is empty
+            landing_ok = _step_back(empty, direction) & opponents
+            jumpers = pieces & _step_back(landing_ok, direction)
+            neighbors = NEIGHBORS[direction]
+            for src in iterate_squares(jumpers):
+                over = neighbors[src]
+                jumps.append((src, neighbors[over], 1 << over, (src, neighbors[over])))
+        return jumps
+
+    def find_capture_sequences(self, color):
+        """
+        Get every complete capture sequence for a color
+        A sequence continues while the piece can keep jumping and ends when a man is crowned
+
+        Args:
+            color, str: 'red' or 'black'
+
+        Returns:
+            list of tuples: (source square, destination square, captured mask, path) where path
+                lists every square the piece lands on, starting with the source
+        """
+        men, kings, opponents = self.color_masks(color)
+        men_directions = RED_MAN_DIRECTIONS if color == 'red' else BLACK_MAN_DIRECTIONS
+        promotion_mask = RED_PROMOTION_MASK if color == 'red' else BLACK_PROMOTION_MASK
+        sequences = []
+        for src, dst, captured, path in self.find_jumps(color):
+            king = (kings >> src) & 1
+            if not king and (1 << dst) & promotion_mask:
+                sequences.append((src, dst, captured, path))
+                continue
+            # The moving piece has left its source square, jumped pieces stay until the move ends
+            empty = self.empty | (1 << src)
+            self._extend_capture(dst, captured, path, DIRECTIONS if king else men_directions,
+                                 0 if king else promotion_mask, opponents, empty, sequences)
+        return sequences
+
+    def _extend_capture(self, square, captured, path, directions, promotion_mask, opponents, empty, sequences):
+        """
+        Follow every continuation of a capture sequence, adding the finished sequences
+
+        Args:
+            square, int: The square the piece has landed on
+            captured, int: Mask of the pieces captured so far
+            path, tuple: The squares landed on so far, starting with the source
+            directions, tuple: The directions the piece can jump in
+            promotion_mask, int: Squares where a man is crowned, 0 for kings
+            opponents, int: Mask of opponent pieces
+            empty, int: Mask of empty squares
+            sequences, list: The list the finished sequences are added to
+        """
+        extended = False
+        for direction in directions:
+            over = NEIGHBORS[direction][square]
+            if over < 0 or not (opponents >> over) & 1 or (captured >> over) & 1:
+                continue
+            land = NEIGHBORS[direction][over]
+            if land < 0 or not (empty >> land) & 1:
+                continue
+            extended = True
+            if (1 << land) & promotion_mask:
+                # Crowning ends the move
+                sequences.append((path[0], land, captured | (1 << over), path + (land,)))
+            else:
+                self._extend_capture(land, captured | (1 << over), path + (land,), directions,
+                                     promotion_mask, opponents, empty, sequences)
+        if not extended:
+            sequences.append((path[0], square, captured, path))
+
+    def find_legal_moves(self, color):
+        """
+        Get the legal moves for a color
+        Captures are mandatory, so if any capture exists only complete capture sequences are returned
+
+        Args:
+            color, str: 'red' or 'black'
+
+        Returns:
+            list of tuples: (source square, destination square, captured mask, path)
+        """
+        sequences = self.find_capture_sequences(color)
+        if sequences:
+            return sequences
+        return self.find_moves(color)
+
+    def find_moves_and_jumps(self, color):
+        """
+        Get all simple moves and single jumps for a color, without the forced-capture rule
+
+        Args:
+            color, str: 'red' or 'black'
+
+        Returns:
+            list of tuples: (source square, destination square, captured mask, path)
+        """
+        return self.find_moves(color) + self.find_jumps(color)
+
+    def can_jump(self, color):
+        """
+        Check whether any piece of a color has a jump available
+
+        Args:
+            color, str: 'red' or 'black'
+
+        Returns:
+            bool: True if at least one jump is available
+        """
+        _, _, opponents = self.color_masks(color)
+        empty = self.empty
+        for direction, pieces in self._movers(color):
+            if pieces & _step_back(_step_back(empty, direction) & opponents, direction):
+                return True
+        return False
+
+    def move_piece(self, move):
+        """
+        Apply a move in place, removing captured pieces and crowning men on the back rank
+        The Zobrist hash and the piece-square score are updated along with the masks
+        Assuming the move to be made is already validated
+
+        Args:
+            move, tuple: (source square, destination square, captured mask, path)
+        """
+        src, dst, captured = move[0], move[1], move[2]
+        src_bit = 1 << src
+        dst_bit = 1 << dst
+        if self.red_men & src_bit:
+            self.red_men ^= src_bit
+            source_kind = RED_MAN
+            if dst_bit & RED_PROMOTION_MASK:
+                self.red_kings |= dst_bit
+                dest_kind = RED_KING
+            else:
+                self.red_men |= dst_bit
+                dest_kind = RED_MAN
+        elif self.red_kings & src_bit:
+            self.red_kings ^= src_bit | dst_bit
+            source_kind = dest_kind = RED_KING
+        elif self.black_men & src_bit:
+            self.black_men ^= src_bit
+            source_kind = BLACK_MAN
+            if dst_bit & BLACK_PROMOTION_MASK:
+                self.black_kings |= dst_bit
+                dest_kind = BLACK_KING
+            else:
+                self.black_men |= dst_bit
+                dest_kind = BLACK_MAN
+        else:
+            self.black_kings ^= src_bit | dst_bit
+            source_kind = dest_kind = BLACK_KING
+        self.hash ^= PIECE_KEYS[source_kind][src] ^ PIECE_KEYS[dest_kind][dst]
+        self.score += SQUARE_SCORES[dest_kind][dst] - SQUARE_SCORES[source_kind][src]
+
+        # Remove captured pieces, only the opponent's masks can contain them
+        if captured:
+            for kind, mask in enumerate((self.red_men, self.red_kings, self.black_men, self.black_kings)):
+                for square in iterate_squares(mask & captured):
+                    self.hash ^= PIECE_KEYS[kind][square]
+                    self.score -= SQUARE_SCORES[kind][square]
+            keep = ~captured
+            self.red_men &= keep
+            self.red_kings &= keep
+            self.black_men &= keep
+            self.black_kings &= keep
+
+    def make_move(self, move):
+        """
+        Make a move in place and return a record that undoes it exactly
+
+        The four masks fully describe the position, so the record is just their
+        previous values, hash and score: captured pieces and promotions come back with them.
+
+        Args:
+            move, tuple: (source square, destination square, captured mask, path)
+
+        Returns:
+            tuple: The undo record (red men, red kings, black men, black kings, hash, score)
+        """
+        record = (self.red_men, self.red_kings, self.black_men, self.black_kings, self.hash, self.score)
+        self.move_piece(move)
+        return record
+
+    def unmake_move(self, record):
+        """
+        Restore the position from before make_move
+
+        Args:
+            record, tuple: The undo record returned by make_move
+        """
+        self.red_men, self.red_kings, self.black_men, self.black_kings, self.hash, self.score = record
+
+    def get_piece(self, row, col):
+        """
+        Get the piece at a given location
+
+        Args:
+            row, int: The row of the piece
+            col, int: The column of the piece
+
+        Returns:
+            tuple: (color, king) or None if the square is empty
+        """
+        if (row + col) % 2 == 0:
+            return None
+        bit = 1 << location_to_square(row, col)
+        if self.red_men & bit: return ('red', False)
+        if self.red_kings & bit: return ('red', True)
+        if self.black_men & bit: return ('black', False)
+        if self.black_kings & bit: return ('black', True)
+        return None
+
+    def clone(self) -> 'BitBoard':
+        """
+        Create a copy of the bitboard
+
+        Returns:
+            board, BitBoard: A copy of the bitboard
+        """
+        return BitBoard(self.red_men, self.red_kings, self.black_men, self.black_kings, self.hash, self.score)
+
+    def draw_board(self):
+        """
+        Display the board in the terminal, in the same format as Board.draw_board
+        """
+        print("  A B C D E F G H")
+        for row in range(8):
+            print(row + 1, end=" ")
+            for col in range(8):
+                piece = self.get_piece(row, col)
+                if piece is None:
+                    print(".", end=" ")
+                else:
+                    letter = piece[0][0]
+                    print(letter.upper() if piece[1] else letter, end=" ")
+            print()
+
+    def __eq__(self, other):
+        return (self.red_men, self.red_kings, self.black_men, self.black_kings) == \
+            (other.red_men, other.red_kings, other.black_men, other.black_kings)
+
+
+def _step_back(bits, direction):
+    """
+    Shift a mask one step against a direction
+
+    Args:
+        bits, int: The mask to shift
+        direction, tuple: The direction being reversed
+
+    Returns:
+        int: The shifted mask
+    """
+    return shift_mask(bits, (-direction[0], -direction[1]))
+
+
+if __name__ == "__main__":
+    # Example usage: the classic starting position
+    red_men = sum(1 << square for square in range(12))
+    black_men = sum(1 << square for square in range(20, 32))
+    board = BitBoard(red_men=red_men, black_men=black_men)
+    board.draw_board()
+    print(len(board.find_legal_moves('red')), "moves for red")  # Output: 7 moves for red
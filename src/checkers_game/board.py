@@ -1,6 +1,12 @@
 from .piece import Piece
+from .bitboard import BitBoard, location_to_square, square_to_location, iterate_squares
+from .zobrist import PIECE_KEYS, piece_type
+from .evaluation import SQUARE_SCORES
 
 class Board:
+    debug = False # Verify the piece indexes against a full board scan after every move
+    sinks = () # Event sinks told about moves, captures and promotions made by move_piece
+
     def __init__(self, mode='classic', layout=['RB1', 'RD1', 'BA8', 'BC8K']):
         """
         Initialize the board with pieces in starting positions
@@ -10,6 +16,8 @@ class Board:
         self.red_king_count = 0
         self.black_king_count = 0
         self.board, self.pieces = self.create_board(layout=mode, custom_layout=layout)
+        self.hash = self.compute_hash() # Zobrist hash of the pieces, kept up to date by every move
+        self.score = self.compute_score() # Piece-square score for red, kept up to date by every move
         self.store_piece_locations()
         
     def create_board(self, layout='classic', custom_layout=['RB1', 'RD1', 'BA8', 'BC8K']):
@@ -67,16 +75,34 @@ class Board:
     
     def store_piece_locations(self):
         """
-        Store piece locations in a list for easy access, especially by AI
+        Rebuild the piece location indexes from a full scan of the board, and each piece's index in the list of pieces
+        Moves keep the indexes up to date incrementally, so this is only needed after bulk changes
+
+        Attributes:
+            piece_locations: Set of occupied (row, col) squares
+            color_pieces: For each color, a dict of (row, col) to the piece on that square
+        """
+        for index, piece in enumerate(self.pieces):
+            piece.index = index
+        self.piece_locations = set()
+        self.color_pieces = {'red': {}, 'black': {}}
+        for row in range(8):
+            for col in range(8):
+                if self.board[row][col] is not None:
+                    self._index_piece(self.board[row][col])
+        if self.debug:
+            self.check_consistency()
+
+    def check_consistency(self):
+        """
+        Check that the piece list and location indexes agree with the board, raise ValueError if not
         """
-        self.piece_locations = []
-        num_pieces = 0
+        piece_locations = []
         for row in range(8):
             for col in range(8):
                 if self.board[row][col] is not None:
                     # print("Piece found: ", self.get_piece(row, col))
-                    self.piece_locations.append((row, col))
-                    num_pieces += 1
+                    piece_locations.append((row, col))
                     if self.get_piece(row, col) not in self.pieces:
                         print("Piece not found in pieces list")
                         print("Piece: ", self.get_piece(row, col))
@@ -85,12 +111,86 @@ class Board:
                         raise ValueError("Piece not found in pieces list")
         
         #check to see if the piece list is the same as the piece locations
-        if len(self.piece_locations) != len(self.pieces):
+        if len(piece_locations) != len(self.pieces):
             print("Piece locations and pieces list lengths are not the same")
-            print("Piece Locations: ", self.piece_locations)
+            print("Piece Locations: ", piece_locations)
             print("Pieces: ")
             self.print_pieces()
-            raise ValueError("Piece locations and pieces list lengths are not the same, piece locations: " + str(len(self.piece_locations)) + " pieces: " + str(len(self.pieces)))
+            raise ValueError("Piece locations and pieces list lengths are not the same, piece locations: " + str(len(piece_locations)) + " pieces: " + str(len(self.pieces)))
+
+        #check the incremental indexes against the scan
+        indexed = {location: piece for color in self.color_pieces for location, piece in self.color_pieces[color].items()}
+        if self.piece_locations != set(piece_locations) or any(indexed.get(location) is not self.board[location[0]][location[1]] for location in piece_locations):
+            raise ValueError("Piece location indexes do not match the board")
+        if any(piece.index != index for index, piece in enumerate(self.pieces)):
+            raise ValueError("Piece list indexes do not match the list of pieces")
+
+        #check the incremental score against a full recount
+        if self.score != self.compute_score():
+            raise ValueError("Board score " + str(self.score) + " does not match the pieces, expected " + str(self.compute_score()))
+
+    def _index_piece(self, piece):
+        """
+        Add a piece to the location indexes, call with the piece on its square
+
+        Args:
+            piece, Piece: The piece to add
+        """
+        location = piece.get_location()
+        self.piece_locations.add(location)
+        self.color_pieces[piece.color][location] = piece
+
+    def _unindex_piece(self, piece):
+        """
+        Remove a piece from the location indexes, call with the piece on its square
+
+        Args:
+            piece, Piece: The piece to remove
+        """
+        location = piece.get_location()
+        self.piece_locations.discard(location)
+        self.color_pieces[piece.color].pop(location, None)
+
+    def compute_hash(self):
+        """
+        Compute the Zobrist hash of the pieces from scratch
+
+        Returns:
+            int: The 64-bit hash, matching BitBoard.hash for the same position
+        """
+        key = 0
+        for piece in self.pieces:
+            key ^= PIECE_KEYS[piece_type(piece.color, piece.get_king())][location_to_square(*piece.get_location())]
+        return key
+
+    def _toggle_hash(self, piece):
+        """
+        Add or remove a piece's key from the hash, call with the piece on its square
+
+        Args:
+            piece, Piece: The piece entering or leaving its square
+        """
+        self.hash ^= PIECE_KEYS[piece_type(piece.color, piece.get_king())][location_to_square(*piece.get_location())]
+
+    def compute_score(self):
+        """
+        Compute the piece-square score from scratch
+
+        Returns:
+            int: The score for red, matching BitBoard.score for the same position
+        """
+        return sum(SQUARE_SCORES[piece_type(piece.color, piece.get_king())][location_to_square(*piece.get_location())]
+                   for piece in self.pieces)
+
+    def _update_score(self, piece, change):
+        """
+        Add or remove a piece's value from the score, call with the piece on its square
+
+        Args:
+            piece, Piece: The piece entering or leaving its square
+            change, int: 1 if the piece is arriving, -1 if it is leaving
+        """
+        self.score += change * SQUARE_SCORES[piece_type(piece.color, piece.get_king())][location_to_square(*piece.get_location())]
 
     def draw_board(self):
         """
@@ -120,20 +220,11 @@ class Board:
             dest_row, int: The row to move the piece to
             dest_col, int: The column to move the piece to
         """
-        #make sure the piece is in the list of pieces
-        flag = False
-        #make sure the piece is in the list of pieces
-        for other_piece in self.pieces:
-            if other_piece == piece:
-                flag = True
-                #check if they are the same piece object
-                if other_piece is not piece:
-                    #set the piece to the piece in the list
-                    # print("Piece object mismatch")
-                    piece = other_piece
-                break
-
-        if not flag:
+        #make sure the piece is on the board, and use the board's own piece object
+        stored_piece = self.board[piece.location[0]][piece.location[1]]
+        if stored_piece is not None and stored_piece.color == piece.color:
+            piece = stored_piece
+        else:
             print("Piece: ", piece)
             print("Piece List: ")
             self.print_pieces()
@@ -141,6 +232,10 @@ class Board:
             raise ValueError("Tried to move a piece not found in list of pieces")
             
         jumped = False
+        start = piece.get_location()
+        if self.sinks:
+            for sink in self.sinks:
+                sink.on_move(piece.color, start, (dest_row, dest_col))
 
         # Check if the move is a jump
         jump_directions = piece.get_potential_jump_directions()
@@ -153,13 +248,14 @@ class Board:
                 # print("jump_directions: ", jump_directions)
                 # print(piece, "attempting to jump over", over_row, over_col)
                 # print("Jumped over", self.get_piece(over_row, over_col))
-                self.remove_piece(self.get_piece(over_row, over_col), remove_from_list=True)
+                captured = self.get_piece(over_row, over_col)
+                self.remove_piece(captured, remove_from_list=True)
+                if self.sinks:
+                    for sink in self.sinks:
+                        sink.on_capture(captured.color, (over_row, over_col))
 
-                # Update the count of pieces
-                if piece.color == 'red':
-                    self.black_count -= 1
-                else:
-                    self.red_count -= 1
+                # Update the count of pieces, captured kings included
+                self._update_counts(captured, -1)
 
                 jumped = True
 
@@ -167,21 +263,28 @@ class Board:
         self.remove_piece(piece)
         piece.move(dest_row, dest_col)
         self.board[dest_row][dest_col] = piece
+        self._index_piece(piece)
 
         # Check for king promotion
+        promoted = False
         if (piece.color == 'red' and dest_row == 7) or (piece.color == 'black' and dest_row == 0):
             #if it is not already a king update king counts
             if not piece.get_king():
                 if piece.color == 'red': self.red_king_count += 1
                 if piece.color == 'black': self.black_king_count += 1
                 piece.promote_to_king()
-
-        # update piece locations
-        self.store_piece_locations()
-        # print("Finished moving piece and storing piece locations")
-
-        # check for extra jumps if a jump was made
-        if jumped:
+                promoted = True
+                if self.sinks:
+                    for sink in self.sinks:
+                        sink.on_promotion(piece.color, (dest_row, dest_col))
+        self._toggle_hash(piece)
+        self._update_score(piece, 1)
+
+        if self.debug:
+            self.check_consistency()
+
+        # check for extra jumps if a jump was made, being crowned ends the move
+        if jumped and not promoted:
             valid_jumps = self.find_valid_jumps(piece)
             if len(valid_jumps) > 0:
                 piece.extra_jump = True
@@ -201,19 +304,11 @@ class Board:
             dest_row, int: The row the piece will be moved back to
             dest_col, int: The column the piece will be moved back to
         """
-        flag = False
-        #make sure the piece is in the list of pieces
-        for other_piece in self.pieces:
-            if other_piece == piece:
-                flag = True
-                #check if they are the same piece object
-                if other_piece is not piece:
-                    #set the piece to the piece in the list
-                    # print("Piece object mismatch")
-                    piece = other_piece
-                break
-
-        if not flag:
+        #make sure the piece is on the board, and use the board's own piece object
+        stored_piece = self.board[piece.location[0]][piece.location[1]]
+        if stored_piece is not None and stored_piece.color == piece.color:
+            piece = stored_piece
+        else:
             print("Piece not found in list of pieces")
             print("Piece: ", piece)
             print("Piece List: ")
@@ -222,6 +317,7 @@ class Board:
                 
         #if the piece was promoted to a king, demote it
         if piece.get_king():
+            self._update_counts(piece, -1, kings_only=True)
             piece.demote_from_king()
 
         old_location = piece.get_location()
@@ -237,14 +333,155 @@ class Board:
         self.remove_piece(piece)
         piece.move(dest_row, dest_col)
         self.board[dest_row][dest_col] = piece
+        self._index_piece(piece)
         # print("Moved back: ", piece, " from ", old_location, " to ", piece.get_location())
 
-        # Update piece locations
-        self.store_piece_locations()
+        # The piece was demoted on its square so rehash and rescore from scratch
+        self.hash = self.compute_hash()
+        self.score = self.compute_score()
+        if self.debug:
+            self.check_consistency()
         # print("Finished undoing move")
 
         return piece
 
+    def make_move(self, piece, dest_row, dest_col):
+        """
+        Make a move in place and return a record that undoes it exactly
+        Assuming the move to be made is already validated
+
+        Unlike move_piece this does not rescan the board, and unlike undo_move the
+        record keeps the captured piece itself, so kings and list order come back unchanged.
+        A captured piece is swapped with the last in the list of pieces and popped, so a capture costs O(1).
+
+        Args:
+            piece, Piece: The piece to move, must be the object stored on this board
+            dest_row, int: The row to move the piece to
+            dest_col, int: The column to move the piece to
+
+        Returns:
+            tuple: The undo record (piece, start location, captured piece, captured index, promoted, previous extra jump, previous hash, previous score)
+        """
+        start_row, start_col = piece.get_location()
+        previous_extra_jump = piece.extra_jump
+        previous_hash = self.hash
+        previous_score = self.score
+        captured = None
+        captured_index = -1
+
+        # Remove the jumped piece, remembering where it sat in the list of pieces
+        if abs(dest_row - start_row) == 2:
+            captured = self.board[(start_row + dest_row) // 2][(start_col + dest_col) // 2]
+            captured_index = captured.index
+            self._toggle_hash(captured)
+            self._update_score(captured, -1)
+            last = self.pieces.pop()
+            if last is not captured:
+                self.pieces[captured_index] = last
+                last.index = captured_index
+            self.board[captured.location[0]][captured.location[1]] = None
+            self._unindex_piece(captured)
+            self._update_counts(captured, -1)
+
+        # Move the piece
+        self._toggle_hash(piece)
+        self._update_score(piece, -1)
+        self.board[start_row][start_col] = None
+        self._unindex_piece(piece)
+        piece.move(dest_row, dest_col)
+        self.board[dest_row][dest_col] = piece
+        self._index_piece(piece)
+
+        # Check for king promotion
+        promoted = False
+        if not piece.get_king() and ((piece.color == 'red' and dest_row == 7) or (piece.color == 'black' and dest_row == 0)):
+            piece.promote_to_king()
+            self._update_counts(piece, 1, kings_only=True)
+            promoted = True
+        self._toggle_hash(piece)
+        self._update_score(piece, 1)
+
+        # Check for extra jumps if a jump was made, being crowned ends the move
+        piece.extra_jump = captured is not None and not promoted and len(self.find_valid_jumps(piece)) > 0
+        if self.debug:
+            self.check_consistency()
+
+        return (piece, (start_row, start_col), captured, captured_index, promoted, previous_extra_jump, previous_hash, previous_score)
+
+    def unmake_move(self, record):
+        """
+        Restore the position from before make_move
+
+        Args:
+            record, tuple: The undo record returned by make_move
+        """
+        piece, start, captured, captured_index, promoted, previous_extra_jump, previous_hash, previous_score = record
+        self.hash = previous_hash
+        self.score = previous_score
+
+        # Undo the promotion
+        if promoted:
+            self._update_counts(piece, -1, kings_only=True)
+            piece.demote_from_king()
+
+        # Move the piece back
+        dest_row, dest_col = piece.get_location()
+        self.board[dest_row][dest_col] = None
+        self._unindex_piece(piece)
+        piece.move(start[0], start[1])
+        self.board[start[0]][start[1]] = piece
+        self._index_piece(piece)
+        piece.extra_jump = previous_extra_jump
+
+        # Put the captured piece back where it was, and the piece swapped into its place back at the end
+        if captured is not None:
+            if captured_index < len(self.pieces):
+                last = self.pieces[captured_index]
+                last.index = len(self.pieces)
+                self.pieces.append(last)
+                self.pieces[captured_index] = captured
+            else:
+                self.pieces.append(captured)
+            self.board[captured.location[0]][captured.location[1]] = captured
+            self._index_piece(captured)
+            self._update_counts(captured, 1)
+
+        if self.debug:
+            self.check_consistency()
+
+    def _update_counts(self, piece, change, kings_only=False):
+        """
+        Adjust the piece and king counts for a piece entering or leaving the board
+
+        Args:
+            piece, Piece: The piece being counted
+            change, int: 1 if the piece was added, -1 if it was removed
+            kings_only, bool: Whether to only adjust the king count (for promotions)
+        """
+        if piece.color == 'red':
+            if not kings_only: self.red_count += change
+            if piece.get_king(): self.red_king_count += change
+        else:
+            if not kings_only: self.black_count += change
+            if piece.get_king(): self.black_king_count += change
+
+    def find_legal_moves(self, color):
+        """
+        Get every legal move for a color, with whole capture sequences as single moves
+        Captures are mandatory, so if any piece can capture only capture sequences are returned
+
+        Args:
+            color, str: The color to move
+
+        Returns:
+            legal_moves, list of tuples: (piece, path) where path is the list of (row, col) squares the piece lands on
+        """
+        legal_moves = []
+        for move in self.to_bitboard().find_legal_moves(color.lower()):
+            row, col = square_to_location(move[0])
+            legal_moves.append((self.board[row][col], [square_to_location(square) for square in move[3][1:]]))
+        return legal_moves
+
     def find_valid_moves_and_jumps(self, piece, only_jumps=False):
         """
         Get a list of all valid moves and jumps for a given piece
@@ -288,16 +525,7 @@ class Board:
 
         # Remove invalid moves
         # see if the location being moved to is empty, if not remove it
-        i = 0
-        while i < len(valid_moves):
-            if valid_moves[i] in self.piece_locations:
-                valid_moves.remove(valid_moves[i])
-                i -= 1
-                if i >= len(valid_moves):
-                    break
-            i += 1
-                
-        return valid_moves
+        return [move for move in valid_moves if move not in self.piece_locations]
     
     def find_valid_jumps(self, piece):
         """
@@ -322,27 +550,8 @@ class Board:
             valid_jumps.append((new_row, new_col))
 
         # Remove invalid jumps
-        # see if the location being jumped to is empty, if not remove it
-        i = 0
-        while i < len(valid_jumps):
-            if valid_jumps[i] in self.piece_locations:
-                valid_jumps.remove(valid_jumps[i])
-                i -= 1
-                if i >= len(valid_jumps):
-                    break
-            i += 1
-        
-        # search other pieces to see if jump is valid
-        i = 0
-        while i < len(valid_jumps):
-            if not self.is_valid_jump(piece, valid_jumps[i][0], valid_jumps[i][1]):
-                valid_jumps.remove(valid_jumps[i])
-                i -= 1
-                if i >= len(valid_jumps):
-                    break
-            i += 1
-
-        return valid_jumps
+        # the location being jumped to must be empty, and the piece jumped over must be an opponent's
+        return [jump for jump in valid_jumps if jump not in self.piece_locations and self.is_valid_jump(piece, jump[0], jump[1])]
 
     def is_valid_jump(self, piece, jump_row, jump_col):
         """
@@ -384,25 +593,21 @@ class Board:
             color_pieces, list: A list of all pieces for the given color
         """
         color = color.lower() # Ensure the color is lowercase
-        color_pieces = []
-
-        for piece in self.pieces:
-            if piece.color == color:
-                color_pieces.append(piece)
-
-        return color_pieces
+        return list(self.color_pieces[color].values())
     
     def remove_all_pieces(self):
         """
         Remove all pieces from the board
         """
-        for piece in self.pieces:
+        for piece in list(self.pieces):
             self.remove_piece(piece, remove_from_list=True)
         self.pieces = []
         self.red_count = 0
         self.black_count = 0
         self.red_king_count = 0
         self.black_king_count = 0
+        self.hash = 0
+        self.score = 0
         self.store_piece_locations()
 
     def remove_piece(self, piece, remove_from_list=False):
@@ -418,16 +623,24 @@ class Board:
 
         # Remove the piece from the board
         self.board[piece_location[0]][piece_location[1]] = None
+        self._unindex_piece(piece)
+        self._toggle_hash(piece)
+        self._update_score(piece, -1)
 
         # Remove the piece from the list of pieces
         if remove_from_list:
-            try: self.pieces.remove(piece) # Remove the piece from the list of pieces
-            except ValueError:
-                print ("Piece not found in list of pieces")
-                print ("Piece: ", piece)
-                print ("Piece List: ")
-                self.print_pieces()
-                quit()
+            index = piece.index
+            if not (0 <= index < len(self.pieces) and self.pieces[index] is piece):
+                try: index = self.pieces.index(piece) # An equal piece that is not the board's own object
+                except ValueError:
+                    print ("Piece not found in list of pieces")
+                    print ("Piece: ", piece)
+                    print ("Piece List: ")
+                    self.print_pieces()
+                    quit()
+            del self.pieces[index]
+            for index in range(index, len(self.pieces)):
+                self.pieces[index].index = index
 
     def add_piece(self, piece):
         """
@@ -448,15 +661,16 @@ class Board:
 
         # Add the piece to the board
         self.board[piece_location[0]][piece_location[1]] = piece
+        self._index_piece(piece)
+        self._toggle_hash(piece)
+        self._update_score(piece, 1)
 
         # Add the piece to the list of pieces
+        piece.index = len(self.pieces)
         self.pieces.append(piece)
 
-        #update piece color counts
-        if piece.color == 'red':
-            self.red_count += 1
-        else:
-            self.black_count += 1
+        #update piece color and king counts
+        self._update_counts(piece, 1)
         # print("Restored: ", piece)
         return True
 
@@ -489,15 +703,57 @@ class Board:
         Returns:
             board, Board: A deep copy of the board
         """
-        new_board = Board()
-        new_board.board = [row[:] for row in self.board]
+        new_board = Board(mode='empty')
         new_board.pieces = [p.clone() for p in self.pieces]
+        for piece in new_board.pieces:
+            new_board.board[piece.location[0]][piece.location[1]] = piece
         new_board.red_count = self.red_count
         new_board.black_count = self.black_count
+        new_board.red_king_count = self.red_king_count
+        new_board.black_king_count = self.black_king_count
+        new_board.hash = self.hash
+        new_board.score = self.score
         new_board.store_piece_locations()
         # print("Finished cloning??")
         return new_board
 
+    def to_bitboard(self) -> BitBoard:
+        """
+        Pack the pieces into a bitboard for fast move generation and search
+
+        Returns:
+            bitboard, BitBoard: The position as four 32-bit masks
+        """
+        masks = {('red', False): 0, ('red', True): 0, ('black', False): 0, ('black', True): 0}
+        for piece in self.pieces:
+            row, col = piece.get_location()
+            masks[(piece.color, piece.get_king())] |= 1 << location_to_square(row, col)
+        return BitBoard(red_men=masks[('red', False)], red_kings=masks[('red', True)],
+                        black_men=masks[('black', False)], black_kings=masks[('black', True)], hash=self.hash, score=self.score)
+
+    @classmethod
+    def from_bitboard(cls, bitboard) -> 'Board':
+        """
+        Build a board of Piece objects from a bitboard
+
+        Args:
+            bitboard, BitBoard: The position to unpack
+
+        Returns:
+            board, Board: A board holding the same pieces
+        """
+        board = cls(mode='empty')
+        for color, men, kings in (('red', bitboard.red_men, bitboard.red_kings),
+                                  ('black', bitboard.black_men, bitboard.black_kings)):
+            for mask, king in ((men, False), (kings, True)):
+                for square in iterate_squares(mask):
+                    piece = Piece(color, square_to_location(square))
+                    if king:
+                        piece.promote_to_king()
+                        piece.crown()
+                    board.add_piece(piece)
+        return board
+
 if __name__ == "__main__":
     layout = ['RE2', 'BD3K', 'BB5', 'BB7', 'BD7', 'BF5']
     game_board = Board(mode='custom', custom_layout=layout)
@@ -0,0 +1,146 @@
+"""
+Run AI turns off the main thread
+
+The robot's turn used to be strictly sequential: search, then start the smack talk, then
+send the move to the arm and wait. With an EngineWorker the search runs on a background
+thread and the caller gets a Future straight away, so it can start the audio (or anything
+else that does not touch the board) while the search finishes, and only wait for the
+move when it needs it.
+
+The game must not be touched from other threads until the future is done. A Minimax
+search, serial or parallel, can be cancelled while it runs: it stops within a few
+thousand nodes and the future raises CancelledError without a move being played. An
+MCTS search stops the same way after its current batch of playouts. The other
+difficulties are quick and can only be cancelled before they start.
+
+    worker = EngineWorker()
+    future = worker.submit(game, difficulty="Minimax", time_limit_ms=2000)
+    voice_clone.play_premade_audio()
+    message = future.result()
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class EngineWorker:
+    def __init__(self):
+        """
+        Start the worker thread
+
+        Attributes:
+            executor: The single-thread executor the turns run on, one at a time in submission order
+        """
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='engine')
+        self.stop_events = {} # Future to the stop event of its search
+
+    def submit(self, game, **kwargs):
+        """
+        Start an AI turn in the background
+
+        Args:
+            game, Game: The game to move in, left alone by the caller until the future is done
+            kwargs: Arguments for Game.ai_turn, e.g. difficulty and time_limit_ms
+
+        Returns:
+            Future: Resolves to the move string ai_turn returns, e.g. 'A3 B4'
+        """
+        stop_event = threading.Event()
+        future = self.executor.submit(self._run, game, stop_event, kwargs)
+        self.stop_events[future] = stop_event
+        future.add_done_callback(lambda done: self.stop_events.pop(done, None))
+        return future
+
+    def _run(self, game, stop_event, kwargs):
+        """
+        Play the AI turn on the worker thread, with the search listening to the stop event
+
+        Args:
+            game, Game: The game to move in
+            stop_event, threading.Event: Set to cancel the search
+            kwargs: Arguments for Game.ai_turn
+
+        Returns:
+            str: The move ai_turn returns
+        """
+        game.engine.stop_event = stop_event
+        try:
+            return game.ai_turn(**kwargs)
+        finally:
+            game.engine.stop_event = None
+
+    def cancel(self, future):
+        """
+        Cancel an AI turn, before it starts or while its Minimax or MCTS search runs
+
+        Args:
+            future, Future: The future returned by submit
+
+        Returns:
+            bool: False if the turn had already finished, True otherwise
+        """
+        if future.cancel():
+            return True
+        stop_event = self.stop_events.get(future)
+        if stop_event is None:
+            return False
+        stop_event.set()
+        return True
+
+    async def ai_turn(self, game, **kwargs):
+        """
+        Play an AI turn in the background from asyncio code
+
+        Args:
+            game, Game: The game to move in
+            kwargs: Arguments for Game.ai_turn
+
+        Returns:
+            str: The move ai_turn returns
+        """
+        future = self.submit(game, **kwargs)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # The awaiting task was cancelled, stop the search too
+            self.cancel(future)
+            raise
+
+    def shutdown(self, cancel=True):
+        """
+        Stop the worker thread
+
+        Args:
+            cancel, bool: Whether to cancel turns that are queued or running instead of waiting for them
+        """
+        if cancel:
+            for future in list(self.stop_events):
+                self.cancel(future)
+        self.executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    from time import perf_counter, sleep
+    from concurrent.futures import CancelledError
+    from .game import Game
+
+    game = Game(board_mode='classic', sinks=[])
+    worker = EngineWorker()
+
+    # Overlap a search with other work
+    start = perf_counter()
+    future = worker.submit(game, difficulty="Minimax", time_limit_ms=1000, use_book=False)
+    sleep(0.5) # Stand-in for starting audio and moving the arm
+    print(f"Moved {future.result()} after {perf_counter() - start:.2f}s")
+
+    # Cancel a long search part way through
+    game.switch_turn()
+    start = perf_counter()
+    future = worker.submit(game, difficulty="Minimax", minimax_depth=30, use_book=False)
+    sleep(0.2)
+    worker.cancel(future)
+    try:
+        future.result()
+    except CancelledError:
+        print(f"Cancelled after {perf_counter() - start:.2f}s, board untouched")
+    worker.shutdown()
@@ -0,0 +1,111 @@
+"""
+Static evaluation of checkers positions for the game-tree search
+
+Scores are always from the point of view of the given color, and the score for one
+color is the negation of the score for the other, as negamax requires.
+
+A position's score is the sum of a piece-square value for every piece: material plus
+a bonus for where the piece stands. Boards keep that sum up to date as pieces move,
+are captured and are crowned, so evaluating a leaf is a lookup instead of a scan.
+"""
+
+MAN_VALUE = 100 # Value of an uncrowned piece
+KING_VALUE = 300 # Value of a king
+WIN_SCORE = 100000 # Score of a won position, larger than any material score
+
+# Bonus for a red man on each row: holding the back rank, then advancing towards the crown
+MAN_ROW_BONUS = (5, 0, 1, 3, 5, 8, 12, 0)
+MAN_CENTER_BONUS = 2 # Men on the middle four columns, rows 2-5
+KING_CENTER_BONUS = 6 # Kings away from the edges, inner 4x4
+KING_INNER_BONUS = 3 # Kings one square in from the edge
+
+
+def _square_location(square):
+    row = square // 4
+    return row, (square % 4) * 2 + (1 if row % 2 == 0 else 0)
+
+
+def _red_man_value(square):
+    row, col = _square_location(square)
+    value = MAN_VALUE + MAN_ROW_BONUS[row]
+    if 2 <= row <= 5 and 2 <= col <= 5:
+        value += MAN_CENTER_BONUS
+    return value
+
+
+def _king_value(square):
+    row, col = _square_location(square)
+    edge_distance = min(row, col, 7 - row, 7 - col)
+    if edge_distance >= 2:
+        return KING_VALUE + KING_CENTER_BONUS
+    if edge_distance == 1:
+        return KING_VALUE + KING_INNER_BONUS
+    return KING_VALUE
+
+
+# Signed piece-square values indexed like the Zobrist piece types (red man, red king, black man, black king)
+# Red pieces count for red and black pieces against; black's tables are red's turned 180 degrees
+SQUARE_SCORES = (
+    tuple(_red_man_value(square) for square in range(32)),
+    tuple(_king_value(square) for square in range(32)),
+    tuple(-_red_man_value(31 - square) for square in range(32)),
+    tuple(-_king_value(31 - square) for square in range(32)),
+)
+
+
+def score_masks(red_men, red_kings, black_men, black_kings):
+    """
+    Compute the piece-square score of a position from scratch
+
+    Args:
+        red_men, int: Mask of red men
+        red_kings, int: Mask of red kings
+        black_men, int: Mask of black men
+        black_kings, int: Mask of black kings
+
+    Returns:
+        int: The score for red
+    """
+    score = 0
+    for kind, mask in enumerate((red_men, red_kings, black_men, black_kings)):
+        scores = SQUARE_SCORES[kind]
+        for square in range(32):
+            if (mask >> square) & 1:
+                score += scores[square]
+    return score
+
+
+def evaluate(board, color):
+    """
+    Evaluate a position by material and piece placement, using the score the board keeps up to date
+
+    Args:
+        board, Board or BitBoard: The position to evaluate
+        color, str: The color to score the position for
+
+    Returns:
+        int: The evaluation score, positive if the color is ahead
+    """
+    if color == 'red':
+        return board.score
+    return -board.score
+
+
+def evaluate_material(board, color):
+    """
+    Evaluate a position by material alone
+
+    Args:
+        board, Board or BitBoard: The position to evaluate
+        color, str: The color to score the position for
+
+    Returns:
+        int: The evaluation score, positive if the color is ahead
+    """
+    red_kings = board.red_king_count
+    black_kings = board.black_king_count
+    red_score = (board.red_count - red_kings) * MAN_VALUE + red_kings * KING_VALUE
+    black_score = (board.black_count - black_kings) * MAN_VALUE + black_kings * KING_VALUE
+    if color == 'red':
+        return red_score - black_score
+    return black_score - red_score
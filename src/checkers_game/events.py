@@ -0,0 +1,128 @@
+"""
+Game event sinks
+
+The board and the game report what happens (game start, turns, moves, captures,
+promotions, extra jumps, game over) to a list of sinks instead of printing. With no sinks attached the
+only cost is an empty-list check, so batch play and searches pay nothing for output.
+
+Console output is the ConsoleSink, which prints the same messages the game always has.
+EventRecorder keeps structured events for game logs. Subclass EventSink and override the
+methods you need for anything else.
+"""
+
+
+def format_location(location):
+    """
+    Format a board location in the game's notation
+
+    Args:
+        location, tuple: (row, col)
+
+    Returns:
+        str: The location, e.g. 'A3'
+    """
+    return chr(location[1] + ord('A')) + str(location[0] + 1)
+
+
+class EventSink:
+    """
+    Receives game events, every method does nothing by default
+    """
+    def on_game_start(self, position):
+        """
+        Args:
+            position, Position: The starting pieces and the color to move first
+        """
+
+    def on_turn(self, color):
+        """
+        Args:
+            color, str: The color whose turn is starting
+        """
+
+    def on_move(self, color, start, end):
+        """
+        Args:
+            color, str: The color of the piece that moved
+            start, tuple: The (row, col) the piece moved from
+            end, tuple: The (row, col) the piece moved to
+        """
+
+    def on_capture(self, color, location):
+        """
+        Args:
+            color, str: The color of the captured piece
+            location, tuple: The (row, col) it was captured on
+        """
+
+    def on_promotion(self, color, location):
+        """
+        Args:
+            color, str: The color of the crowned piece
+            location, tuple: The (row, col) it was crowned on
+        """
+
+    def on_extra_jump(self, color, location):
+        """
+        Args:
+            color, str: The color that must keep jumping
+            location, tuple: The (row, col) of the piece that must jump
+        """
+
+    def on_game_over(self, winner):
+        """
+        Args:
+            winner, str: 'red' or 'black', or None for a tie
+        """
+
+
+class ConsoleSink(EventSink):
+    """
+    Prints events to the console
+    """
+    def on_turn(self, color):
+        print(f"{color.capitalize()}'s turn")
+
+    def on_move(self, color, start, end):
+        print("Moved " + color + " piece from " + format_location(start) + " to " + format_location(end))
+
+    def on_extra_jump(self, color, location):
+        print("Extra jump available!")
+
+    def on_game_over(self, winner):
+        if winner is None:
+            print("It's a tie!")
+        else:
+            print(f"{winner.capitalize()} wins!")
+
+
+class EventRecorder(EventSink):
+    """
+    Keeps every event as a dictionary, in order
+
+    Attributes:
+        events: The list of recorded events, e.g. {'type': 'move', 'color': 'red', 'start': 'A3', 'end': 'B4'}
+    """
+    def __init__(self):
+        self.events = []
+
+    def on_game_start(self, position):
+        self.events.append({'type': 'game_start', 'position': str(position)})
+
+    def on_turn(self, color):
+        self.events.append({'type': 'turn', 'color': color})
+
+    def on_move(self, color, start, end):
+        self.events.append({'type': 'move', 'color': color, 'start': format_location(start), 'end': format_location(end)})
+
+    def on_capture(self, color, location):
+        self.events.append({'type': 'capture', 'color': color, 'location': format_location(location)})
+
+    def on_promotion(self, color, location):
+        self.events.append({'type': 'promotion', 'color': color, 'location': format_location(location)})
+
+    def on_extra_jump(self, color, location):
+        self.events.append({'type': 'extra_jump', 'color': color, 'location': format_location(location)})
+
+    def on_game_over(self, winner):
+        self.events.append({'type': 'game_over', 'winner': winner})
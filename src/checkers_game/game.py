@@ -1,19 +1,74 @@
 from .board import Board, Piece
+from .bitboard import BitBoard, square_to_location
+from .search import SearchEngine
+from .tablebase import EndgameTablebase
+from .opening_book import OpeningBook
+from .parallel import ParallelSearch
+from .mcts import MCTS
+from .events import ConsoleSink
+from .position import Position
+from .pdn import PdnRecorder
+from .evaluation import evaluate
 import random
+from concurrent.futures import CancelledError
 from time import sleep
 import openai
 import os
 
 class Game:
-    def __init__(self, board_mode="classic", layout = ['RE2', 'BD3K', 'BB5', 'BB7', 'BD7', 'BF5'], start_player='red'):
+    def __init__(self, board_mode="classic", layout = ['RE2', 'BD3K', 'BB5', 'BB7', 'BD7', 'BF5'], start_player='red', table_size_mb=16, tablebase_dir=None, book_path=None, search_processes=None, sinks=None, batch_eval=False, ponderer=None, value_net=None):
         """
         Set up the game
+
+        Args:
+            table_size_mb, float: Memory for the Minimax transposition table in megabytes, 0 to disable
+            tablebase_dir, str: Directory of endgame tables built by tablebase.py, None to play endgames by search alone
+            book_path, str: Opening book file built by opening_book.py, None to search every move
+            search_processes, int: Worker processes for parallel Minimax (defaults to the number of cores) and MCTS playouts (defaults to playing them in this process)
+            sinks, list of EventSink: Receive the game start, turns, moves, captures, promotions and game over, defaults to console output
+            batch_eval, bool: Score Minimax leaves in NumPy batches with the richer features in batch_eval.py
+            ponderer, Ponderer: Searches Minimax answers on the opponent's time, see start_pondering, None to not ponder
+            value_net, str: Value network file built by value_net.py for Minimax to evaluate leaves with (needs torch), None for the built-in evaluation
         """
         self.board = Board(mode=board_mode, layout=layout)
+        # The board reports its moves to the same list, so sinks added later see everything
+        self.sinks = [ConsoleSink()] if sinks is None else list(sinks)
+        self.board.sinks = self.sinks
         self.turn = start_player
+        if self.sinks:
+            self.notify('on_game_start', Position.from_board(self.board, start_player))
         self.opponent = 'black' if start_player == 'red' else 'red'
         self.valid_moves = {}
         self.tie = False
+        tablebase = EndgameTablebase(tablebase_dir) if tablebase_dir is not None else None
+        evaluator = None
+        if value_net is not None:
+            from .value_net import ValueNetEvaluator # Imports torch, only paid for when a network is used
+            evaluator = ValueNetEvaluator(value_net)
+        self.engine = SearchEngine(table_size_mb=table_size_mb, tablebase=tablebase, batch_eval=batch_eval, evaluator=evaluator)
+        self.book = OpeningBook(book_path) if book_path is not None else None
+        # The parallel search pool is started on first use and kept for later moves
+        self.table_size_mb = table_size_mb
+        self.tablebase_dir = tablebase_dir
+        self.search_processes = search_processes
+        self.value_net = value_net
+        self.batch_eval = batch_eval
+        self.quiescence = True # Quiescence setting of the last Minimax search, which pondering copies
+        self.parallel_engine = None
+        self.mcts = None # Started on first use, its tree is reused from move to move
+        self.ponderer = ponderer
+        self.last_search_depth = 0 # Depth the last timed Minimax search reached, the bar for reusing a pondered move
+
+    def notify(self, event, *args):
+        """
+        Send an event to every sink
+
+        Args:
+            event, str: The EventSink method to call, e.g. 'on_turn'
+            args: The event's arguments
+        """
+        for sink in self.sinks:
+            getattr(sink, event)(*args)
 
     def switch_turn(self):
         """
@@ -36,7 +91,7 @@ class Game:
             restricted_jump, tuple: piece location - since a jump occurred, the user must continue jumping with the same piece
         """
         if show_board: self.board.draw_board()
-        print(f"{self.turn.capitalize()}'s turn")
+        self.notify('on_turn', self.turn)
 
         #Get and parse user input
         while True:
@@ -75,12 +130,18 @@ class Game:
                 print("You are trying to move a " + self.board.get_piece(start_row, start_col).color + " piece.")
                 continue
 
-            #Make sure move is valid
-            valid_moves = self.board.find_valid_moves_and_jumps(self.board.get_piece(start_row, start_col), restricted_jump is not None)
+            #Make sure move is valid, captures are mandatory so the move must start a legal sequence
+            if restricted_jump is None:
+                legal_moves = self.board.find_legal_moves(self.turn)
+                valid_moves = [path[0] for legal_piece, path in legal_moves if legal_piece.get_location() == (start_row, start_col)]
+            else:
+                valid_moves = self.board.find_valid_moves_and_jumps(self.board.get_piece(start_row, start_col), only_jumps=True)
             if (dest_row, dest_col) not in valid_moves:
                 move = None
                 print("Invalid move for piece", self.board.get_piece(start_row, start_col))
                 print("Valid moves are: " + str(valid_moves))
+                if restricted_jump is None and len(valid_moves) == 0 and len(legal_moves) > 0:
+                    print("A jump is available, you must capture!")
                 continue
 
             break
@@ -90,32 +151,44 @@ class Game:
 
         # Move the piece
         self.board.move_piece(piece, dest_row, dest_col)
-        print("Moved " + piece.color + " piece from " + start + " to " + end)
 
         if piece.extra_jump:
-            print("Extra jump available!")
+            self.notify('on_extra_jump', piece.color, (dest_row, dest_col))
             self.user_turn(restricted_jump=(dest_row, dest_col))
 
-    def ai_turn(self, difficulty="Random", show_board = False, restricted_jump=None, minimax_depth=3):
+    def ai_turn(self, difficulty="Random", show_board = False, restricted_jump=None, minimax_depth=3, time_limit_ms=None, use_book=True, parallel=False, quiescence=True, mcts_playouts=None):
         """
         AI turn logic with difficulty setting
         - Random: Choose a random move
 
         Args:
             restricted_jump, tuple: since a jump occurred, the AI must continue jumping with the same piece
+            minimax_depth, int: The search depth for Minimax
+            time_limit_ms, int: Per-move time budget for Minimax and MCTS in milliseconds, replaces minimax_depth and mcts_playouts when given
+            use_book, bool: Whether Minimax plays opening book moves when the position is in the book
+            parallel, bool: Whether Minimax spreads its search over a pool of worker processes
+            quiescence, bool: Whether Minimax plays out captures past minimax_depth before evaluating, so exchanges are not cut off halfway
+            mcts_playouts, int: Playouts per move for MCTS, defaults to mcts.DEFAULT_PLAYOUTS
 
         Returns:
             str: The move in the format 'A3 B4'
         """
         # Show the board and print the current player's turn
         if show_board: self.board.draw_board()
-        print(f"{self.turn.capitalize()}'s turn")
+        self.notify('on_turn', self.turn)
 
         # Get the best move for the AI
         if difficulty == "Random":
             move = self.make_random_move()
         elif difficulty == "Minimax":
-            move = self.make_minimax_move(depth = minimax_depth)
+            # Stop pondering before the book is probed, a book move skips the search that would stop it
+            if self.ponderer is not None:
+                self.ponderer.stop()
+            move = self.make_book_move() if use_book else None
+            if move is None:
+                move = self.make_minimax_move(depth = minimax_depth, time_limit_ms = time_limit_ms, parallel = parallel, quiescence = quiescence)
+        elif difficulty == "MCTS":
+            move = self.make_mcts_move(time_limit_ms = time_limit_ms, playouts = mcts_playouts)
         elif difficulty == "Prefer Jumps":
             move = self.make_prefer_jumps()
         elif difficulty == "LLM":
@@ -123,20 +196,40 @@ class Game:
         
         return move
 
-    def make_minimax_move(self, restricted_jump=None, depth=3):
+    def make_book_move(self):
+        """
+        Play a move from the opening book if the position is in it
+
+        Returns:
+            str: The move in the format 'A3 B4', or None if there is no book move
+        """
+        if self.book is None:
+            return None
+        result = self.book.choose_move(self.board.to_bitboard(), self.turn)
+        if result is None:
+            return None
+        piece = self.board.get_piece(*square_to_location(result[0]))
+        return self.make_move_sequence(piece, [square_to_location(square) for square in result[3][1:]])
+
+    def make_minimax_move(self, restricted_jump=None, depth=3, time_limit_ms=None, parallel=False, quiescence=True):
         """
         Make a move for the AI using the minimax algorithm
 
         Args:
             restricted_jump, tuple: location - since a jump occurred, the AI must continue jumping with the same piece
+            depth, int: The depth of the search tree
+            time_limit_ms, int: Search deeper until this many milliseconds have passed instead of to a fixed depth
+            parallel, bool: Whether to search with the worker pool
+            quiescence, bool: Whether to resolve captures at the leaves
         """
-        # If no restricted jump, do a minimax search
+        # If no restricted jump, do a minimax search and play the whole move it picks
         if restricted_jump is None: 
-            score, result = self.minimax(depth, True, self.board)
+            score, result = self.minimax(depth, self.board.to_bitboard(), time_limit_ms=time_limit_ms, parallel=parallel, quiescence=quiescence)
             if result is None:
                 self.tie = True
                 return "No moves available"
-            piece, dest = result
+            piece = self.board.get_piece(*square_to_location(result[0]))
+            return self.make_move_sequence(piece, [square_to_location(square) for square in result[3][1:]])
 
         # If a restricted jump, choose the piece that must jump
         else: 
@@ -150,61 +243,139 @@ class Game:
         
         # Move the piece
         self.board.move_piece(piece, dest_row, dest_col)
-        print("Moved " + piece.color + " piece from " + chr(start_col + ord('A')) + str(start_row + 1) + " to " + chr(dest_col + ord('A')) + str(dest_row + 1))
 
         #Get move in a string (e.g., 'A3 B4')
         move = chr(start_col + ord('A')) + str(start_row + 1) + " " + chr(dest_col + ord('A')) + str(dest_row + 1)
 
         # Check if the piece can make an extra jump
         if piece.extra_jump:
-            print("Extra jump available!")
+            self.notify('on_extra_jump', piece.color, piece.get_location())
             previous_move = move
             move = self.make_minimax_move(restricted_jump=(dest_row, dest_col))
             move = previous_move + ", " + move
 
         return move
             
-    def minimax(self, depth: int, maximizing_player: bool, board: Board) -> tuple[float, tuple[Piece, tuple[int, int]]]:
+    def make_mcts_move(self, time_limit_ms=None, playouts=None):
         """
-        Minimax algorithm to find the best move for the AI
+        Make a move for the AI with Monte Carlo Tree Search, playouts are spread over search_processes workers
+        A search stopped through self.engine.stop_event raises CancelledError instead of moving, see engine_worker.py
+
+        Args:
+            time_limit_ms, int: Search until this many milliseconds have passed
+            playouts, int: Search for this many playouts, used when there is no time limit
+
+        Returns:
+            str: The move in the format 'A3 B4'
+        """
+        if self.mcts is None:
+            # No pool unless asked for, the game may itself run in a worker process (selfplay.py)
+            # Seeded from random so a game seeded through random.seed replays the same (selfplay.py)
+            self.mcts = MCTS(processes=self.search_processes or 1, seed=random.getrandbits(64))
+        # Listen to the stop event EngineWorker set on the Minimax engine, see engine_worker.py
+        self.mcts.stop_event = self.engine.stop_event
+        win_rate, result = self.mcts.search(self.board.to_bitboard(), self.turn, time_limit_ms=time_limit_ms, playouts=playouts)
+        if result is None:
+            self.tie = True
+            return "No moves available"
+        piece = self.board.get_piece(*square_to_location(result[0]))
+        return self.make_move_sequence(piece, [square_to_location(square) for square in result[3][1:]])
+
+    def minimax(self, depth: int, board: BitBoard = None, time_limit_ms: int = None, parallel: bool = False, quiescence: bool = True) -> tuple[int, tuple[int, int, int, tuple]]:
+        """
+        Alpha-beta negamax search to find the best move for the current player
+        The search runs on a bitboard, a Board is packed into one first
+        Positions covered by the endgame tables are looked up instead of searched
+        A search stopped through self.engine.stop_event raises CancelledError instead of returning, see engine_worker.py
 
         Args:
             depth, int: The depth of the search tree
-            maximizing_player, bool: Whether the AI is the maximizing player
+            board, BitBoard: The position to search, defaults to the game board
+            time_limit_ms, int: If given, deepen iteratively until the time runs out and ignore depth
+            parallel, bool: Whether to split the search over the worker pool
+            quiescence, bool: Whether to keep searching captures past the depth limit before evaluating
 
         Returns:
-            float: The evaluation score
-            tuple[Piece, tuple[int, int]: the piece to move and its associated move
+            int: The evaluation score for the current player
+            tuple: the move as (source square, destination square, captured mask, path), captures are whole sequences
         """
-        # Base case
-        if depth == 0 or self.check_winner(show_board=False):
-            return self.evaluate(board), None
-        
-        best_move: None | tuple[Piece, float, tuple[int, int]] = None
-        if maximizing_player:
-            max_eval = float('-inf')
+        if board is None:
+            board = self.board
+        if isinstance(board, Board):
+            board = board.to_bitboard()
+        engine = self.engine
+        if parallel:
+            if self.parallel_engine is None:
+                self.parallel_engine = ParallelSearch(self.search_processes, self.table_size_mb, self.tablebase_dir, quiescence=quiescence,
+                                                      value_net=self.value_net, batch_eval=self.batch_eval)
+            engine = self.parallel_engine
+            # Listen to the same stop event as the serial engine, see engine_worker.py
+            engine.stop_event = self.engine.stop_event
+        self.quiescence = quiescence
+        pondered = self.pondered_move(board, depth, time_limit_ms)
+        if pondered is not None:
+            return pondered
+        engine.quiescence = quiescence
+        if time_limit_ms is not None:
+            result = engine.iterative_search(board, self.turn, time_limit_ms)
+            self.last_search_depth = engine.completed_depth
         else:
-            max_eval = float('inf')
-
-        for piece in board.find_color_pieces(self.turn):
-            for move in board.find_valid_moves_and_jumps(piece):
-                dest =  move
-                # Get piece location, and destination location
-                dest_row, dest_col = dest
-                # Move the piece
-                board_copy = board.clone()
-                board_copy.move_piece(piece, dest_row, dest_col)
-                eval = self.minimax(depth - 1, False, board_copy)[0]
-                if maximizing_player:
-                    if eval > max_eval:
-                        best_move = (piece, move)
-                    max_eval = max(max_eval, eval)
-                else:
-                    if eval < max_eval:
-                        best_move = (piece, move)
-                    max_eval = min(max_eval, eval)
+            result = engine.search(board, self.turn, depth)
+        # A search cancelled through the engine's stop event has no move worth playing
+        if self.engine.stop_event is not None and self.engine.stop_event.is_set():
+            raise CancelledError("Minimax search cancelled")
+        return result
+
+    def close(self):
+        """
+        Stop the search worker processes and close the opening book, the ponderer belongs to the caller
+        """
+        if self.parallel_engine is not None:
+            self.parallel_engine.close()
+            self.parallel_engine = None
+        if self.mcts is not None:
+            self.mcts.close()
+            self.mcts = None
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+
+    def start_pondering(self):
+        """
+        Start searching the AI's answers to the current player's possible moves, call at the start of the opponent's turn
+        The next minimax call stops the pondering and plays the pondered answer if it is deep enough
+        The ponder search uses this game's leaf evaluation and the quiescence setting of its last search
+        """
+        if self.ponderer is not None:
+            self.ponderer.start(self.board, self.turn, batch_eval=self.batch_eval, quiescence=self.quiescence, value_net=self.value_net)
+
+    def pondered_move(self, board, depth, time_limit_ms):
+        """
+        Stop pondering and get the pondered answer for a position if it was searched deep enough
+        A fixed-depth search needs the same depth, a timed one the depth the last timed search reached
+        Answers pondered with other search settings than this search's are not used, their depths do not compare
 
-        return max_eval, best_move
+        Args:
+            board, BitBoard: The position to move in
+            depth, int: The depth the search would run to
+            time_limit_ms, int: The time the search would run for, or None for a fixed depth
+
+        Returns:
+            tuple: (score, move) as minimax returns them, or None to search as usual
+        """
+        if self.ponderer is None:
+            return None
+        self.ponderer.stop()
+        if self.ponderer.settings != (self.batch_eval, self.quiescence, self.value_net):
+            return None
+        result = self.ponderer.lookup(board, self.turn)
+        if result is None:
+            return None
+        score, move, pondered_depth = result
+        needed = depth if time_limit_ms is None else max(self.last_search_depth, 1)
+        if move is None or pondered_depth < needed or move not in board.find_legal_moves(self.turn):
+            return None
+        return score, move
 
     def evaluate(self, board):
         """
@@ -213,20 +384,7 @@ class Game:
         Returns:
             int: The evaluation score
         """
-        #count the number of pieces for each color
-        red_pieces = board.red_count
-        black_pieces = board.black_count
-
-        red_kings = board.red_king_count
-        black_kings = board.black_king_count
-
-        #return the difference in the number of pieces
-        if self.turn == 'red':
-            score = (red_pieces - black_pieces) - black_kings + red_kings*5
-            return score
-        else:
-            score = (black_pieces - red_pieces) - red_kings + black_kings*5
-            return score
+        return evaluate(board, self.turn)
 
     def make_llm_move(self):
         """
@@ -298,7 +456,7 @@ class Game:
 
         # Check if the piece can make an extra jump
         if piece.extra_jump:
-            print("Extra jump available!")
+            self.notify('on_extra_jump', piece.color, piece.get_location())
             previous_move = move
             move = self.make_prefer_jumps(restricted_jump=(dest_row, dest_col))
             move = previous_move + ", " + move
@@ -343,22 +501,14 @@ class Game:
         """
         # If no restricted jump, choose a random piece
         if restricted_jump is None: 
-            # Get all pieces of the given color
-            valid_pieces = self.board.find_color_pieces(self.turn)
-            valid_moves = []
-
-            # Look through pieces to find one that can jump, choose the first piece that can jump
-            for p in valid_pieces:
-                piece = p
-                valid_moves = self.board.find_valid_moves_and_jumps(p, only_jumps=True)
-                if len(valid_moves) > 0:
-                    dest = valid_moves[0]
-                    break
+            # Look through the legal moves for a capture sequence, choose the first one
+            for piece, path in self.board.find_legal_moves(self.turn):
+                if abs(path[0][0] - piece.get_location()[0]) == 2:
+                    return self.make_move_sequence(piece, path)
             
             # If no jumps, make a random move
-            if len(valid_moves) == 0:
-                move = self.make_random_move()
-                return move
+            move = self.make_random_move()
+            return move
         
         # If a restricted jump, choose the piece that must jump
         else:
@@ -372,14 +522,13 @@ class Game:
 
         # Move the piece
         self.board.move_piece(piece, dest_row, dest_col)
-        print("Moved " + piece.color + " piece from " + chr(start_col + ord('A')) + str(start_row + 1) + " to " + chr(dest_col + ord('A')) + str(dest_row + 1))
 
         #Get move in a string (e.g., 'A3 B4')
         move = chr(start_col + ord('A')) + str(start_row + 1) + " " + chr(dest_col + ord('A')) + str(dest_row + 1)
 
         # Check if the piece can make an extra jump
         if piece.extra_jump:
-            print("Extra jump available!")
+            self.notify('on_extra_jump', piece.color, piece.get_location())
             previous_move = move
             move = self.make_prefer_jumps(restricted_jump=(dest_row, dest_col))
             move = previous_move + ", " + move
@@ -396,7 +545,7 @@ class Game:
         Returns:
             str: The move in the format 'A3 B4'
         """
-        # If no restricted jump, choose a random piece
+        # If no restricted jump, choose a random legal move
         if restricted_jump is None: 
             valid_moves = self.find_valid_moves(self.turn)
             if len(valid_moves) == 0:
@@ -404,8 +553,8 @@ class Game:
                 return "No moves available"
             #shuffle the list of valid moves
             random.shuffle(valid_moves)
-            piece, dest = valid_moves[0]
-            # print(piece, dest)
+            piece, path = valid_moves[0]
+            return self.make_move_sequence(piece, path)
 
         # If a restricted jump, choose the piece that must jump
         else: 
@@ -419,14 +568,13 @@ class Game:
 
         # Move the piece
         self.board.move_piece(piece, dest_row, dest_col)
-        print("Moved " + piece.color + " piece from " + chr(start_col + ord('A')) + str(start_row + 1) + " to " + chr(dest_col + ord('A')) + str(dest_row + 1))
 
         #Get move in a string (e.g., 'A3 B4')
         move = chr(start_col + ord('A')) + str(start_row + 1) + " " + chr(dest_col + ord('A')) + str(dest_row + 1)
 
         # Check if the piece can make an extra jump
         if piece.extra_jump:
-            print("Extra jump available!")
+            self.notify('on_extra_jump', piece.color, piece.get_location())
             previous_move = move
             move = self.make_random_move(restricted_jump=(dest_row, dest_col))
             move = previous_move + ", " + move
@@ -435,28 +583,42 @@ class Game:
     
     def find_valid_moves(self, color):
         """
-        Find all valid moves for a given color
+        Find all legal moves for a given color
+        Captures are mandatory and a capture sequence is a single move
 
         Args:
             color, str: The color of the pieces
 
         Returns:
-            list: The list of valid moves for the given color
+            list: The list of (piece, path) moves for the given color, path is the list of squares landed on
         """
-        pieces: list[Piece] = self.board.find_color_pieces(color)
-        valid_moves: list[list[tuple[int,int]]] = []
-        for piece in pieces:
-            for move in self.board.find_valid_moves_and_jumps(piece):
-                valid_moves.append((piece, move))
+        return self.board.find_legal_moves(color)
+
+    def make_move_sequence(self, piece, path):
+        """
+        Move a piece along a path of squares, one step per square
+
+        Args:
+            piece, Piece: The piece to move
+            path, list of tuples: The (row, col) squares the piece lands on, in order
+
+        Returns:
+            str: The move in the format 'A3 B4', capture steps are joined (e.g., 'A3 C5, C5 E7')
+        """
+        steps = []
+        for dest_row, dest_col in path:
+            start_row, start_col = piece.get_location()
+            self.board.move_piece(piece, dest_row, dest_col)
+            steps.append(chr(start_col + ord('A')) + str(start_row + 1) + " " + chr(dest_col + ord('A')) + str(dest_row + 1))
 
-        return valid_moves
+        return ", ".join(steps)
 
     def check_winner(self, show_board=True):
         """
-        Check if the game is over and print the winner
+        Check if the game is over and tell the sinks the winner
 
         Args:
-            show_board, bool: Whether to show the board and print the winner
+            show_board, bool: Whether to show the board when the game is over
 
         Returns:
             bool: True if the game is over, False otherwise
@@ -466,45 +628,52 @@ class Game:
         black_pieces = self.board.black_count
     
         if red_pieces == 0:
-            if show_board: 
-                self.board.draw_board()
-                print("Black wins!")
-            return True
+            winner = 'black'
         elif black_pieces == 0:
-            if show_board:
-                self.board.draw_board()
-                print("Red wins!")
-            return True
+            winner = 'red'
         elif self.tie:
-            if show_board:
-                self.board.draw_board()
-                print("It's a tie!")
-            return True
-        return False
+            winner = None
+        else:
+            return False
+
+        if show_board:
+            self.board.draw_board()
+        self.notify('on_game_over', winner)
+        return True
     
-    def play(self):
+    def play(self, pdn_path=None):
         """
         Game loop
+
+        Args:
+            pdn_path, str: PDN file to append the game to, None to not record it
         """
-        while True:
-            if self.turn == 'red':
-                print(self.ai_turn(difficulty="Random"))
-                # print(self.ai_turn(difficulty="Prefer Jumps"))
-                # print(self.ai_turn(difficulty="LLM"))
-                # print(self.ai_turn(difficulty="Minimax"))
-                # self.user_turn()
-            else:
-                print(self.ai_turn(difficulty="Random"))
-                # print(self.ai_turn(difficulty="Prefer Jumps"))
-                # print(self.ai_turn(difficulty="LLM"))
-                # print(self.ai_turn(difficulty="Minimax"))
-                # self.user_turn()
-            if self.check_winner():
-                break
-            self.switch_turn()
-            # self.board.print_pieces()
-            self.board.draw_board()
-            sleep(0.5)
+        recorder = PdnRecorder(pdn_path, start=Position.from_board(self.board, self.turn)) if pdn_path else None
+        if recorder: self.sinks.append(recorder)
+        try:
+            while True:
+                if self.turn == 'red':
+                    print(self.ai_turn(difficulty="Random"))
+                    # print(self.ai_turn(difficulty="Prefer Jumps"))
+                    # print(self.ai_turn(difficulty="LLM"))
+                    # print(self.ai_turn(difficulty="Minimax"))
+                    # self.user_turn()
+                else:
+                    print(self.ai_turn(difficulty="Random"))
+                    # print(self.ai_turn(difficulty="Prefer Jumps"))
+                    # print(self.ai_turn(difficulty="LLM"))
+                    # print(self.ai_turn(difficulty="Minimax"))
+                    # self.user_turn()
+                if self.check_winner():
+                    break
+                self.switch_turn()
+                # self.board.print_pieces()
+                self.board.draw_board()
+                sleep(0.5)
+        finally:
+            if recorder:
+                self.sinks.remove(recorder)
+                recorder.close()
 
 if __name__ == "__main__":
     game = Game()
@@ -0,0 +1,295 @@
+"""
+Monte Carlo Tree Search: an anytime engine for the MCTS difficulty
+
+Each iteration walks down the tree choosing moves by UCT (upper confidence bound on
+the win rate), adds one new position, plays a random game from it with the Random
+difficulty's policy (a uniformly random legal move every turn) and counts the result
+back up the path. The move played is the one visited most.
+
+Playouts are the expensive part, so they are run in batches across a process pool:
+a batch of leaves is selected first, each path taking a virtual loss so the batch
+spreads out over the tree, then all its playouts run in parallel. Strength grows with
+the number of playouts, so with cores and with the time allowed per move.
+
+The tree is kept between moves. When the next search starts from a position two plies
+below the old root (our move, then the opponent's reply), that subtree becomes the new
+root with all its statistics.
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import random
+from concurrent.futures import CancelledError
+from time import perf_counter
+from .bitboard import BitBoard
+from .search import OPPONENT
+from .zobrist import SIDE_KEYS
+
+EXPLORATION = 1.4 # UCT exploration constant, about sqrt(2)
+PLAYOUT_PLIES = 150 # Playouts still going after this many moves count as draws
+DEFAULT_PLAYOUTS = 1000 # Budget when neither a time limit nor a playout count is given
+BATCH_PER_PROCESS = 4 # Leaves selected per worker process before the playouts run
+
+
+def random_playout(task):
+    """
+    Play random legal moves to the end of the game, like the Random difficulty
+
+    Args:
+        task, tuple: (position masks and hash, color to move, seed, maximum plies)
+
+    Returns:
+        str: The winning color, or None for a draw
+    """
+    position, color, seed, max_plies = task
+    rng = random.Random(seed)
+    board = BitBoard(*position)
+    for _ in range(max_plies):
+        moves = board.find_legal_moves(color)
+        if not moves:
+            return OPPONENT[color]
+        board.make_move(rng.choice(moves))
+        color = OPPONENT[color]
+    return None
+
+
+class Node:
+    __slots__ = ('move', 'parent', 'color', 'key', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move, parent, color, key, moves):
+        """
+        A position in the search tree
+
+        Args:
+            move, tuple: The move that led here from the parent, None at the root
+            parent, Node: The parent node, None at the root
+            color, str: The color to move in this position
+            key, int: The position's hash with the side to move
+            moves, list of tuples: The legal moves, expanded one at a time
+        """
+        self.move = move
+        self.parent = parent
+        self.color = color
+        self.key = key
+        self.children = []
+        self.untried = moves
+        self.visits = 0
+        self.wins = 0.0 # Results for the color that moved into this node, draws count half
+
+    def best_child(self, exploration):
+        """
+        Pick the child with the highest UCT value
+
+        Args:
+            exploration, float: The exploration constant
+
+        Returns:
+            Node: The child to descend into
+        """
+        log_visits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.wins / child.visits
+                   + exploration * math.sqrt(log_visits / child.visits))
+
+
+class MCTS:
+    def __init__(self, processes=1, exploration=EXPLORATION, playout_plies=PLAYOUT_PLIES, seed=None):
+        """
+        Set up the search
+
+        Args:
+            processes, int: Worker processes for the playouts, 1 to play them in this process, None for the number of cores
+            exploration, float: The UCT exploration constant
+            playout_plies, int: Moves before a playout is called a draw
+            seed, int: Seed for the playouts, None for a random one
+
+        Attributes:
+            root: The tree from the last search, reused if the next position is below it
+            playouts: The number of playouts run by the last search
+            reused: The number of playouts inherited from the previous tree by the last search
+            stop_event: An Event that cancels the search from another thread when set, checked after every batch, or None
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.pool = multiprocessing.Pool(self.processes) if self.processes > 1 else None
+        self.exploration = exploration
+        self.playout_plies = playout_plies
+        self.rng = random.Random(seed)
+        self.root = None
+        self.playouts = 0
+        self.reused = 0
+        self.stop_event = None
+
+    def find_root(self, board, color):
+        """
+        Reuse the old tree if the position is the root or two plies below it, otherwise start a new tree
+
+        Args:
+            board, BitBoard: The position to search
+            color, str: The color to move
+
+        Returns:
+            Node: The root to search from
+        """
+        key = board.hash ^ SIDE_KEYS[color]
+        if self.root is not None:
+            candidates = [self.root] + self.root.children + [grandchild for child in self.root.children for grandchild in child.children]
+            for node in candidates:
+                if node.key == key:
+                    node.parent = None
+                    node.move = None
+                    return node
+        return Node(None, None, color, key, board.find_legal_moves(color))
+
+    def search(self, board, color, time_limit_ms=None, playouts=None):
+        """
+        Grow the tree until the budget runs out and pick the most visited move
+        A search cancelled through stop_event raises CancelledError instead of returning, the tree is kept
+
+        Args:
+            board, BitBoard: The position to search, restored before returning
+            color, str: The color to move
+            time_limit_ms, int: Time budget in milliseconds
+            playouts, int: Playout budget, used when there is no time limit, defaults to DEFAULT_PLAYOUTS
+
+        Returns:
+            float: The win rate of the chosen move for the color to move
+            tuple: The move, or None if the color has no moves
+        """
+        self.root = self.find_root(board, color)
+        self.reused = self.root.visits
+        self.playouts = 0
+        if not self.root.untried and not self.root.children:
+            return 0.0, None
+
+        deadline = perf_counter() + time_limit_ms / 1000 if time_limit_ms is not None else None
+        if deadline is None and playouts is None:
+            playouts = DEFAULT_PLAYOUTS
+        batch_size = self.processes * BATCH_PER_PROCESS if self.pool is not None else 1
+        # The first batch always runs so there is a move to return
+        while True:
+            size = batch_size if deadline is not None else max(1, min(batch_size, playouts - self.playouts))
+            self.run_batch(board, size)
+            if self.stop_event is not None and self.stop_event.is_set():
+                raise CancelledError("MCTS search cancelled")
+            if deadline is not None and perf_counter() >= deadline:
+                break
+            if deadline is None and self.playouts >= playouts:
+                break
+
+        best = max(self.root.children, key=lambda child: child.visits)
+        return best.wins / best.visits, best.move
+
+    def run_batch(self, board, size):
+        """
+        Select a batch of leaves, run their playouts and count the results back up the tree
+
+        Args:
+            board, BitBoard: The root position, restored before returning
+            size, int: The number of leaves to select
+        """
+        leaves = []
+        tasks = []
+        for _ in range(size):
+            node, winner, position = self.select(board)
+            leaves.append((node, winner))
+            if position is not None:
+                tasks.append((position, node.color, self.rng.getrandbits(64), self.playout_plies))
+
+        if self.pool is not None:
+            results = iter(self.pool.map(random_playout, tasks))
+        else:
+            results = iter(random_playout(task) for task in tasks)
+
+        for node, winner in leaves:
+            if winner is False:
+                winner = next(results)
+            self.backpropagate(node, winner)
+        # Leaves where the game is already over count as playouts of no moves
+        self.playouts += len(leaves)
+
+    def select(self, board):
+        """
+        Walk down by UCT to a new or finished position, adding one child on the way
+
+        Every node on the path gets its visit now, before its result is known: a virtual
+        loss that steers the rest of the batch elsewhere.
+
+        Args:
+            board, BitBoard: The root position, restored before returning
+
+        Returns:
+            Node: The leaf
+            winner: The winning color or None if the game is over at the leaf, False if it needs a playout
+            tuple: The leaf's masks and hash for the playout, or None if the game is over
+        """
+        node = self.root
+        records = []
+        node.visits += 1
+        while not node.untried and node.children:
+            node = node.best_child(self.exploration)
+            records.append(board.make_move(node.move))
+            node.visits += 1
+
+        if node.untried:
+            move = node.untried.pop(self.rng.randrange(len(node.untried)))
+            records.append(board.make_move(move))
+            color = OPPONENT[node.color]
+            child = Node(move, node, color, board.hash ^ SIDE_KEYS[color], board.find_legal_moves(color))
+            node.children.append(child)
+            node = child
+            node.visits += 1
+
+        if not node.untried and not node.children:
+            winner, position = OPPONENT[node.color], None # No moves, the side to move has lost
+        else:
+            winner, position = False, (board.red_men, board.red_kings, board.black_men, board.black_kings, board.hash)
+        for record in reversed(records):
+            board.unmake_move(record)
+        return node, winner, position
+
+    def backpropagate(self, node, winner):
+        """
+        Count a result at every node from the leaf to the root, the visits were counted by select
+
+        Args:
+            node, Node: The leaf
+            winner, str: The winning color, or None for a draw
+        """
+        while node is not None:
+            if winner is None:
+                node.wins += 0.5
+            elif winner != node.color:
+                node.wins += 1 # The color that moved into this node won
+            node = node.parent
+
+    def close(self):
+        """
+        Stop the worker processes
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+
+
+if __name__ == "__main__":
+    from .board import Board
+    from .perft import bitboard_move_name
+
+    parser = argparse.ArgumentParser(description="Search a position with Monte Carlo Tree Search")
+    parser.add_argument('--playouts', type=int, default=DEFAULT_PLAYOUTS, help="Playout budget")
+    parser.add_argument('--time-ms', type=int, help="Time budget in milliseconds, replaces the playout budget")
+    parser.add_argument('--processes', type=int, default=1, help="Worker processes for the playouts")
+    parser.add_argument('--layout', nargs='+', help="Custom layout (e.g. RE2 BD3K), defaults to the classic start")
+    parser.add_argument('--color', default='red', help="Color to move")
+    args = parser.parse_args()
+
+    board = Board(mode='custom', layout=args.layout).to_bitboard() if args.layout else Board(mode='classic').to_bitboard()
+    mcts = MCTS(processes=args.processes)
+    start = perf_counter()
+    win_rate, move = mcts.search(board, args.color, time_limit_ms=args.time_ms, playouts=args.playouts)
+    elapsed = perf_counter() - start
+    for child in sorted(mcts.root.children, key=lambda child: -child.visits):
+        print(f"{bitboard_move_name(child.move)}: {child.visits} visits, win rate {child.wins / child.visits:.3f}")
+    print(f"Best {bitboard_move_name(move)} ({win_rate:.3f}), {mcts.playouts} playouts in {elapsed:.2f}s "
+          f"({mcts.playouts / max(elapsed, 1e-9):,.0f}/s)")
+    mcts.close()
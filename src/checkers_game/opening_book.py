@@ -0,0 +1,281 @@
+"""
+Opening book: weighted moves for early positions, keyed by position hash
+
+The book is built offline from engine self-play, or from a text file of games, and
+saved as fixed-size records sorted by key. At runtime the file is memory-mapped and
+binary-searched, so a lookup reads a few records instead of searching the position.
+
+Import files hold one game per line: the winner ('red', 'black' or 'draw'), optionally the
+color that moved first (red if left out), then the moves, each written as the squares
+landed on joined by '-' (e.g., 'black red B6-A5 C3-D4' or 'draw C3-D4 B6-C5').
+
+Positions are keyed with the side to move, so a book only has moves for games that start
+with the same color as the game it is used in. Self-play covers both by default.
+
+Build a book with:
+    python -m src.checkers_game.opening_book --games 200 --output book.bin
+"""
+import argparse
+import mmap
+import random
+import struct
+from .bitboard import location_to_square
+from .board import Board
+from .search import SearchEngine, OPPONENT
+from .transposition import encode_move
+from .zobrist import SIDE_KEYS
+
+MAGIC = b'CKOB'
+VERSION = 1
+HEADER = struct.Struct('<4sII') # magic, version, record count
+RECORD = struct.Struct('<QQI') # position key, packed move, weight
+KEY = struct.Struct('<Q')
+
+# Weight a move earns for the side that played it
+RESULT_WEIGHTS = {'win': 2, 'draw': 1, 'loss': 0}
+
+
+def position_key(board, color):
+    """
+    Get the book key for a position
+
+    Args:
+        board, BitBoard: The position
+        color, str: The color to move
+
+    Returns:
+        int: The 64-bit key, the same one the transposition table uses
+    """
+    return board.hash ^ SIDE_KEYS[color]
+
+
+def start_position():
+    """
+    Get the classic starting position every game begins from
+
+    Returns:
+        BitBoard: The starting position
+    """
+    return Board(mode='classic').to_bitboard()
+
+
+class BookBuilder:
+    def __init__(self, max_plies=12):
+        """
+        Collect move weights from games
+
+        Args:
+            max_plies, int: The number of moves from the start of each game to record
+
+        Attributes:
+            weights: Dictionary of (position key, packed move) to total weight
+        """
+        self.max_plies = max_plies
+        self.weights = {}
+
+    def add_game(self, moves, winner, start_color='red'):
+        """
+        Add the opening moves of a finished game
+
+        Args:
+            moves, list of tuples: The bitboard moves played from the start position
+            winner, str: 'red', 'black', or None for a draw
+            start_color, str: The color that made the first move
+        """
+        board = start_position()
+        color = start_color
+        for move in moves[:self.max_plies]:
+            if winner is None:
+                weight = RESULT_WEIGHTS['draw']
+            else:
+                weight = RESULT_WEIGHTS['win' if winner == color else 'loss']
+            entry = (position_key(board, color), encode_move(move))
+            self.weights[entry] = self.weights.get(entry, 0) + weight
+            board.make_move(move)
+            color = OPPONENT[color]
+
+    def self_play(self, games, depth=4, randomness=0.2, max_game_plies=150, seed=0, start_color=None):
+        """
+        Play engine games against itself and add them to the book
+        Some opening moves are picked at random so the games branch out
+
+        Args:
+            games, int: The number of games to play
+            depth, int: The search depth for each move
+            randomness, float: The chance of playing a random move inside the book plies
+            max_game_plies, int: Games still going after this many moves count as draws
+            seed, int: Seed for the random move choices
+            start_color, str: The color that moves first, None to alternate so the book covers both
+        """
+        rng = random.Random(seed)
+        engine = SearchEngine(table_size_mb=4)
+        for game in range(games):
+            first = start_color or ('red', 'black')[game % 2]
+            board = start_position()
+            color = first
+            moves = []
+            winner = None
+            for ply in range(max_game_plies):
+                legal = board.find_legal_moves(color)
+                if not legal:
+                    winner = OPPONENT[color]
+                    break
+                if ply < self.max_plies and rng.random() < randomness:
+                    move = rng.choice(legal)
+                else:
+                    _, move = engine.search(board, color, depth)
+                board.make_move(move)
+                moves.append(move)
+                color = OPPONENT[color]
+            self.add_game(moves, winner, first)
+
+    def import_games(self, path):
+        """
+        Add games from a text file, one game per line
+
+        Args:
+            path, str: The file to read
+        """
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if not fields or fields[0].startswith('#'):
+                    continue
+                winner = None if fields[0] == 'draw' else fields[0]
+                # The first mover is optional, moves always contain '-'
+                first = 'red'
+                if len(fields) > 1 and fields[1] in ('red', 'black'):
+                    first = fields.pop(1)
+                board = start_position()
+                color = first
+                moves = []
+                for text in fields[1:]:
+                    path_squares = tuple(location_to_square(int(step[1:]) - 1, ord(step[0].upper()) - ord('A'))
+                                         for step in text.split('-'))
+                    move = next((m for m in board.find_legal_moves(color) if m[3] == path_squares), None)
+                    if move is None:
+                        raise ValueError(f"Illegal move {text} in game: {line.strip()}")
+                    board.make_move(move)
+                    moves.append(move)
+                    color = OPPONENT[color]
+                self.add_game(moves, winner, first)
+
+    def write(self, path):
+        """
+        Write the book sorted by key, leaving out moves with no weight
+
+        Args:
+            path, str: The file to write
+
+        Returns:
+            int: The number of records written
+        """
+        records = sorted((key, move, weight) for (key, move), weight in self.weights.items() if weight > 0)
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(records)))
+            for record in records:
+                f.write(RECORD.pack(*record))
+        return len(records)
+
+
+class OpeningBook:
+    def __init__(self, path, seed=None):
+        """
+        Open a book file for lookups
+
+        Args:
+            path, str: The book file
+            seed, int: Seed for picking between book moves, None for a random seed
+        """
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("Not an opening book file: " + path)
+        self.rng = random.Random(seed)
+
+    def _key_at(self, index):
+        return KEY.unpack_from(self.data, HEADER.size + index * RECORD.size)[0]
+
+    def lookup(self, board, color):
+        """
+        Get the book moves for a position
+
+        Args:
+            board, BitBoard: The position
+            color, str: The color to move
+
+        Returns:
+            list of tuples: (packed move, weight) for each book move, empty if the position is not in the book
+        """
+        key = position_key(board, color)
+        # Binary search for the first record with this key
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        while low < self.count:
+            record_key, move, weight = RECORD.unpack_from(self.data, HEADER.size + low * RECORD.size)
+            if record_key != key:
+                break
+            entries.append((move, weight))
+            low += 1
+        return entries
+
+    def choose_move(self, board, color):
+        """
+        Pick a book move at random, in proportion to its weight
+
+        Args:
+            board, BitBoard: The position
+            color, str: The color to move
+
+        Returns:
+            tuple: The legal move to play, or None if the position is not in the book
+        """
+        entries = self.lookup(board, color)
+        if not entries:
+            return None
+        legal = {encode_move(move): move for move in board.find_legal_moves(color)}
+        entries = [(move, weight) for move, weight in entries if move in legal]
+        if not entries:
+            return None
+        pick = self.rng.uniform(0, sum(weight for _, weight in entries))
+        for move, weight in entries:
+            pick -= weight
+            if pick <= 0:
+                break
+        return legal[move]
+
+    def close(self):
+        """
+        Close the book file
+        """
+        self.data.close()
+        self.file.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a checkers opening book")
+    parser.add_argument('--games', type=int, default=100, help="Number of self-play games")
+    parser.add_argument('--depth', type=int, default=4, help="Search depth for self-play moves")
+    parser.add_argument('--plies', type=int, default=12, help="Moves from the start of each game to keep")
+    parser.add_argument('--randomness', type=float, default=0.2, help="Chance of a random move in the opening")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for self-play")
+    parser.add_argument('--start-color', choices=['red', 'black', 'both'], default='both', help="Color that moves first in self-play games")
+    parser.add_argument('--import-games', help="Text file of games to add")
+    parser.add_argument('--output', default='book.bin', help="Book file to write")
+    args = parser.parse_args()
+
+    builder = BookBuilder(max_plies=args.plies)
+    if args.import_games:
+        builder.import_games(args.import_games)
+    builder.self_play(args.games, depth=args.depth, randomness=args.randomness, seed=args.seed,
+                      start_color=None if args.start_color == 'both' else args.start_color)
+    count = builder.write(args.output)
+    print(f"Wrote {count} book moves to {args.output}")
@@ -0,0 +1,245 @@
+"""
+Parallel game-tree search across a pool of worker processes
+
+The root moves are split between workers. Each iteration searches the expected best
+move first to get a score to beat, then searches the other moves in parallel with a
+null window around that score: most of them only have to prove they are not better,
+which is much cheaper than finding their exact score. The few that turn out better are
+searched again with a full window.
+
+The workers are started once and kept between moves, and each keeps its own
+transposition table, so later moves reuse what earlier searches found.
+"""
+import multiprocessing
+import os
+from time import perf_counter
+from .bitboard import BitBoard
+from .evaluation import WIN_SCORE
+from .search import SearchEngine, OPPONENT, MAX_DEPTH, WIN_THRESHOLD
+from .tablebase import EndgameTablebase
+
+STOP_POLL_SECONDS = 0.01 # How often a running iteration checks the stop event
+
+_engine = None # The worker process's search engine
+_search_id = None # The root search the worker's table ages belong to
+
+
+def _init_worker(table_size_mb, tablebase_dir, value_net_client=None, stop_event=None, batch_eval=False, quiescence=True):
+    """
+    Set up the search engine in a worker process
+
+    Args:
+        table_size_mb, float: Memory for the worker's transposition table in megabytes
+        tablebase_dir, str: Directory of endgame tables, or None
+        value_net_client, tuple: The InferenceServer's client_args to evaluate leaves through, or None
+        stop_event, multiprocessing.Event: Set by the parent to stop the running searches, or None
+        batch_eval, bool: Score leaves with the vectorized evaluation in batch_eval.py
+        quiescence, bool: Resolve captures past the depth limit, until a search's task says otherwise
+    """
+    global _engine
+    tablebase = EndgameTablebase(tablebase_dir) if tablebase_dir is not None else None
+    evaluator = None
+    if value_net_client is not None:
+        from .value_net import RemoteEvaluator
+        evaluator = RemoteEvaluator(*value_net_client)
+    _engine = SearchEngine(table_size_mb=table_size_mb, tablebase=tablebase, batch_eval=batch_eval,
+                           quiescence=quiescence, evaluator=evaluator)
+    _engine.stop_event = stop_event
+
+
+def _search_move(task):
+    """
+    Search one root move in a worker process
+
+    Args:
+        task, tuple: (search id, position masks and hash, color, move, depth, alpha, beta, deadline, quiescence)
+
+    Returns:
+        tuple: (score, nodes, quiescence nodes, stopped) with the score from the point of view of the color to move at the root
+    """
+    global _search_id
+    search_id, position, color, move, depth, alpha, beta, deadline, quiescence = task
+    if search_id != _search_id and _engine.table is not None:
+        _engine.table.new_search()
+    _search_id = search_id
+
+    board = BitBoard(*position)
+    _engine.nodes = 0
+    _engine.qnodes = 0
+    _engine.quiescence = quiescence
+    _engine.stopped = False
+    _engine.deadline = deadline
+    board.make_move(move)
+    score = -_engine.negamax(board, OPPONENT[color], depth - 1, -beta, -alpha, 1)
+    _engine.deadline = None
+    return score, _engine.nodes, _engine.qnodes, _engine.stopped
+
+
+class ParallelSearch:
+    def __init__(self, processes=None, table_size_mb=16, tablebase_dir=None, quiescence=True, value_net=None, batch_eval=False):
+        """
+        Start the worker pool
+
+        Args:
+            processes, int: The number of worker processes, defaults to the number of cores
+            table_size_mb, float: Memory for each worker's transposition table in megabytes
+            tablebase_dir, str: Directory of endgame tables built by tablebase.py, or None
+            quiescence, bool: Resolve captures past the depth limit before evaluating a leaf
+            value_net, str: Value network file to evaluate leaves with, served to all workers from this process, or None
+            batch_eval, bool: Score leaves with the vectorized evaluation in batch_eval.py, as SearchEngine does
+
+        Attributes:
+            nodes: The number of positions visited by the last search, over all workers
+            qnodes: The number of positions visited by the quiescence search, over all workers
+            quiescence: Whether the workers run the quiescence search, can be changed between searches
+            completed_depth: The deepest iteration the last search finished
+            stop_event: An Event that cancels the search from another thread when set, or None, as for SearchEngine
+        """
+        self.processes = processes or os.cpu_count() or 1
+        # The workers' leaf batches all go through one network in this process
+        self.value_net = None
+        if value_net is not None:
+            from .value_net import InferenceServer # Imports torch, only paid for when a network is used
+            self.value_net = InferenceServer(value_net, clients=self.processes)
+        client = self.value_net.client_args() if self.value_net is not None else None
+        # stop_event is only seen in this process, it is passed on to the workers through worker_stop
+        self.worker_stop = multiprocessing.Event()
+        self.pool = multiprocessing.Pool(self.processes, initializer=_init_worker,
+                                         initargs=(table_size_mb, tablebase_dir, client, self.worker_stop, batch_eval, quiescence))
+        # Root move ordering and tablebase lookups happen in this process
+        tablebase = EndgameTablebase(tablebase_dir) if tablebase_dir is not None else None
+        self.local = SearchEngine(table_size_mb=0, tablebase=tablebase)
+        self.search_id = 0
+        self.quiescence = quiescence
+        self.nodes = 0
+        self.qnodes = 0
+        self.completed_depth = 0
+        self.stop_event = None
+
+    def search(self, board, color, depth):
+        """
+        Search a position to a fixed depth and pick the best move
+
+        Args:
+            board, BitBoard: The position to search
+            color, str: The color to move
+            depth, int: The depth of the search tree
+
+        Returns:
+            int: The evaluation score for the color to move
+            tuple: The best move, or None if the color has no moves
+        """
+        return self.iterative_search(board, color, None, min_depth=depth, max_depth=depth)
+
+    def iterative_search(self, board, color, time_limit_ms, max_depth=MAX_DEPTH, min_depth=1):
+        """
+        Search one ply deeper at a time until the time limit, and return the last completed iteration
+
+        Args:
+            board, BitBoard: The position to search
+            color, str: The color to move
+            time_limit_ms, int: The time budget for the move in milliseconds, None for no limit
+            max_depth, int: The deepest iteration to start
+            min_depth, int: The first iteration, which always completes
+
+        Returns:
+            int: The evaluation score for the color to move
+            tuple: The best move, or None if the color has no moves
+        """
+        self.nodes = 0
+        self.qnodes = 0
+        self.completed_depth = 0
+        self.worker_stop.clear()
+        result = self.local.probe_root(board, color)
+        if result is not None:
+            return result
+        moves = board.find_legal_moves(color)
+        if not moves:
+            return -WIN_SCORE, None
+        self.search_id += 1
+
+        start = perf_counter()
+        position = (board.red_men, board.red_kings, board.black_men, board.black_kings, board.hash)
+        best_score, best_move = -WIN_SCORE, None
+        for depth in range(min_depth, max_depth + 1):
+            # The first iteration always completes so there is a move to return, unless the search is cancelled
+            deadline = start + time_limit_ms / 1000 if time_limit_ms is not None and best_move is not None else None
+            ordered = self.local.order_moves(board, color, moves, best_move)
+            score, move = self.search_iteration(position, color, ordered, depth, deadline)
+            if move is None:
+                break # Ran out of time, throw away the unfinished iteration
+            best_score, best_move = score, move
+            self.completed_depth = depth
+
+            # Stop early when there is nothing left to decide
+            if len(moves) == 1 or abs(score) >= WIN_THRESHOLD:
+                break
+            if time_limit_ms is not None and perf_counter() >= start + time_limit_ms / 1000:
+                break
+
+        return best_score, best_move
+
+    def search_iteration(self, position, color, moves, depth, deadline):
+        """
+        Search every root move to one depth across the workers
+
+        Args:
+            position, tuple: The position's masks and hash
+            color, str: The color to move
+            moves, list of tuples: The root moves, expected best first
+            depth, int: The depth of the search tree
+            deadline, float: perf_counter() time at which the workers stop, or None
+
+        Returns:
+            int: The evaluation score for the color to move
+            tuple: The best move, or None if the iteration ran out of time or was cancelled
+        """
+        def run(tasks):
+            if self.stop_event is not None and self.stop_event.is_set():
+                return None
+            pending = self.pool.map_async(_search_move, [task + (self.quiescence,) for task in tasks])
+            # Pass a cancel on to the workers, their searches stop within a few thousand nodes
+            while self.stop_event is not None and not pending.ready():
+                pending.wait(STOP_POLL_SECONDS)
+                if self.stop_event.is_set():
+                    self.worker_stop.set()
+            results = pending.get()
+            self.nodes += sum(nodes for _, nodes, _, _ in results)
+            self.qnodes += sum(qnodes for _, _, qnodes, _ in results)
+            if any(stopped for _, _, _, stopped in results):
+                return None
+            return [score for score, _, _, _ in results]
+
+        # The first move sets the score to beat
+        scores = run([(self.search_id, position, color, moves[0], depth, -WIN_SCORE - 1, WIN_SCORE + 1, deadline)])
+        if scores is None:
+            return -WIN_SCORE, None
+        alpha, best_move = scores[0], moves[0]
+        rest = moves[1:]
+        if not rest:
+            return alpha, best_move
+
+        # The rest only need to show whether they beat it
+        scores = run([(self.search_id, position, color, move, depth, alpha, alpha + 1, deadline) for move in rest])
+        if scores is None:
+            return -WIN_SCORE, None
+        better = [move for move, score in zip(rest, scores) if score > alpha]
+
+        # Find the exact score of the ones that do
+        if better:
+            scores = run([(self.search_id, position, color, move, depth, alpha, WIN_SCORE + 1, deadline) for move in better])
+            if scores is None:
+                return -WIN_SCORE, None
+            for move, score in zip(better, scores):
+                if score > alpha:
+                    alpha, best_move = score, move
+        return alpha, best_move
+
+    def close(self):
+        """
+        Stop the worker processes
+        """
+        self.pool.terminate()
+        self.pool.join()
+        if self.value_net is not None:
+            self.value_net.close()
@@ -0,0 +1,420 @@
+"""
+Portable Draughts Notation (PDN) game archives
+
+PDN is the standard text format for checkers games: a few [Tag "value"] headers and then
+the moves by square number, e.g. '1. 11-15 23-19 2. 8-11 22x15', and the result.
+
+The squares are numbered 1 to 32 from black's back rank, so black starts on 1 to 12 and
+red, PDN's White, on 21 to 32. PDN numbers and bitboard squares run opposite ways, the
+PDN number is 32 minus the square. A game that does not start from the classic layout
+with black to move gets a [FEN "W:W21,22,K30:B1,2"] tag with the side to move and the
+pieces, kings marked K.
+
+Writing: PdnRecorder is an event sink, add it to a game's sinks (or pass pdn_path to
+Game.play or play_with_robot) and every finished game is appended to the file.
+
+Reading: read_games is a generator that reads one game at a time, so an archive of
+millions of games is streamed rather than loaded, and replay plays a game's moves onto
+a board, a BitBoard by default as that is fastest for building books and training data.
+
+    for game in read_games('master_games.pdn'):
+        for color, move in replay(game):
+            ...
+"""
+import argparse
+import re
+from datetime import date
+from typing import NamedTuple
+from .bitboard import BitBoard, location_to_square, square_to_location
+from .board import Board
+from .events import EventSink
+from .position import Position
+from .search import OPPONENT
+
+CLASSIC_START = Position.from_board(Board(mode='classic'), 'black')
+RESULTS = {'red': '1-0', 'black': '0-1', None: '1/2-1/2'}
+WINNERS = {'1-0': 'red', '2-0': 'red', '0-1': 'black', '0-2': 'black', '1/2-1/2': None, '1-1': None}
+LINE_WIDTH = 79
+
+# Comments, variation brackets, results and moves, anything else (move numbers, NAGs) is skipped
+TOKENS = re.compile(r'\{[^}]*\}|[()]|(?:1-0|0-1|2-0|0-2|1-1|1/2-1/2|\*)(?=\s|$)|(\d+(?:[-x:]\d+)+)')
+HEADER = re.compile(r'\[\s*(\w+)\s+"([^"]*)"\s*\]')
+
+
+class PdnGame(NamedTuple):
+    headers: dict
+    moves: list # Each move is a tuple of PDN square numbers, e.g. (11, 15) or (22, 15) for 22x15
+    result: str
+
+    @property
+    def start(self):
+        """
+        Returns:
+            Position: The starting position and side to move, from the FEN tag or the classic start
+        """
+        fen = self.headers.get('FEN')
+        return fen_to_position(fen) if fen else CLASSIC_START
+
+    @property
+    def winner(self):
+        """
+        Returns:
+            str: 'red' or 'black', None for a draw or an unknown result
+        """
+        return WINNERS.get(self.result)
+
+
+def to_pdn_square(square):
+    """
+    Args:
+        square, int: The bitboard square
+
+    Returns:
+        int: The PDN square number
+    """
+    return 32 - square
+
+
+def from_pdn_square(number):
+    """
+    Args:
+        number, int: The PDN square number
+
+    Returns:
+        int: The bitboard square
+    """
+    if not 1 <= number <= 32:
+        raise ValueError(f"Not a PDN square: {number}")
+    return 32 - number
+
+
+def format_move(squares):
+    """
+    Write a move in PDN
+
+    Args:
+        squares, tuple: The bitboard squares the piece stands on, start first
+
+    Returns:
+        str: e.g. '11-15', or '22x15' and '15x24x31' for captures
+    """
+    capture = abs(squares[1] // 4 - squares[0] // 4) == 2
+    return ('x' if capture else '-').join(str(to_pdn_square(square)) for square in squares)
+
+
+def position_to_fen(position):
+    """
+    Write a position as a PDN FEN tag value
+
+    Args:
+        position, Position: The position
+
+    Returns:
+        str: e.g. 'B:W21,22,K30:B1,2', red is PDN's White
+    """
+    sides = []
+    for letter, men, kings in (('W', position.red_men, position.red_kings), ('B', position.black_men, position.black_kings)):
+        pieces = sorted((to_pdn_square(square), kings >> square & 1) for square in range(32) if (men | kings) >> square & 1)
+        sides.append(letter + ','.join(('K' if king else '') + str(number) for number, king in pieces))
+    return ('B' if position.turn == 'black' else 'W') + ':' + ':'.join(sides)
+
+
+def fen_to_position(fen):
+    """
+    Read a PDN FEN tag value, piece ranges such as '1-12' included
+
+    Args:
+        fen, str: e.g. 'B:W21,22,K30:B1,2'
+
+    Returns:
+        Position: The position
+    """
+    fields = [field.strip() for field in fen.strip().rstrip('.').split(':')]
+    if not fields or fields[0].upper() not in ('W', 'B'):
+        raise ValueError("Invalid FEN: " + fen)
+    masks = {'W': [0, 0], 'B': [0, 0]}
+    for field in fields[1:]:
+        side = field[:1].upper()
+        if side not in masks:
+            raise ValueError("Invalid FEN: " + fen)
+        for piece in filter(None, (piece.strip() for piece in field[1:].split(','))):
+            king = piece[0].upper() == 'K'
+            first, _, last = piece.lstrip('Kk').partition('-')
+            for number in range(int(first), int(last or first) + 1):
+                masks[side][king] |= 1 << from_pdn_square(number)
+    return Position(masks['W'][0], masks['W'][1], masks['B'][0], masks['B'][1],
+                    'black' if fields[0].upper() == 'B' else 'red')
+
+
+def format_game(moves, result='*', start=None, headers=None):
+    """
+    Write a game in PDN
+
+    Args:
+        moves, list of tuples: The bitboard squares of each move, start first
+        result, str: '1-0' (red won), '0-1' (black won), '1/2-1/2' or '*' (unfinished)
+        start, Position: The starting position and side to move, None for the classic start with black to move
+        headers, dict: Extra tags, e.g. {'Event': 'Robot game', 'White': 'Robot'}
+
+    Returns:
+        str: The game, ending with a blank line
+    """
+    tags = {'Event': '?', 'Date': date.today().strftime('%Y.%m.%d'), 'White': '?', 'Black': '?'}
+    tags.update(headers or {})
+    tags['Result'] = result
+    if start is not None and start != CLASSIC_START:
+        tags['FEN'] = position_to_fen(start)
+    lines = [f'[{tag} "{value}"]' for tag, value in tags.items()]
+
+    # Black moves first in a numbered pair, a game that red starts begins with '1...'
+    black_first = start is None or start.turn == 'black'
+    tokens = []
+    for index, move in enumerate(moves):
+        ply = index if black_first else index + 1
+        # Move numbers stay on the same line as their move
+        if ply % 2 == 0:
+            tokens.append(f'{ply // 2 + 1}. {format_move(move)}')
+        elif index == 0:
+            tokens.append(f'1... {format_move(move)}')
+        else:
+            tokens.append(format_move(move))
+    tokens.append(result)
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = line + ' ' + token if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n\n'
+
+
+def _parse_game(headers, movetext):
+    """
+    Turn the headers and move text of one game into a PdnGame
+
+    Args:
+        headers, dict: The tags
+        movetext, list of str: The lines after the tags
+
+    Returns:
+        PdnGame: The game, moves in variations are skipped
+    """
+    moves = []
+    result = headers.get('Result', '*')
+    depth = 0
+    for match in TOKENS.finditer(' '.join(movetext)):
+        token = match.group(0)
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth = max(0, depth - 1)
+        elif depth or token[0] == '{':
+            continue
+        elif match.group(1):
+            moves.append(tuple(int(number) for number in re.split('[-x:]', token)))
+        else:
+            result = token
+    return PdnGame(headers, moves, result)
+
+
+def read_games(source):
+    """
+    Read the games of a PDN archive one at a time
+
+    Args:
+        source, str or file: A path or an open text file, or any iterable of lines
+
+    Returns:
+        generator: PdnGame for each game, in order
+    """
+    if isinstance(source, str):
+        with open(source, encoding='utf-8', errors='replace') as file:
+            yield from read_games(file)
+        return
+
+    headers = {}
+    movetext = []
+    for line in source:
+        line = line.strip()
+        if not line or line[0] == '%': # Blank or escaped line
+            continue
+        if line[0] == '[':
+            # Tags after move text start the next game
+            if movetext:
+                yield _parse_game(headers, movetext)
+                headers, movetext = {}, []
+            for tag, value in HEADER.findall(line):
+                headers[tag] = value
+        else:
+            movetext.append(line)
+    if headers or movetext:
+        yield _parse_game(headers, movetext)
+
+
+def _matches(squares, path):
+    """
+    Whether a PDN move names a legal move, captures may leave out the squares in between
+
+    Args:
+        squares, tuple: The bitboard squares in the PDN move
+        path, tuple: The bitboard squares of the legal move, start first
+
+    Returns:
+        bool: True if the move is the legal move
+    """
+    if squares[0] != path[0] or squares[-1] != path[-1]:
+        return False
+    landed = iter(path)
+    return all(square in landed for square in squares)
+
+
+def replay(game, board=None):
+    """
+    Play a game's moves onto a board
+
+    Args:
+        game, PdnGame: The game
+        board, Board: The board to play on, set up with the game's start, None for a new BitBoard
+
+    Returns:
+        generator: (color, move) after each move is made on the board, the move as find_legal_moves gives it
+    """
+    start = game.start
+    if board is None:
+        board = start.to_bitboard()
+    else:
+        start.apply_to(board)
+
+    color = start.turn
+    for number, pdn_move in enumerate(game.moves, 1):
+        squares = tuple(from_pdn_square(number) for number in pdn_move)
+        if isinstance(board, BitBoard):
+            move = next((move for move in board.find_legal_moves(color) if _matches(squares, move[3])), None)
+            if move is not None:
+                board.make_move(move)
+        else:
+            move = next(((piece, path) for piece, path in board.find_legal_moves(color)
+                         if _matches(squares, (location_to_square(*piece.get_location()),) + tuple(location_to_square(*location) for location in path))), None)
+            if move is not None:
+                piece, path = move
+                for dest_row, dest_col in path:
+                    board.move_piece(piece, dest_row, dest_col)
+        if move is None:
+            raise ValueError(f"Illegal move {'-'.join(map(str, pdn_move))} for {color} at move {number}")
+        yield color, move
+        color = OPPONENT[color]
+
+
+def find_move(board, color, position):
+    """
+    Find the legal move that turns a board into a position, e.g. a camera's view of the board after the user moved
+
+    Args:
+        board, Board: The board before the move
+        color, str: The color that moved
+        position, Position: The pieces after the move, the side to move is not compared
+
+    Returns:
+        tuple: (piece, path) as in Board.find_legal_moves, None if no single legal move leads there
+    """
+    bitboard = board.to_bitboard()
+    for move in bitboard.find_legal_moves(color):
+        record = bitboard.make_move(move)
+        found = Position.from_board(bitboard)[:4] == position[:4]
+        bitboard.unmake_move(record)
+        if found:
+            return board.get_piece(*square_to_location(move[3][0])), [square_to_location(square) for square in move[3][1:]]
+    return None
+
+
+class PdnRecorder(EventSink):
+    """
+    Appends each finished game to a PDN file, one move per turn with multi-jumps joined
+
+    Red is PDN's White. A game still going when the recorder is closed, or when another
+    game starts, is written with the result '*'.
+    """
+    def __init__(self, file, start=None, headers=None):
+        """
+        Open the archive
+
+        Args:
+            file, str or file: A path to append to or an open text file
+            start, Position: The starting position, for a game already set up when the recorder is added
+            headers, dict: Tags for every game, e.g. {'Event': 'Robot game', 'Black': 'Robot'}
+        """
+        self.owns_file = isinstance(file, str)
+        self.file = open(file, 'a', encoding='utf-8') if self.owns_file else file
+        self.headers = dict(headers or {})
+        self.start = start
+        self.moves = [] # Bitboard squares of each move, start first
+        self.last_color = None
+
+    def on_game_start(self, position):
+        if self.moves:
+            self.write('*')
+        self.start = position
+
+    def on_move(self, color, start, end):
+        start_square = location_to_square(*start)
+        end_square = location_to_square(*end)
+        # Turns alternate, so the same color moving again from where it landed is a multi-jump
+        if color == self.last_color and self.moves and self.moves[-1][-1] == start_square:
+            self.moves[-1].append(end_square)
+        else:
+            self.moves.append([start_square, end_square])
+        self.last_color = color
+
+    def on_game_over(self, winner):
+        self.write(RESULTS[winner])
+
+    def write(self, result):
+        """
+        Append the current game to the archive and start a new one from where it ended
+
+        Args:
+            result, str: The PDN result
+        """
+        self.file.write(format_game(self.moves, result, self.start, self.headers))
+        self.file.flush()
+        self.moves = []
+        self.start = None
+        self.last_color = None
+
+    def close(self):
+        """
+        Write an unfinished game and close the file if the recorder opened it
+        """
+        if self.moves:
+            self.write('*')
+        if self.owns_file:
+            self.file.close()
+
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    parser = argparse.ArgumentParser(description="Stream the games of a PDN archive and replay them")
+    parser.add_argument('archive', help="PDN file")
+    parser.add_argument('--board', choices=['bitboard', 'board'], default='bitboard', help="Board to replay onto")
+    parser.add_argument('--limit', type=int, help="Stop after this many games")
+    args = parser.parse_args()
+
+    games = moves = errors = 0
+    start = perf_counter()
+    for game in read_games(args.archive):
+        board = Board(mode='classic') if args.board == 'board' else None
+        try:
+            moves += sum(1 for _ in replay(game, board))
+        except ValueError as error:
+            errors += 1
+            print(f"Game {games + 1}: {error}")
+        games += 1
+        if args.limit is not None and games >= args.limit:
+            break
+    elapsed = perf_counter() - start
+    print(f"{games} games, {moves} moves, {errors} with illegal moves in {elapsed:.2f}s "
+          f"({games / max(elapsed, 1e-9):,.0f} games/s)")
@@ -0,0 +1,265 @@
+"""
+Perft: count the leaf positions of the move tree to a fixed depth
+
+The counts check move generation against known numbers and against each other:
+the bitboard backend and the object-model Board (moved with make_move/unmake_move,
+with capture sequences found by following piece.extra_jump) must agree exactly.
+A capture sequence counts as one move. Runs also report nodes per second.
+
+Run with:
+    python -m src.checkers_game.perft --depth 8
+    python -m src.checkers_game.perft --depth 5 --divide --layout RE2 BD3K BB5 BB7 BD7 BF5
+"""
+import argparse
+import multiprocessing
+import sys
+from time import perf_counter
+from .bitboard import BitBoard, square_to_location
+from .board import Board
+from .events import format_location
+from .search import OPPONENT
+
+# Published perft counts for the classic starting position (English checkers, captures mandatory)
+PUBLISHED_PERFT = {
+    1: 7,
+    2: 49,
+    3: 302,
+    4: 1469,
+    5: 7361,
+    6: 36768,
+    7: 179740,
+    8: 845931,
+    9: 3963680,
+    10: 18391564,
+    11: 85242128,
+}
+
+
+def perft_bitboard(board, color, depth):
+    """
+    Count leaf positions with the bitboard backend
+
+    Args:
+        board, BitBoard: The position, restored before returning
+        color, str: The color to move
+        depth, int: The number of moves to look ahead
+
+    Returns:
+        int: The number of positions at the given depth
+    """
+    if depth == 0:
+        return 1
+    moves = board.find_legal_moves(color)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        record = board.make_move(move)
+        nodes += perft_bitboard(board, OPPONENT[color], depth - 1)
+        board.unmake_move(record)
+    return nodes
+
+
+def _extend_board_move(board, piece, start, path, moves):
+    """
+    Follow a move on the object board, branching while the piece has extra jumps
+
+    Args:
+        board, Board: The board, restored before returning
+        piece, Piece: The moving piece
+        start, tuple: The (row, col) the move started from
+        path, list of tuples: The squares landed on so far, the last one not yet played
+        moves, list: Finished (start, path) moves are appended here
+    """
+    record = board.make_move(piece, *path[-1])
+    if piece.extra_jump:
+        for jump in board.find_valid_jumps(piece):
+            _extend_board_move(board, piece, start, path + [jump], moves)
+    else:
+        moves.append((start, tuple(path)))
+    board.unmake_move(record)
+
+
+def board_moves(board, color):
+    """
+    Generate every legal move with the object-model Board alone
+
+    Args:
+        board, Board: The board, restored before returning
+        color, str: The color to move
+
+    Returns:
+        list of tuples: (start location, path of locations landed on) for each move
+    """
+    pieces = board.find_color_pieces(color)
+    captures = any(board.find_valid_jumps(piece) for piece in pieces)
+    moves = []
+    for piece in pieces:
+        start = piece.get_location()
+        for dest in board.find_valid_moves_and_jumps(piece, only_jumps=captures):
+            _extend_board_move(board, piece, start, [dest], moves)
+    return moves
+
+
+def play_board_move(board, move):
+    """
+    Play a (start, path) move on the object board
+
+    Args:
+        board, Board: The board
+        move, tuple: (start location, path of locations)
+
+    Returns:
+        list: The undo records, in the order they were made
+    """
+    piece = board.get_piece(*move[0])
+    return [board.make_move(piece, *step) for step in move[1]]
+
+
+def undo_board_move(board, records):
+    """
+    Take back a move played by play_board_move
+
+    Args:
+        board, Board: The board
+        records, list: The undo records from play_board_move
+    """
+    for record in reversed(records):
+        board.unmake_move(record)
+
+
+def perft_board(board, color, depth):
+    """
+    Count leaf positions with the object-model Board
+
+    Args:
+        board, Board: The board, restored before returning
+        color, str: The color to move
+        depth, int: The number of moves to look ahead
+
+    Returns:
+        int: The number of positions at the given depth
+    """
+    if depth == 0:
+        return 1
+    moves = board_moves(board, color)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        records = play_board_move(board, move)
+        nodes += perft_board(board, OPPONENT[color], depth - 1)
+        undo_board_move(board, records)
+    return nodes
+
+
+def bitboard_move_name(move):
+    """
+    Name a bitboard move by the squares it lands on, e.g. 'D3-F5-H7'
+    """
+    return "-".join(format_location(square_to_location(square)) for square in move[3])
+
+
+def board_move_name(move):
+    """
+    Name an object-board move by the squares it lands on, e.g. 'D3-F5-H7'
+    """
+    return "-".join(format_location(location) for location in (move[0],) + move[1])
+
+
+def _divide_task(task):
+    """
+    Count the leaves below one root move in a worker process
+
+    Args:
+        task, tuple: (backend, position masks, color, move, depth)
+
+    Returns:
+        int: The number of positions at the given depth
+    """
+    backend, masks, color, move, depth = task
+    board = BitBoard(*masks)
+    if backend == 'bitboard':
+        board.make_move(move)
+        return perft_bitboard(board, OPPONENT[color], depth - 1)
+    board = Board.from_bitboard(board)
+    play_board_move(board, move)
+    return perft_board(board, OPPONENT[color], depth - 1)
+
+
+def divide(board, color, depth, backend='bitboard', pool=None):
+    """
+    Count the leaves below each root move, optionally spreading the root moves over a process pool
+
+    Args:
+        board, BitBoard: The position
+        color, str: The color to move
+        depth, int: The number of moves to look ahead, at least 1
+        backend, str: 'bitboard' or 'board'
+        pool, multiprocessing.Pool: Worker pool, or None to count in this process
+
+    Returns:
+        dict: Move name to leaf count
+    """
+    masks = (board.red_men, board.red_kings, board.black_men, board.black_kings)
+    if backend == 'bitboard':
+        moves = board.find_legal_moves(color)
+        names = [bitboard_move_name(move) for move in moves]
+    else:
+        moves = board_moves(Board.from_bitboard(board), color)
+        names = [board_move_name(move) for move in moves]
+    tasks = [(backend, masks, color, move, depth) for move in moves]
+    counts = pool.map(_divide_task, tasks) if pool is not None else [_divide_task(task) for task in tasks]
+    return dict(zip(names, counts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count checkers move-tree leaves to a fixed depth")
+    parser.add_argument('--depth', type=int, default=6, help="Number of moves to look ahead")
+    parser.add_argument('--layout', nargs='+', help="Custom layout (e.g. RE2 BD3K), defaults to the classic start")
+    parser.add_argument('--color', default='red', help="Color to move")
+    parser.add_argument('--backend', choices=['both', 'bitboard', 'board'], default='both', help="Move generators to run")
+    parser.add_argument('--divide', action='store_true', help="Print the count below each root move")
+    parser.add_argument('--processes', type=int, default=1, help="Worker processes for the root moves")
+    args = parser.parse_args()
+
+    if args.layout:
+        board = Board(mode='custom', layout=args.layout).to_bitboard()
+    else:
+        board = Board(mode='classic').to_bitboard()
+    backends = ['bitboard', 'board'] if args.backend == 'both' else [args.backend]
+    pool = multiprocessing.Pool(args.processes) if args.processes > 1 else None
+
+    results = {}
+    for backend in backends:
+        start = perf_counter()
+        counts = divide(board, args.color, args.depth, backend, pool)
+        elapsed = perf_counter() - start
+        nodes = sum(counts.values())
+        results[backend] = counts
+        if args.divide:
+            for name in sorted(counts):
+                print(f"  {name}: {counts[name]}")
+        print(f"{backend}: perft({args.depth}) = {nodes} in {elapsed:.2f}s ({nodes / max(elapsed, 1e-9):,.0f} nodes/s)")
+
+    if pool is not None:
+        pool.close()
+
+    failed = False
+    if len(results) == 2 and results['bitboard'] != results['board']:
+        failed = True
+        print("MISMATCH between bitboard and board move generation:")
+        for name in sorted(set(results['bitboard']) | set(results['board'])):
+            a, b = results['bitboard'].get(name), results['board'].get(name)
+            if a != b:
+                print(f"  {name}: bitboard {a}, board {b}")
+    if not args.layout and args.color == 'red' and args.depth in PUBLISHED_PERFT:
+        for backend, counts in results.items():
+            if sum(counts.values()) != PUBLISHED_PERFT[args.depth]:
+                failed = True
+                print(f"MISMATCH: {backend} differs from the published perft({args.depth}) = {PUBLISHED_PERFT[args.depth]}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,38 @@
+def _build_direction_table(steps):
+    """
+    Precompute the on-board directions for every (color, king, row, col) combination
+
+    Args:
+        steps, int: 1 for move directions, 2 for jump directions
+
+    Returns:
+        dict: (color, king, row, col) to a tuple of (row step, col step) directions
+    """
+    table = {}
+    for color in ('red', 'black'):
+        for king in (False, True):
+            # Determine potential directions based on color and king status
+            if king:
+                directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+            elif color == 'black':
+                directions = [(-1, -1), (-1, 1)]
+            else:
+                directions = [(1, -1), (1, 1)]
+            for row in range(8):
+                for col in range(8):
+                    # Remove options that go off the board
+                    table[(color, king, row, col)] = tuple((d_row * steps, d_col * steps) for d_row, d_col in directions
+                                                           if 0 <= row + d_row * steps < 8 and 0 <= col + d_col * steps < 8)
+    return table
+
+
+MOVE_DIRECTIONS = _build_direction_table(1)
+JUMP_DIRECTIONS = _build_direction_table(2)
+
+
 class Piece:
+    __slots__ = ('color', 'location', 'king', 'crowned', 'move_directions', 'jump_directions', 'extra_jump', 'index')
+
     def __init__(self, color, location, king=False):
         """
         Initialize a piece with a specific color
@@ -8,6 +42,7 @@ class Piece:
             location, tuple: The current location of the piece on the board
                 - row: The row of the board (0-7)
                 - col: The column of the board (0-7)
+            king, bool: Whether the piece starts as a king
         
         Attributes:
             color: The color of the piece
@@ -15,11 +50,10 @@ class Piece:
         """
         self.color = color  # Color of the piece
         self.location = location  # Current location of the piece
-        self.king = False  # Indicates if the piece is a king
+        self.king = king  # Indicates if the piece is a king
         self.crowned = False  # Indicates if the piece has been crowned by the robot
-        self.move_directions = []  # List of potential move directions
-        self.jump_directions = []
         self.extra_jump = False
+        self.index = -1 # Position in the board's list of pieces, kept up to date by the board
         self.potential_move_directions(self.location) # Initialize potential move directions
         self.potential_jump_directions(self.location) # Initialize potential jump directions
 
@@ -55,7 +89,7 @@ class Piece:
             dest_col: The column of the destination location
         """
         # Update the location of the piece
-        self.location: tuple[int,int] = (dest_row, dest_col)
+        self.location = (dest_row, dest_col)
 
         # Update potential move and jump directions
         self.potential_move_directions(self.location)
@@ -64,88 +98,26 @@ class Piece:
     def potential_move_directions(self, curr_location):
         """
         Store potential move directions based on the current location of the piece
+        The directions are shared tuples from MOVE_DIRECTIONS, nothing is allocated
 
         This method does not account for other pieces on the board
 
         Args:
             curr_location: The destination location of the piece on the board (row, col)
         """
-        # Reset directions based on current location
-        row, col = curr_location
-        
-        # Determine potential move directions based on king status
-        if self.king:
-            self.move_directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        else:
-            if self.color == 'black':
-                self.move_directions = [(-1, -1), (-1, 1)] 
-            else:
-                self.move_directions = [(1, -1), (1, 1)]
-
-        # Check for edges of the board, remove options that go off the board
-        if row == 0: # Top row
-            if self.move_directions.__contains__((-1, -1)):
-                self.move_directions.remove((-1, -1))
-            if self.move_directions.__contains__((-1, 1)):
-                self.move_directions.remove((-1, 1))
-        elif row == 7: # Bottom row
-            if self.move_directions.__contains__((1, -1)):
-                self.move_directions.remove((1, -1))
-            if self.move_directions.__contains__((1, 1)):
-                self.move_directions.remove((1, 1))
-        if col == 0: # Left column
-            if self.move_directions.__contains__((-1, -1)):
-                self.move_directions.remove((-1, -1))
-            if self.move_directions.__contains__((1, -1)):
-                self.move_directions.remove((1, -1))
-        elif col == 7: # Right column
-            if self.move_directions.__contains__((-1, 1)):
-                self.move_directions.remove((-1, 1))
-            if self.move_directions.__contains__((1, 1)):
-                self.move_directions.remove((1, 1))
+        self.move_directions = MOVE_DIRECTIONS[(self.color, self.king, curr_location[0], curr_location[1])]
 
     def potential_jump_directions(self, curr_location):
         """
         Store potential jump directions based on the current location of the piece
+        The directions are shared tuples from JUMP_DIRECTIONS, nothing is allocated
 
         This method does not account for other pieces on the board
 
         Args:
             curr_location: The destination location of the piece on the board (row, col)
         """
-        # Reset directions based on current location
-        row, col = curr_location
-
-        # Determine potential jump directions based on king status
-        if self.king:
-            self.jump_directions = [(-2, -2), (-2, 2), (2, -2), (2, 2)]
-        else:
-            if self.color == 'black':
-                self.jump_directions = [(-2, -2), (-2, 2)]
-            else:
-                self.jump_directions = [(2, -2), (2, 2)]
-
-        # Check for edges of the board, remove options that go off the board
-        if row <= 1: # Top rows
-            if self.jump_directions.__contains__((-2, -2)):
-                self.jump_directions.remove((-2, -2))
-            if self.jump_directions.__contains__((-2, 2)):
-                self.jump_directions.remove((-2, 2))
-        elif row >= 6: # Bottom rows
-            if self.jump_directions.__contains__((2, -2)):
-                self.jump_directions.remove((2, -2))
-            if self.jump_directions.__contains__((2, 2)):
-                self.jump_directions.remove((2, 2))
-        if col <= 1: # Left columns
-            if self.jump_directions.__contains__((-2, -2)):
-                self.jump_directions.remove((-2, -2))
-            if self.jump_directions.__contains__((2, -2)):
-                self.jump_directions.remove((2, -2))
-        elif col >= 6: # Right columns
-            if self.jump_directions.__contains__((-2, 2)):
-                self.jump_directions.remove((-2, 2))
-            if self.jump_directions.__contains__((2, 2)):
-                self.jump_directions.remove((2, 2))
+        self.jump_directions = JUMP_DIRECTIONS[(self.color, self.king, curr_location[0], curr_location[1])]
 
     def get_location(self):
         """
@@ -191,9 +163,11 @@ class Piece:
 
     def clone(self):
         """
-        Return a copy of the piece
+        Return a copy of the piece, including its king and crowned status
         """
-        return Piece(self.color, self.location, self.king)
+        piece = Piece(self.color, self.location, self.king)
+        piece.crowned = self.crowned
+        return piece
 
     def __str__(self):
         """
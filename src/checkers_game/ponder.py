@@ -0,0 +1,238 @@
+"""
+Pondering: search on the opponent's time
+
+While the human thinks, the robot has nothing to do. A ponderer uses that time in a
+separate process: it lists the human's legal replies, most promising first, and searches
+the robot's answer to each of them one depth at a time, round robin, so every likely
+reply gets a usable answer early and the best ones get the deepest answers.
+
+When the human's move arrives the pondering is stopped and the finished answers come
+back keyed by position. If the position on the board was pondered deep enough, by a
+search set up like the one that would run (same leaf evaluation and quiescence), its
+move is played straight away, otherwise the normal search runs as before.
+
+The worker process is started once and kept, with its transposition table, for the rest
+of the game.
+"""
+import argparse
+import multiprocessing
+from time import sleep
+from .bitboard import BitBoard
+from .search import SearchEngine, OPPONENT, MAX_DEPTH, WIN_THRESHOLD
+from .tablebase import EndgameTablebase
+from .zobrist import SIDE_KEYS
+
+RANKING_DEPTH = 2 # Depth used to guess which replies the opponent is most likely to play
+DONE = 'done' # Sent by the worker when it has stopped pondering a position
+
+
+def position_key(board, color):
+    """
+    Key a position and the color to move for the ponder results
+
+    Args:
+        board, BitBoard or Board: The position
+        color, str: The color to move
+
+    Returns:
+        int: The 64-bit key
+    """
+    return board.hash ^ SIDE_KEYS[color]
+
+
+def ponder_position(engine, board, color, results, stop_event, max_depth=MAX_DEPTH):
+    """
+    Search the answer to each of the opponent's replies, one depth at a time, until stopped
+
+    Args:
+        engine, SearchEngine: The engine to search with, its stop_event must be stop_event
+        board, BitBoard: The position with the opponent to move, restored before returning
+        color, str: The opponent's color, the color to move
+        results, queue: (position key, score, move, depth) is put here for every finished search
+        stop_event, Event: Set to stop pondering
+        max_depth, int: The deepest search to run for a reply
+    """
+    answer_color = OPPONENT[color]
+
+    # Rank the replies by a shallow search, the opponent's best first
+    ranked = []
+    for move in board.find_legal_moves(color):
+        if stop_event.is_set():
+            return
+        record = board.make_move(move)
+        child = board.clone()
+        board.unmake_move(record)
+        score, _ = engine.search(child, answer_color, RANKING_DEPTH)
+        if engine.stopped:
+            return
+        ranked.append((score, child))
+    ranked.sort(key=lambda item: item[0])
+    replies = [child for _, child in ranked]
+
+    # Deepen every reply in turn, dropping the ones that are already decided
+    for depth in range(1, max_depth + 1):
+        if not replies:
+            return
+        unresolved = []
+        for child in replies:
+            if stop_event.is_set():
+                return
+            score, move = engine.search(child, answer_color, depth)
+            if engine.stopped:
+                return
+            results.put((position_key(child, answer_color), score, move, depth))
+            if move is not None and abs(score) < WIN_THRESHOLD:
+                unresolved.append(child)
+        replies = unresolved
+
+
+def _ponder_worker(tasks, results, stop_event, table_size_mb, tablebase_dir, max_depth):
+    """
+    Worker process loop: ponder each position it is sent until told to stop
+    The engine is rebuilt, table and all, when the search settings change
+
+    Args:
+        tasks, multiprocessing.Queue: (position masks and hash, color to move, (batch_eval, quiescence, value_net)) to ponder, None to exit
+        results, multiprocessing.Queue: (position key, score, move, depth) for every finished search, then DONE
+        stop_event, multiprocessing.Event: Set to stop pondering the current position
+        table_size_mb, float: Memory for the worker's transposition table in megabytes
+        tablebase_dir, str: Directory of endgame tables, or None
+        max_depth, int: The deepest search to run for a reply
+    """
+    tablebase = EndgameTablebase(tablebase_dir) if tablebase_dir is not None else None
+    engine, engine_settings = None, None
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        position, color, settings = task
+        if settings != engine_settings:
+            batch_eval, quiescence, value_net = settings
+            evaluator = None
+            if value_net is not None:
+                from .value_net import ValueNetEvaluator # Imports torch, only paid for when a network is used
+                evaluator = ValueNetEvaluator(value_net)
+            engine = SearchEngine(table_size_mb=table_size_mb, tablebase=tablebase, batch_eval=batch_eval,
+                                  quiescence=quiescence, evaluator=evaluator)
+            engine.stop_event = stop_event
+            engine_settings = settings
+        ponder_position(engine, BitBoard(*position), color, results, stop_event, max_depth)
+        results.put(DONE)
+
+
+class Ponderer:
+    def __init__(self, table_size_mb=16, tablebase_dir=None, max_depth=MAX_DEPTH):
+        """
+        Start the pondering process
+
+        Args:
+            table_size_mb, float: Memory for the ponder search's transposition table in megabytes
+            tablebase_dir, str: Directory of endgame tables built by tablebase.py, or None
+            max_depth, int: The deepest search to run for a reply
+
+        Attributes:
+            pondering: Whether the worker is pondering a position
+            results: Position key to (score, move, depth) from the last pondering, deepest result kept
+            settings: (batch_eval, quiescence, value_net) the last pondering searched with
+        """
+        self.tasks = multiprocessing.Queue()
+        self.queue = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=_ponder_worker, daemon=True,
+                                               args=(self.tasks, self.queue, self.stop_event, table_size_mb, tablebase_dir, max_depth))
+        self.process.start()
+        self.pondering = False
+        self.results = {}
+        self.settings = None
+
+    def start(self, board, color, batch_eval=False, quiescence=True, value_net=None):
+        """
+        Start pondering the opponent's replies, stopping any pondering already running
+        The search settings should match the search that will use the answers, see Game.start_pondering
+
+        Args:
+            board, BitBoard or Board: The position with the opponent to move
+            color, str: The opponent's color
+            batch_eval, bool: Score leaves with the vectorized evaluation in batch_eval.py
+            quiescence, bool: Resolve captures past the depth limit before evaluating a leaf
+            value_net, str: Value network file to evaluate leaves with, or None
+        """
+        self.stop()
+        if not isinstance(board, BitBoard):
+            board = board.to_bitboard()
+        self.results = {}
+        self.settings = (batch_eval, quiescence, value_net)
+        self.stop_event.clear()
+        self.tasks.put(((board.red_men, board.red_kings, board.black_men, board.black_kings, board.hash), color, self.settings))
+        self.pondering = True
+
+    def stop(self):
+        """
+        Stop pondering and collect the finished searches into results, does nothing if not pondering
+        The search running when this is called is cancelled and its partial result thrown away
+
+        Returns:
+            dict: The results, position key to (score, move, depth)
+        """
+        if not self.pondering:
+            return self.results
+        self.stop_event.set()
+        # Drain until the worker says it has stopped, so nothing is left over for the next position
+        while True:
+            result = self.queue.get()
+            if result == DONE:
+                break
+            key, score, move, depth = result
+            if key not in self.results or depth >= self.results[key][2]:
+                self.results[key] = (score, move, depth)
+        self.pondering = False
+        return self.results
+
+    def lookup(self, board, color):
+        """
+        Get the pondered answer for a position, call after stop
+
+        Args:
+            board, BitBoard or Board: The position
+            color, str: The color to move
+
+        Returns:
+            tuple: (score, move, depth), or None if the position was not pondered
+        """
+        return self.results.get(position_key(board, color))
+
+    def close(self):
+        """
+        Stop pondering and end the worker process
+        """
+        self.stop()
+        self.tasks.put(None)
+        self.process.join()
+
+
+if __name__ == "__main__":
+    from .board import Board
+    from .perft import bitboard_move_name
+
+    parser = argparse.ArgumentParser(description="Ponder the replies to a position for a while and print the answers found")
+    parser.add_argument('--seconds', type=float, default=5, help="How long to ponder")
+    parser.add_argument('--layout', nargs='+', help="Custom layout (e.g. RE2 BD3K), defaults to the classic start")
+    parser.add_argument('--color', default='red', help="Color of the opponent, to move in the position")
+    args = parser.parse_args()
+
+    board = Board(mode='custom', layout=args.layout).to_bitboard() if args.layout else Board(mode='classic').to_bitboard()
+    ponderer = Ponderer()
+    ponderer.start(board, args.color)
+    sleep(args.seconds)
+    ponderer.stop()
+    for move in board.find_legal_moves(args.color):
+        record = board.make_move(move)
+        result = ponderer.lookup(board, OPPONENT[args.color])
+        board.unmake_move(record)
+        if result is None:
+            print(f"{bitboard_move_name(move)}: not reached")
+        else:
+            score, answer, depth = result
+            answer = bitboard_move_name(answer) if answer is not None else "none"
+            print(f"{bitboard_move_name(move)}: answer {answer}, score {score}, depth {depth}")
+    ponderer.close()
@@ -0,0 +1,212 @@
+"""
+Immutable snapshot of a checkers position
+
+A Position is four 32-bit piece masks (as in BitBoard) and the color to move, in a
+NamedTuple: it is hashable and compares by value, so positions can key dicts and sets,
+dedupe games and be sent between processes without copying the Board's piece objects.
+
+Encodings:
+    packed: one 64-bit integer per color, men in the low 32 bits and kings in the high 32
+    bytes: the two packed integers and the color to move, always 17 bytes
+    text: the color to move and the custom layout strings, e.g. 'B:RB1,RD1,BA8,BC8K',
+        so a Board(mode='custom', layout=...) layout and the text convert both ways
+"""
+import struct
+from typing import NamedTuple
+from .bitboard import BitBoard, location_to_square, square_to_location, iterate_squares
+
+PACKED = struct.Struct('<QQB') # red, black, black to move
+LOW_MASK = 0xFFFFFFFF
+
+
+def _parse_square(text):
+    """
+    Read the column letter and row number of a layout string
+
+    Args:
+        text, str: e.g. 'B1' from 'RB1'
+
+    Returns:
+        int: The dark square index
+    """
+    row = int(text[1]) - 1
+    col = ord(text[0].upper()) - ord('A')
+    if not (0 <= row < 8 and 0 <= col < 8) or (row + col) % 2 == 0:
+        raise ValueError("Not a dark square: " + text)
+    return location_to_square(row, col)
+
+
+class Position(NamedTuple):
+    red_men: int = 0
+    red_kings: int = 0
+    black_men: int = 0
+    black_kings: int = 0
+    turn: str = 'red'
+
+    @classmethod
+    def from_board(cls, board, turn='red'):
+        """
+        Take a snapshot of a board
+
+        Args:
+            board, Board or BitBoard: The board
+            turn, str: The color to move
+
+        Returns:
+            Position: The snapshot
+        """
+        if not isinstance(board, BitBoard):
+            board = board.to_bitboard()
+        return cls(board.red_men, board.red_kings, board.black_men, board.black_kings, turn)
+
+    def to_bitboard(self):
+        """
+        Returns:
+            BitBoard: A new bitboard with this position's pieces
+        """
+        return BitBoard(self.red_men, self.red_kings, self.black_men, self.black_kings)
+
+    def to_board(self):
+        """
+        Returns:
+            Board: A new board of Piece objects with this position's pieces
+        """
+        from .board import Board
+        return Board.from_bitboard(self.to_bitboard())
+
+    def apply_to(self, board):
+        """
+        Replace the pieces on a board with this position's, keeping the board object and its sinks
+
+        Args:
+            board, Board: The board to set up
+        """
+        from .board import Piece
+        board.remove_all_pieces()
+        for color, men, kings in (('red', self.red_men, self.red_kings), ('black', self.black_men, self.black_kings)):
+            for mask, king in ((men, False), (kings, True)):
+                for square in iterate_squares(mask):
+                    piece = Piece(color, square_to_location(square))
+                    if king:
+                        piece.promote_to_king()
+                        piece.crown()
+                    board.add_piece(piece)
+
+    def pack(self):
+        """
+        Pack each color into one 64-bit integer
+
+        Returns:
+            tuple: (red, black) with men in the low 32 bits and kings in the high 32 bits
+        """
+        return self.red_men | self.red_kings << 32, self.black_men | self.black_kings << 32
+
+    @classmethod
+    def unpack(cls, red, black, turn='red'):
+        """
+        Build a position from the integers returned by pack
+
+        Args:
+            red, int: Red men and kings
+            black, int: Black men and kings
+            turn, str: The color to move
+
+        Returns:
+            Position: The position
+        """
+        return cls(red & LOW_MASK, red >> 32, black & LOW_MASK, black >> 32, turn)
+
+    def to_bytes(self):
+        """
+        Returns:
+            bytes: The position in PACKED.size (17) bytes
+        """
+        return PACKED.pack(*self.pack(), self.turn == 'black')
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Read a position written by to_bytes
+
+        Args:
+            data, bytes: The packed position
+
+        Returns:
+            Position: The position
+        """
+        red, black, black_to_move = PACKED.unpack(data)
+        return cls.unpack(red, black, 'black' if black_to_move else 'red')
+
+    def to_layout(self):
+        """
+        List the pieces as custom layout strings, red before black and each color by square
+
+        Returns:
+            list of str: e.g. ['RB1', 'RD1', 'BA8', 'BC8K']
+        """
+        layout = []
+        for letter, men, kings in (('R', self.red_men, self.red_kings), ('B', self.black_men, self.black_kings)):
+            for square in range(32):
+                if (men | kings) >> square & 1:
+                    row, col = square_to_location(square)
+                    layout.append(letter + chr(col + ord('A')) + str(row + 1) + ('K' if kings >> square & 1 else ''))
+        return layout
+
+    @classmethod
+    def from_layout(cls, layout, turn='red'):
+        """
+        Build a position from custom layout strings, as Board(mode='custom') reads them
+
+        Args:
+            layout, list of str: e.g. ['RB1', 'RD1', 'BA8', 'BC8K']
+            turn, str: The color to move
+
+        Returns:
+            Position: The position
+        """
+        masks = [0, 0, 0, 0]
+        for piece in layout:
+            color = piece[0].upper()
+            if color not in ('R', 'B') or len(piece) not in (3, 4) or (len(piece) == 4 and piece[3].upper() != 'K'):
+                raise ValueError("Invalid layout piece: " + piece)
+            bit = 1 << _parse_square(piece[1:3])
+            if any(mask & bit for mask in masks):
+                raise ValueError("Two pieces on the same square: " + piece)
+            masks[(0 if color == 'R' else 2) + (len(piece) == 4)] |= bit
+        return cls(*masks, turn)
+
+    def __str__(self):
+        """
+        Returns:
+            str: The text form, e.g. 'B:RB1,RD1,BA8,BC8K'
+        """
+        return ('R' if self.turn == 'red' else 'B') + ':' + ','.join(self.to_layout())
+
+    @classmethod
+    def from_text(cls, text):
+        """
+        Read the text form written by str()
+
+        Args:
+            text, str: e.g. 'B:RB1,RD1,BA8,BC8K'
+
+        Returns:
+            Position: The position
+        """
+        turn, _, pieces = text.strip().partition(':')
+        if turn.upper() not in ('R', 'B'):
+            raise ValueError("Invalid position text: " + text)
+        layout = [piece.strip() for piece in pieces.split(',') if piece.strip()]
+        return cls.from_layout(layout, 'red' if turn.upper() == 'R' else 'black')
+
+
+if __name__ == "__main__":
+    from .board import Board
+
+    layout = ['RE2', 'BD3K', 'BB5', 'BB7', 'BD7', 'BF5']
+    position = Position.from_board(Board(mode='custom', layout=layout), 'black')
+    print(position)  # B:RE2,BD3K,BB5,BF5,BB7,BD7
+    print(position.to_bytes().hex(), len(position.to_bytes()))
+    assert Position.from_text(str(position)) == position == Position.from_bytes(position.to_bytes())
+    assert sorted(position.to_layout()) == sorted(layout)
+    print({position: 'cached'}[Position.from_layout(layout, 'black')])
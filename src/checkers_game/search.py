@@ -0,0 +1,535 @@
+"""
+Alpha-beta game-tree search over bitboards
+
+The search is written in negamax form: every score is from the point of view of the
+side to move, and a child's score is negated on the way back up. Each ply expands the
+moves of the side to move, so red and black alternate correctly at every depth.
+
+At the leaves a quiescence search keeps playing captures until the position is quiet,
+so an exchange is never scored halfway through. Captures are forced in checkers, so a
+side can only stand pat (take the static evaluation) when it has no capture to make.
+
+Quiet moves are ordered by killer moves (the last quiet moves to cause a cutoff at the
+same ply) and by a history table of how often each from/to square pair has cut off.
+Both are kept between iterations and between the moves of a game, the history halving
+at every new search so old results fade.
+"""
+from time import perf_counter
+from .bitboard import RED_PROMOTION_MASK, BLACK_PROMOTION_MASK
+from .evaluation import evaluate, WIN_SCORE
+from .batch_eval import evaluate_batch_for, evaluate_position
+from .tablebase import WIN, LOSS, MAX_DTW
+from .transposition import TranspositionTable, encode_move, NO_MOVE, EXACT, LOWER_BOUND, UPPER_BOUND
+from .zobrist import SIDE_KEYS
+
+OPPONENT = {'red': 'black', 'black': 'red'}
+MAX_DEPTH = 64 # Deepest iteration an iterative search will start
+TIME_CHECK_INTERVAL = 1024 # Nodes between clock checks, must be a power of two
+WIN_THRESHOLD = WIN_SCORE - 1000 # Scores beyond this are forced wins or losses
+KILLER_SLOTS = 2 # Killer moves remembered per ply
+
+
+def score_to_table(score, ply):
+    """
+    Make a win score relative to the stored position instead of the root
+
+    Args:
+        score, int: The score relative to the root
+        ply, int: The distance of the position from the root
+
+    Returns:
+        int: The score to store
+    """
+    if score >= WIN_THRESHOLD:
+        return score + ply
+    if score <= -WIN_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """
+    Make a stored win score relative to the root again
+
+    Args:
+        score, int: The stored score
+        ply, int: The distance of the position from the root
+
+    Returns:
+        int: The score relative to the root
+    """
+    if score >= WIN_THRESHOLD:
+        return score - ply
+    if score <= -WIN_THRESHOLD:
+        return score + ply
+    return score
+
+
+def tablebase_score(value, distance, ply):
+    """
+    Turn a tablebase result into a search score
+    Wins score like a forced win found by the search, quicker wins scoring higher
+
+    Args:
+        value, int: WIN, LOSS or DRAW for the side to move
+        distance, int: Plies to the end of the game, or None if the table does not store it
+        ply, int: The distance of the position from the root
+
+    Returns:
+        int: The score for the side to move
+    """
+    if distance is None:
+        distance = MAX_DTW
+    if value == WIN:
+        return WIN_SCORE - ply - distance
+    if value == LOSS:
+        return -WIN_SCORE + ply + distance
+    return 0
+
+
+class SearchEngine:
+    def __init__(self, table_size_mb=16, tablebase=None, batch_eval=False, quiescence=True, evaluator=None):
+        """
+        Set up the search engine
+
+        Args:
+            table_size_mb, float: Memory for the transposition table in megabytes, 0 to search without one
+            tablebase, EndgameTablebase: Endgame tables to look positions up in, or None
+            batch_eval, bool: Score leaves with the vectorized evaluation in batch_eval.py, one batch per depth-1 node
+            quiescence, bool: Resolve captures past the depth limit before evaluating a leaf
+            evaluator, object: A replacement leaf evaluation with evaluate_position(board, color) and
+                evaluate_batch(masks, color) methods, such as the value network, used in batches like batch_eval
+
+        Attributes:
+            nodes: The number of positions visited by the last search
+            qnodes: The number of positions visited by the quiescence search, not counted in nodes
+            completed_depth: The deepest iteration the last search finished
+            deadline: perf_counter() time at which a timed search stops, or None
+            stop_event: An Event that stops the search from another thread or process when set, or None
+            stopped: Whether the current search ran out of time or was stopped
+            table: The transposition table, kept between searches, or None
+            tablebase: The endgame tables, or None
+            killers: For each ply, the latest quiet moves that caused a cutoff, newest first
+            history: Cutoff scores of quiet moves indexed [source square][destination square]
+        """
+        self.table = TranspositionTable(table_size_mb) if table_size_mb else None
+        self.tablebase = tablebase
+        if evaluator is not None:
+            self.batch_eval = True
+            self.evaluate = evaluator.evaluate_position
+            self.evaluate_batch = evaluator.evaluate_batch
+        else:
+            self.batch_eval = batch_eval
+            self.evaluate = evaluate_position if batch_eval else evaluate
+            self.evaluate_batch = evaluate_batch_for
+        self.quiescence = quiescence
+        self.killers = [[None] * KILLER_SLOTS for _ in range(MAX_DEPTH + 1)]
+        self.history = [[0] * 32 for _ in range(32)]
+        self.nodes = 0
+        self.qnodes = 0
+        self.completed_depth = 0
+        self.deadline = None
+        self.stop_event = None
+        self.stopped = False
+
+    def should_stop(self):
+        """
+        Check whether the search must stop, because time is up or it was told to from outside
+
+        Returns:
+            bool: True if the search must stop
+        """
+        if self.deadline is not None and perf_counter() >= self.deadline:
+            return True
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def search(self, board, color, depth):
+        """
+        Search a position to a fixed depth and pick the best move
+
+        Args:
+            board, BitBoard: The position to search, restored before returning
+            color, str: The color to move
+            depth, int: The depth of the search tree
+
+        Returns:
+            int: The evaluation score for the color to move
+            tuple: The best move as (source square, destination square, captured mask, path),
+                or None if the color has no moves
+        """
+        self.nodes = 0
+        self.qnodes = 0
+        self.deadline = None
+        self.stopped = False
+        result = self.probe_root(board, color)
+        if result is not None:
+            self.completed_depth = 0
+            return result
+        if self.table is not None:
+            self.table.new_search()
+        self.age_history()
+        score, move = self.search_root(board, color, depth)
+        # A search stopped from outside returns its best guess so far, but not as a finished depth
+        self.completed_depth = 0 if self.stopped else depth
+        return score, move
+
+    def iterative_search(self, board, color, time_limit_ms, max_depth=MAX_DEPTH):
+        """
+        Search one ply deeper at a time until the time limit, and return the last completed iteration
+        Each iteration searches the previous iteration's best move first
+
+        Args:
+            board, BitBoard: The position to search, restored before returning
+            color, str: The color to move
+            time_limit_ms, int: The time budget for the move in milliseconds
+            max_depth, int: The deepest iteration to start
+
+        Returns:
+            int: The evaluation score for the color to move
+            tuple: The best move, or None if the color has no moves
+        """
+        self.nodes = 0
+        self.qnodes = 0
+        self.completed_depth = 0
+        self.stopped = False
+        # The first iteration always completes so there is a move to return
+        self.deadline = None
+        result = self.probe_root(board, color)
+        if result is not None:
+            return result
+        if self.table is not None:
+            self.table.new_search()
+        self.age_history()
+
+        start = perf_counter()
+        best_score, best_move = -WIN_SCORE, None
+        for depth in range(1, max_depth + 1):
+            score, move = self.search_root(board, color, depth, best_move)
+            if self.stopped:
+                break # Throw away the unfinished iteration
+            best_score, best_move = score, move
+            self.completed_depth = depth
+
+            # Stop early when there is nothing left to decide
+            if move is None or abs(score) >= WIN_THRESHOLD:
+                break
+            self.deadline = start + time_limit_ms / 1000
+            if perf_counter() >= self.deadline:
+                break
+
+        self.deadline = None
+        return best_score, best_move
+
+    def probe_root(self, board, color):
+        """
+        Pick a move straight from the endgame tables if the position is covered
+        Wins are taken by the shortest route and losses put off as long as possible
+
+        Args:
+            board, BitBoard: The position, restored before returning
+            color, str: The color to move
+
+        Returns:
+            tuple: (score, move) for the color to move, or None if the tables do not decide the move
+        """
+        if self.tablebase is None or board.occupied.bit_count() > self.tablebase.max_pieces:
+            return None
+        moves = board.find_legal_moves(color)
+        if not moves:
+            return None
+
+        best = None
+        for move in moves:
+            record = board.make_move(move)
+            value, distance = self.tablebase.probe(board, OPPONENT[color])
+            score = -tablebase_score(value, distance, 1)
+            # Between equal results, prefer the one that looks best (tables without distances)
+            key = (score, -evaluate(board, OPPONENT[color]))
+            board.unmake_move(record)
+            if best is None or key > best[0]:
+                best = (key, move)
+        return best[0][0], best[1]
+
+    def search_root(self, board, color, depth, first_move=None):
+        """
+        Search every root move and keep the best one
+
+        Args:
+            board, BitBoard: The position to search
+            color, str: The color to move
+            depth, int: The depth of the search tree
+            first_move, tuple: A move to search before all others, such as the previous iteration's best
+
+        Returns:
+            int: The evaluation score for the color to move
+            tuple: The best move, or None if the color has no moves
+        """
+        self.nodes += 1
+        moves = self.order_moves(board, color, board.find_legal_moves(color), first_move, 0)
+        if not moves:
+            return -WIN_SCORE, None
+
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best_move = None
+        for move in moves:
+            record = board.make_move(move)
+            score = -self.negamax(board, OPPONENT[color], depth - 1, -beta, -alpha, 1)
+            board.unmake_move(record)
+            if self.stopped:
+                break
+            if best_move is None or score > alpha:
+                alpha = score
+                best_move = move
+
+        if self.table is not None and not self.stopped:
+            self.table.store(board.hash ^ SIDE_KEYS[color], depth, EXACT, score_to_table(alpha, 0), best_move)
+        return alpha, best_move
+
+    def negamax(self, board, color, depth, alpha, beta, ply):
+        """
+        Negamax search with alpha-beta pruning
+
+        Args:
+            board, BitBoard: The position to search
+            color, str: The color to move
+            depth, int: The remaining depth
+            alpha, int: The score the color to move is already guaranteed
+            beta, int: The score the opponent is already guaranteed, as seen by the color to move
+            ply, int: The distance from the root, used to prefer quicker wins
+
+        Returns:
+            int: The evaluation score for the color to move
+        """
+        self.nodes += 1
+        if self.nodes & (TIME_CHECK_INTERVAL - 1) == 0 and self.should_stop():
+            self.stopped = True
+        if self.stopped:
+            return 0 # The result is thrown away, just unwind
+        men, kings, _ = board.color_masks(color)
+        if not (men | kings):
+            return -WIN_SCORE + ply
+        if self.tablebase is not None and board.occupied.bit_count() <= self.tablebase.max_pieces:
+            value, distance = self.tablebase.probe(board, color)
+            return tablebase_score(value, distance, ply)
+        if depth <= 0:
+            if self.quiescence:
+                return self.quiescence_search(board, color, alpha, beta, ply)
+            return self.evaluate(board, color)
+
+        # A stored result for this position may settle it, or at least suggest a move
+        key = board.hash ^ SIDE_KEYS[color]
+        table_move = NO_MOVE
+        if self.table is not None:
+            entry = self.table.probe(key)
+            if entry is not None:
+                entry_depth, bound, score, table_move = entry
+                if entry_depth >= depth:
+                    score = score_from_table(score, ply)
+                    if bound == EXACT:
+                        return score
+                    if bound == LOWER_BOUND and score >= beta:
+                        return score
+                    if bound == UPPER_BOUND and score <= alpha:
+                        return score
+
+        moves = board.find_legal_moves(color)
+        if not moves:
+            return -WIN_SCORE + ply
+
+        first_move = None
+        if table_move != NO_MOVE:
+            for move in moves:
+                if encode_move(move) == table_move:
+                    first_move = move
+                    break
+
+        original_alpha = alpha
+        best = -WIN_SCORE - 1
+        best_move = None
+        if depth == 1 and self.batch_eval:
+            best, best_move = self.search_frontier(board, color, moves, ply)
+            if self.stopped:
+                return 0
+        else:
+            for move in self.order_moves(board, color, moves, first_move, ply):
+                record = board.make_move(move)
+                score = -self.negamax(board, OPPONENT[color], depth - 1, -beta, -alpha, ply + 1)
+                board.unmake_move(record)
+                if self.stopped:
+                    return 0
+                if score > best:
+                    best = score
+                    best_move = move
+                    if score > alpha:
+                        alpha = score
+                        if alpha >= beta:
+                            if not move[2]:
+                                self.record_cutoff(move, depth, ply)
+                            break # The opponent will avoid this position
+
+        if self.table is not None:
+            if best <= original_alpha:
+                bound = UPPER_BOUND
+            elif best >= beta:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            self.table.store(key, depth, bound, score_to_table(best, ply), best_move)
+        return best
+
+    def quiescence_search(self, board, color, alpha, beta, ply):
+        """
+        Search capture sequences only, until the side to move has no capture
+        A quiet position stands pat on its static evaluation, a side with a capture must
+        take one, so the score never depends on a half-finished exchange
+
+        Args:
+            board, BitBoard: The position to search
+            color, str: The color to move
+            alpha, int: The score the color to move is already guaranteed
+            beta, int: The score the opponent is already guaranteed, as seen by the color to move
+            ply, int: The distance from the root
+
+        Returns:
+            int: The evaluation score for the color to move
+        """
+        self.qnodes += 1
+        if self.qnodes & (TIME_CHECK_INTERVAL - 1) == 0 and self.should_stop():
+            self.stopped = True
+        if self.stopped:
+            return 0
+        men, kings, _ = board.color_masks(color)
+        if not (men | kings):
+            return -WIN_SCORE + ply
+        if self.tablebase is not None and board.occupied.bit_count() <= self.tablebase.max_pieces:
+            value, distance = self.tablebase.probe(board, color)
+            return tablebase_score(value, distance, ply)
+
+        # Stand pat when there is nothing to capture
+        if not board.can_jump(color):
+            return self.evaluate(board, color)
+
+        best = -WIN_SCORE - 1
+        for move in self.order_moves(board, color, board.find_capture_sequences(color)):
+            record = board.make_move(move)
+            score = -self.quiescence_search(board, OPPONENT[color], -beta, -alpha, ply + 1)
+            board.unmake_move(record)
+            if self.stopped:
+                return 0
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    def search_frontier(self, board, color, moves, ply):
+        """
+        Score every move of a depth-1 node with one batched evaluation of the child positions
+        There is no pruning here, every child is scored
+        Children left with a capture to make are resolved by the quiescence search instead
+
+        Args:
+            board, BitBoard: The position, restored before returning
+            color, str: The color to move
+            moves, list of tuples: The legal moves
+            ply, int: The distance of the position from the root
+
+        Returns:
+            int: The best score for the color to move
+            tuple: The move that reaches it
+        """
+        self.nodes += len(moves)
+        opponent = OPPONENT[color]
+        children = []
+        known = {} # Children scored exactly without the evaluation
+        for i, move in enumerate(moves):
+            record = board.make_move(move)
+            children.append((board.red_men, board.red_kings, board.black_men, board.black_kings))
+            men, kings, _ = board.color_masks(opponent)
+            if not (men | kings):
+                known[i] = WIN_SCORE - ply - 1
+            elif self.tablebase is not None and board.occupied.bit_count() <= self.tablebase.max_pieces:
+                value, distance = self.tablebase.probe(board, opponent)
+                known[i] = -tablebase_score(value, distance, ply + 1)
+            elif self.quiescence and board.can_jump(opponent):
+                known[i] = -self.quiescence_search(board, opponent, -WIN_SCORE - 1, WIN_SCORE + 1, ply + 1)
+            board.unmake_move(record)
+
+        if self.stopped:
+            return 0, None
+        # The children are scored for the opponent, who moves in them
+        scores = self.evaluate_batch(children, opponent)
+        best, best_move = -WIN_SCORE - 1, None
+        for i, move in enumerate(moves):
+            score = known[i] if i in known else -int(scores[i])
+            if score > best:
+                best, best_move = score, move
+        return best, best_move
+
+    def record_cutoff(self, move, depth, ply):
+        """
+        Remember a quiet move that caused a cutoff, as a killer for its ply and in the history table
+
+        Args:
+            move, tuple: The move
+            depth, int: The remaining depth it cut off at, deeper cutoffs count for more
+            ply, int: The distance of its position from the root
+        """
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers.pop()
+            killers.insert(0, move)
+        self.history[move[0]][move[1]] += depth * depth
+
+    def age_history(self):
+        """
+        Halve the history table so cutoffs from earlier searches weigh less than new ones
+        """
+        for row in self.history:
+            for dst in range(32):
+                row[dst] >>= 1
+
+    def clear_ordering(self):
+        """
+        Forget the killer moves and history, for a new game
+        """
+        self.killers = [[None] * KILLER_SLOTS for _ in range(MAX_DEPTH + 1)]
+        self.history = [[0] * 32 for _ in range(32)]
+
+    def order_moves(self, board, color, moves, first_move=None, ply=None):
+        """
+        Order moves so the ones most likely to cause a cutoff are searched first
+        Captures come first (most pieces captured first), then promotions, then quiet moves,
+        killer moves for the ply ahead of the rest and the rest by their history score
+
+        Args:
+            board, BitBoard: The position the moves are from
+            color, str: The color to move
+            moves, list of tuples: The moves to order
+            first_move, tuple: A move to put ahead of all others if it is in the list
+            ply, int: The distance of the position from the root, None to order without killer moves
+
+        Returns:
+            list of tuples: The moves in search order
+        """
+        men = board.red_men if color == 'red' else board.black_men
+        promotion_mask = RED_PROMOTION_MASK if color == 'red' else BLACK_PROMOTION_MASK
+
+        killers = self.killers[ply] if ply is not None else ()
+        history = self.history
+
+        def move_priority(move):
+            src, dst, captured = move[0], move[1], move[2]
+            priority = captured.bit_count() * 2
+            if (men >> src) & 1 and (1 << dst) & promotion_mask:
+                priority += 1
+            killer = KILLER_SLOTS - killers.index(move) if move in killers else 0
+            return priority, killer, history[src][dst]
+
+        ordered = sorted(moves, key=move_priority, reverse=True)
+        if first_move in ordered:
+            ordered.remove(first_move)
+            ordered.insert(0, first_move)
+        return ordered
@@ -0,0 +1,158 @@
+"""
+Headless self-play: many games between two AI difficulties across a process pool
+
+Each game is seeded, so any game can be replayed from its seed. Games run with no event
+sinks attached, so nothing is printed, and are cut off by the adjudication limits instead
+of running forever.
+One JSON line per game is written as games finish.
+
+Run a match with:
+    python -m src.checkers_game.selfplay --red Minimax --black "Prefer Jumps" --games 1000 --output results.jsonl
+"""
+import argparse
+import json
+import multiprocessing
+import random
+from time import perf_counter
+from .game import Game
+
+
+def play_game(task):
+    """
+    Play one headless game
+
+    Args:
+        task, dict: The game number, seed, and a settings dictionary for each color
+            (difficulty, minimax_depth, time_limit_ms, quiescence), plus the adjudication limits
+            max_plies and material_margin and the Game options book_path and tablebase_dir
+
+    Returns:
+        dict: The game record (players, winner, reason, plies, per-move latency in milliseconds)
+    """
+    random.seed(task['seed'])
+    game = Game(board_mode='classic', start_player='red', table_size_mb=4,
+                tablebase_dir=task.get('tablebase_dir'), book_path=task.get('book_path'), sinks=[],
+                search_processes=1) # Already in a pool worker, which cannot start its own pool
+    if game.book is not None:
+        game.book.rng.seed(task['seed'])
+    players = {'red': task['red'], 'black': task['black']}
+    move_ms = []
+    winner, reason = None, 'max plies'
+
+    for _ in range(task['max_plies']):
+        if not game.find_valid_moves(game.turn):
+            winner, reason = ('black' if game.turn == 'red' else 'red'), 'no moves'
+            break
+        player = players[game.turn]
+        start = perf_counter()
+        game.ai_turn(difficulty=player['difficulty'], minimax_depth=player.get('minimax_depth', 3),
+                     time_limit_ms=player.get('time_limit_ms'), quiescence=player.get('quiescence', True))
+        move_ms.append(round((perf_counter() - start) * 1000, 3))
+
+        if game.board.black_count == 0:
+            winner, reason = 'red', 'captured all'
+            break
+        if game.board.red_count == 0:
+            winner, reason = 'black', 'captured all'
+            break
+        margin = task.get('material_margin')
+        if margin and abs(game.board.red_count - game.board.black_count) >= margin:
+            winner, reason = ('red' if game.board.red_count > game.board.black_count else 'black'), 'adjudicated'
+            break
+        game.switch_turn()
+    game.close()
+
+    return {
+        'game': task['game'],
+        'seed': task['seed'],
+        'red': players['red']['difficulty'],
+        'black': players['black']['difficulty'],
+        'winner': winner,
+        'reason': reason,
+        'plies': len(move_ms),
+        'move_ms': move_ms,
+    }
+
+
+def run_match(red, black, games, output, processes=None, seed=0, max_plies=200, material_margin=None,
+              alternate_colors=True, book_path=None, tablebase_dir=None):
+    """
+    Play a match and stream the game records to a JSONL file
+
+    Args:
+        red, dict: Settings for the first player (difficulty, minimax_depth, time_limit_ms, quiescence)
+        black, dict: Settings for the second player
+        games, int: The number of games
+        output, str: The JSONL file to write
+        processes, int: The number of worker processes, defaults to the number of cores
+        seed, int: The base seed, game i uses seed + i
+        max_plies, int: Games still going after this many moves are draws
+        material_margin, int: A lead of this many pieces wins the game, None to play it out
+        alternate_colors, bool: Whether the players swap colors every other game
+        book_path, str: Opening book file for Minimax players, or None
+        tablebase_dir, str: Directory of endgame tables for Minimax players, or None
+
+    Returns:
+        dict: Wins for each player and the number of draws
+    """
+    tasks = []
+    for i in range(games):
+        swap = alternate_colors and i % 2 == 1
+        tasks.append({
+            'game': i,
+            'seed': seed + i,
+            'red': black if swap else red,
+            'black': red if swap else black,
+            'swapped': swap,
+            'max_plies': max_plies,
+            'material_margin': material_margin,
+            'book_path': book_path,
+            'tablebase_dir': tablebase_dir,
+        })
+
+    totals = {'first': 0, 'second': 0, 'draws': 0}
+    with multiprocessing.Pool(processes) as pool, open(output, 'w') as f:
+        for record in pool.imap_unordered(play_game, tasks):
+            swapped = tasks[record['game']]['swapped']
+            if record['winner'] is None:
+                totals['draws'] += 1
+            elif (record['winner'] == 'red') != swapped:
+                totals['first'] += 1
+            else:
+                totals['second'] += 1
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play headless self-play games between two AI difficulties")
+    parser.add_argument('--red', default='Minimax', help="Difficulty of the first player")
+    parser.add_argument('--black', default='Random', help="Difficulty of the second player")
+    parser.add_argument('--red-depth', type=int, default=3, help="Minimax depth of the first player")
+    parser.add_argument('--black-depth', type=int, default=3, help="Minimax depth of the second player")
+    parser.add_argument('--red-time-ms', type=int, help="Minimax time per move of the first player")
+    parser.add_argument('--black-time-ms', type=int, help="Minimax time per move of the second player")
+    parser.add_argument('--red-no-quiescence', action='store_true', help="Cut the first player's Minimax off at its depth, mid-exchange or not")
+    parser.add_argument('--black-no-quiescence', action='store_true', help="Cut the second player's Minimax off at its depth, mid-exchange or not")
+    parser.add_argument('--games', type=int, default=100, help="Number of games")
+    parser.add_argument('--processes', type=int, help="Worker processes, defaults to the number of cores")
+    parser.add_argument('--seed', type=int, default=0, help="Base seed")
+    parser.add_argument('--max-plies', type=int, default=200, help="Moves before a game is called a draw")
+    parser.add_argument('--material-margin', type=int, help="Piece lead that wins a game early")
+    parser.add_argument('--same-colors', action='store_true', help="Do not swap colors between games")
+    parser.add_argument('--book', help="Opening book file")
+    parser.add_argument('--tablebase', help="Endgame tablebase directory")
+    parser.add_argument('--output', default='selfplay.jsonl', help="JSONL file for the game records")
+    args = parser.parse_args()
+
+    first = {'difficulty': args.red, 'minimax_depth': args.red_depth, 'time_limit_ms': args.red_time_ms,
+             'quiescence': not args.red_no_quiescence}
+    second = {'difficulty': args.black, 'minimax_depth': args.black_depth, 'time_limit_ms': args.black_time_ms,
+              'quiescence': not args.black_no_quiescence}
+    start = perf_counter()
+    totals = run_match(first, second, args.games, args.output, processes=args.processes, seed=args.seed,
+                       max_plies=args.max_plies, material_margin=args.material_margin,
+                       alternate_colors=not args.same_colors, book_path=args.book, tablebase_dir=args.tablebase)
+    print(f"{args.red}: {totals['first']} wins, {args.black}: {totals['second']} wins, "
+          f"{totals['draws']} draws in {perf_counter() - start:.1f}s")
@@ -0,0 +1,454 @@
+"""
+Endgame tablebases: win/loss/draw databases built by retrograde analysis
+
+Every position with up to N pieces is solved offline, one material signature
+(red men, red kings, black men, black kings) at a time, and saved to its own file.
+The engine reads the files through mmap, so a lookup costs one page access instead of a search.
+
+Positions are stored with red to move only. A position with black to move is rotated
+180 degrees and has its colors swapped, which gives the same position with red to move.
+Values are packed four to a byte (2 bits each), optionally followed by one byte per
+position giving the distance to the end of the game in plies.
+
+Build the files with:
+    python -m src.checkers_game.tablebase --pieces 4 --output tablebases
+"""
+import argparse
+import mmap
+import os
+import struct
+from array import array
+from itertools import combinations
+from math import comb
+from time import perf_counter
+from .bitboard import BitBoard
+
+# Values for the side to move
+DRAW = 0
+WIN = 1
+LOSS = 2
+
+MAGIC = b'CKTB'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBBBBI') # magic, version, red men, red kings, black men, black kings, flags, size
+FLAG_DTW = 1 # The file has distance-to-win bytes
+MAX_DTW = 255
+
+RED_MEN_SQUARES = tuple(range(28)) # Red men are crowned on squares 28-31
+BLACK_MEN_SQUARES = tuple(range(4, 32)) # Black men are crowned on squares 0-3
+
+_REVERSED_BYTES = bytes(int(f'{value:08b}'[::-1], 2) for value in range(256))
+
+
+def rotate_mask(mask):
+    """
+    Rotate a mask 180 degrees, square s becomes square 31 - s
+
+    Args:
+        mask, int: The 32-bit mask to rotate
+
+    Returns:
+        int: The rotated mask
+    """
+    return (_REVERSED_BYTES[mask & 0xFF] << 24 | _REVERSED_BYTES[(mask >> 8) & 0xFF] << 16
+            | _REVERSED_BYTES[(mask >> 16) & 0xFF] << 8 | _REVERSED_BYTES[mask >> 24])
+
+
+def flip_masks(red_men, red_kings, black_men, black_kings):
+    """
+    Rotate the board and swap the colors, so the side to move becomes red
+
+    Returns:
+        tuple: (red men, red kings, black men, black kings) of the flipped position
+    """
+    return rotate_mask(black_men), rotate_mask(black_kings), rotate_mask(red_men), rotate_mask(red_kings)
+
+
+def signature_of(red_men, red_kings, black_men, black_kings):
+    """
+    Get the material signature of a position
+
+    Returns:
+        tuple: (red men, red kings, black men, black kings) piece counts
+    """
+    return red_men.bit_count(), red_kings.bit_count(), black_men.bit_count(), black_kings.bit_count()
+
+
+def swap_signature(signature):
+    """
+    Get the signature of the flipped position
+
+    Args:
+        signature, tuple: (red men, red kings, black men, black kings)
+
+    Returns:
+        tuple: The signature with colors swapped
+    """
+    return signature[2], signature[3], signature[0], signature[1]
+
+
+def table_size(signature):
+    """
+    Get the number of index slots for a signature (some slots hold impossible positions)
+
+    Args:
+        signature, tuple: (red men, red kings, black men, black kings)
+
+    Returns:
+        int: The size of the table
+    """
+    size = 1
+    for count in signature:
+        size *= comb(32, count)
+    return size
+
+
+def rank_mask(mask):
+    """
+    Rank a set of squares among all sets of the same size (combinatorial number system)
+
+    Args:
+        mask, int: The squares as a 32-bit mask
+
+    Returns:
+        int: The rank of the set
+    """
+    rank = 0
+    i = 1
+    while mask:
+        low_bit = mask & -mask
+        rank += comb(low_bit.bit_length() - 1, i)
+        mask ^= low_bit
+        i += 1
+    return rank
+
+
+def position_index(signature, red_men, red_kings, black_men, black_kings):
+    """
+    Get a position's slot in its signature's table
+
+    Args:
+        signature, tuple: The position's (red men, red kings, black men, black kings) counts
+        red_men, int: Mask of red men
+        red_kings, int: Mask of red kings
+        black_men, int: Mask of black men
+        black_kings, int: Mask of black kings
+
+    Returns:
+        int: The index of the position
+    """
+    index = rank_mask(red_men)
+    index = index * comb(32, signature[1]) + rank_mask(red_kings)
+    index = index * comb(32, signature[2]) + rank_mask(black_men)
+    return index * comb(32, signature[3]) + rank_mask(black_kings)
+
+
+def signatures_up_to(max_pieces):
+    """
+    List every signature with both colors present and at most max_pieces pieces,
+    in an order where captures and promotions always lead to a signature earlier in the list
+
+    Args:
+        max_pieces, int: The largest number of pieces on the board
+
+    Returns:
+        list of tuples: The signatures in solving order
+    """
+    signatures = []
+    for red_men in range(max_pieces + 1):
+        for red_kings in range(max_pieces + 1 - red_men):
+            for black_men in range(max_pieces + 1 - red_men - red_kings):
+                for black_kings in range(max_pieces + 1 - red_men - red_kings - black_men):
+                    if red_men + red_kings > 0 and black_men + black_kings > 0:
+                        signatures.append((red_men, red_kings, black_men, black_kings))
+    # Captures lower the piece count, promotions lower the man count
+    signatures.sort(key=lambda s: (sum(s), s[0] + s[2], max(s), s))
+    return signatures
+
+
+def iterate_positions(signature):
+    """
+    Yield every legal placement of a signature's pieces
+
+    Args:
+        signature, tuple: (red men, red kings, black men, black kings)
+
+    Yields:
+        tuple: (red men, red kings, black men, black kings) masks
+    """
+    red_men_count, red_kings_count, black_men_count, black_kings_count = signature
+    for red_men in combinations(RED_MEN_SQUARES, red_men_count):
+        red_men_mask = sum(1 << square for square in red_men)
+        for red_kings in combinations(range(32), red_kings_count):
+            red_kings_mask = sum(1 << square for square in red_kings)
+            if red_kings_mask & red_men_mask:
+                continue
+            red = red_men_mask | red_kings_mask
+            for black_men in combinations(BLACK_MEN_SQUARES, black_men_count):
+                black_men_mask = sum(1 << square for square in black_men)
+                if black_men_mask & red:
+                    continue
+                for black_kings in combinations(range(32), black_kings_count):
+                    black_kings_mask = sum(1 << square for square in black_kings)
+                    if black_kings_mask & (red | black_men_mask):
+                        continue
+                    yield red_men_mask, red_kings_mask, black_men_mask, black_kings_mask
+
+
+def solve_signatures(group, solved):
+    """
+    Solve a signature and its color-swapped twin together by retrograde analysis
+
+    Quiet moves from one signature lead into the other (the side to move changes), while
+    captures and promotions lead into signatures that are already solved. Positions are
+    settled in order of distance to the end of the game: a position is won if some move
+    reaches a lost position, and lost once every move reaches a won position.
+    Whatever is never settled is a draw.
+
+    Args:
+        group, list of tuples: The signature, plus its twin if that is a different signature
+        solved, dict: Signature to (values, distances) bytearrays for solved signatures, updated in place
+    """
+    offsets = {}
+    total = 0
+    for signature in group:
+        offsets[signature] = total
+        total += table_size(signature)
+
+    values = bytearray(total)
+    distances = bytearray(total)
+    final = bytearray(total)
+    remaining = array('i', [0]) * total # Moves not yet known to lose
+    loss_floor = bytearray(total) # Shortest possible loss, from moves into solved signatures that lose
+    win_bound = bytearray([MAX_DTW]) * total # Best win found through moves into solved signatures
+    edge_from = array('i')
+    edge_to = array('i')
+    buckets = [[] for _ in range(MAX_DTW + 2)]
+
+    for signature in group:
+        offset = offsets[signature]
+        for masks in iterate_positions(signature):
+            node = offset + position_index(signature, *masks)
+            board = BitBoard(*masks, hash=0, score=0)
+            moves = board.find_legal_moves('red')
+            if not moves:
+                buckets[0].append((node, LOSS))
+                continue
+            for move in moves:
+                record = board.make_move(move)
+                child = flip_masks(board.red_men, board.red_kings, board.black_men, board.black_kings)
+                board.unmake_move(record)
+                if not (child[0] | child[1]):
+                    # Captured the last opposing piece
+                    win_bound[node] = 1
+                    remaining[node] += 1
+                    continue
+                child_signature = signature_of(*child)
+                if child_signature in offsets:
+                    edge_from.append(node)
+                    edge_to.append(offsets[child_signature] + position_index(child_signature, *child))
+                    remaining[node] += 1
+                    continue
+                child_values, child_distances = solved[child_signature]
+                child_index = position_index(child_signature, *child)
+                child_value = child_values[child_index]
+                if child_value == WIN:
+                    loss_floor[node] = max(loss_floor[node], min(child_distances[child_index] + 1, MAX_DTW))
+                else:
+                    remaining[node] += 1
+                    if child_value == LOSS:
+                        win_bound[node] = min(win_bound[node], child_distances[child_index] + 1)
+            if win_bound[node] < MAX_DTW:
+                buckets[win_bound[node]].append((node, WIN))
+            elif remaining[node] == 0:
+                buckets[loss_floor[node]].append((node, LOSS))
+
+    # Predecessor lists, grouped by destination
+    predecessor_start = array('i', [0]) * (total + 1)
+    for node in edge_to:
+        predecessor_start[node + 1] += 1
+    for node in range(total):
+        predecessor_start[node + 1] += predecessor_start[node]
+    fill = array('i', predecessor_start)
+    predecessors = array('i', [0]) * len(edge_to)
+    for source, node in zip(edge_from, edge_to):
+        predecessors[fill[node]] = source
+        fill[node] += 1
+
+    # Settle positions in order of distance
+    for distance in range(MAX_DTW + 1):
+        for node, value in buckets[distance]:
+            if final[node]:
+                continue
+            final[node] = 1
+            values[node] = value
+            distances[node] = distance
+            next_distance = min(distance + 1, MAX_DTW)
+            for i in range(predecessor_start[node], predecessor_start[node + 1]):
+                parent = predecessors[i]
+                if final[parent]:
+                    continue
+                if value == LOSS:
+                    buckets[next_distance].append((parent, WIN))
+                else:
+                    remaining[parent] -= 1
+                    if remaining[parent] == 0:
+                        buckets[max(next_distance, loss_floor[parent])].append((parent, LOSS))
+
+    for signature in group:
+        start = offsets[signature]
+        end = start + table_size(signature)
+        solved[signature] = (values[start:end], distances[start:end])
+
+
+def table_path(directory, signature):
+    """
+    Get the file name for a signature's table
+
+    Args:
+        directory, str: The tablebase directory
+        signature, tuple: (red men, red kings, black men, black kings)
+
+    Returns:
+        str: The path of the table file
+    """
+    return os.path.join(directory, 'tb_{}{}{}{}.bin'.format(*signature))
+
+
+def write_table(directory, signature, values, distances=None):
+    """
+    Write one signature's table with values packed four to a byte
+
+    Args:
+        directory, str: The tablebase directory
+        signature, tuple: (red men, red kings, black men, black kings)
+        values, bytearray: One value per index
+        distances, bytearray: One distance per index, or None to leave them out
+    """
+    packed = bytearray((len(values) + 3) // 4)
+    for index, value in enumerate(values):
+        if value:
+            packed[index >> 2] |= value << ((index & 3) * 2)
+    with open(table_path(directory, signature), 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, *signature, FLAG_DTW if distances is not None else 0, len(values)))
+        f.write(packed)
+        if distances is not None:
+            f.write(distances)
+
+
+def generate(max_pieces, directory, with_distances=True):
+    """
+    Build and write the tables for every signature with up to max_pieces pieces
+
+    Args:
+        max_pieces, int: The largest number of pieces on the board
+        directory, str: The directory to write the tables to
+        with_distances, bool: Whether to store the distance to the end of the game
+    """
+    os.makedirs(directory, exist_ok=True)
+    solved = {}
+    for signature in signatures_up_to(max_pieces):
+        if signature in solved:
+            continue
+        group = [signature]
+        if swap_signature(signature) != signature:
+            group.append(swap_signature(signature))
+        start = perf_counter()
+        solve_signatures(group, solved)
+        for member in group:
+            values, distances = solved[member]
+            write_table(directory, member, values, distances if with_distances else None)
+            print(f"Solved {member}: {values.count(WIN)} wins, {values.count(LOSS)} losses, "
+                  f"{len(values)} slots in {perf_counter() - start:.1f}s")
+
+
+class EndgameTablebase:
+    def __init__(self, directory):
+        """
+        Open the tables in a directory for lookups
+
+        Args:
+            directory, str: The directory holding the table files
+
+        Attributes:
+            max_pieces: The largest piece count for which every signature is available
+        """
+        self.directory = directory
+        self.tables = {}
+        self.files = []
+        for name in sorted(os.listdir(directory)):
+            if name.startswith('tb_') and name.endswith('.bin'):
+                self._open_table(os.path.join(directory, name))
+        self.max_pieces = 0
+        while all(signature in self.tables for signature in signatures_up_to(self.max_pieces + 1)):
+            self.max_pieces += 1
+            if self.max_pieces >= 12:
+                break
+
+    def _open_table(self, path):
+        """
+        Memory-map one table file
+
+        Args:
+            path, str: The path of the table file
+        """
+        f = open(path, 'rb')
+        table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, red_men, red_kings, black_men, black_kings, flags, size = HEADER.unpack_from(table, 0)
+        if magic != MAGIC or version != VERSION:
+            table.close()
+            f.close()
+            raise ValueError("Not a tablebase file: " + path)
+        distance_offset = HEADER.size + (size + 3) // 4 if flags & FLAG_DTW else -1
+        self.tables[(red_men, red_kings, black_men, black_kings)] = (table, distance_offset)
+        self.files.append(f)
+
+    def probe(self, board, color):
+        """
+        Look up a position
+
+        Args:
+            board, BitBoard: The position
+            color, str: The color to move
+
+        Returns:
+            tuple: (value, distance) for the color to move, distance is None if the table has none,
+                or None if the position is not covered
+        """
+        if color == 'red':
+            masks = (board.red_men, board.red_kings, board.black_men, board.black_kings)
+        else:
+            masks = flip_masks(board.red_men, board.red_kings, board.black_men, board.black_kings)
+        if not (masks[0] | masks[1]):
+            return LOSS, 0
+        if not (masks[2] | masks[3]):
+            return WIN, 0
+        signature = signature_of(*masks)
+        entry = self.tables.get(signature)
+        if entry is None:
+            return None
+        table, distance_offset = entry
+        index = position_index(signature, *masks)
+        value = (table[HEADER.size + (index >> 2)] >> ((index & 3) * 2)) & 3
+        distance = table[distance_offset + index] if distance_offset >= 0 else None
+        return value, distance
+
+    def close(self):
+        """
+        Close every table file
+        """
+        for table, _ in self.tables.values():
+            table.close()
+        for f in self.files:
+            f.close()
+        self.tables = {}
+        self.files = []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build checkers endgame tablebases by retrograde analysis")
+    parser.add_argument('--pieces', type=int, default=4, help="Largest number of pieces on the board")
+    parser.add_argument('--output', default='tablebases', help="Directory to write the tables to")
+    parser.add_argument('--no-dtw', action='store_true', help="Leave out the distance-to-win bytes")
+    args = parser.parse_args()
+    generate(args.pieces, args.output, with_distances=not args.no_dtw)
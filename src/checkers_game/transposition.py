@@ -0,0 +1,118 @@
+"""
+Fixed-size transposition table for the game-tree search
+
+Entries are kept in flat typed arrays rather than Python objects, so the table costs a
+fixed number of bytes per slot and its size can be picked to fit the machine: a few MB
+on the Raspberry Pi, hundreds on an analysis server.
+
+Each position hashes to one slot. A new result replaces the stored one if it was
+searched at least as deep, or if the stored one is left over from an earlier search.
+"""
+from array import array
+
+# Bound types for stored scores
+EXACT = 0 # The score is exact
+LOWER_BOUND = 1 # The search failed high, the real score is at least this
+UPPER_BOUND = 2 # The search failed low, the real score is at most this
+
+ENTRY_BYTES = 23 # key (8) + move (8) + score (4) + depth, bound and age (1 each)
+NO_MOVE = 0xFFFFFFFFFFFFFFFF
+
+
+def encode_move(move):
+    """
+    Pack a move into one integer for storage
+
+    Args:
+        move, tuple: (source square, destination square, captured mask, ...)
+
+    Returns:
+        int: The packed move
+    """
+    return move[0] | (move[1] << 5) | (move[2] << 10)
+
+
+class TranspositionTable:
+    def __init__(self, size_mb=16):
+        """
+        Allocate the table
+
+        Args:
+            size_mb, float: Memory budget in megabytes, rounded down to a power-of-two number of slots
+
+        Attributes:
+            size: The number of slots
+            age: The current search generation, bumped by new_search
+        """
+        slots = max(1, int(size_mb * 2 ** 20) // ENTRY_BYTES)
+        self.size = 1 << (slots.bit_length() - 1)
+        self.mask = self.size - 1
+        self.age = 0
+        self.keys = array('Q', [0]) * self.size
+        self.moves = array('Q', [NO_MOVE]) * self.size
+        self.scores = array('i', [0]) * self.size
+        self.depths = array('b', [-1]) * self.size # -1 marks an empty slot
+        self.bounds = array('B', [0]) * self.size
+        self.ages = array('B', [0]) * self.size
+
+    def new_search(self):
+        """
+        Start a new search generation so entries from earlier searches can be replaced
+        """
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        """
+        Empty the table
+        """
+        for i in range(self.size):
+            self.depths[i] = -1
+            self.moves[i] = NO_MOVE
+
+    def probe(self, key):
+        """
+        Look up a position
+
+        Args:
+            key, int: The position's 64-bit hash, including the side to move
+
+        Returns:
+            tuple: (depth, bound, score, packed move or NO_MOVE), or None if the position is not stored
+        """
+        index = key & self.mask
+        if self.depths[index] < 0 or self.keys[index] != key:
+            return None
+        return self.depths[index], self.bounds[index], self.scores[index], self.moves[index]
+
+    def store(self, key, depth, bound, score, move):
+        """
+        Store a search result, keeping the deeper of the old and new entries
+
+        Args:
+            key, int: The position's 64-bit hash, including the side to move
+            depth, int: The depth the position was searched to
+            bound, int: EXACT, LOWER_BOUND or UPPER_BOUND
+            score, int: The score from the point of view of the side to move
+            move, tuple: The best move found, or None
+        """
+        index = key & self.mask
+        stored_depth = self.depths[index]
+        if stored_depth >= 0 and depth < stored_depth and self.ages[index] == self.age and self.keys[index] != key:
+            return # Keep the deeper entry from this search
+
+        # Keep the old best move if this search did not find one for the same position
+        if move is not None:
+            self.moves[index] = encode_move(move)
+        elif self.keys[index] != key:
+            self.moves[index] = NO_MOVE
+        self.keys[index] = key
+        self.depths[index] = min(depth, 127)
+        self.bounds[index] = bound
+        self.scores[index] = score
+        self.ages[index] = self.age
+
+    def memory_bytes(self):
+        """
+        Return the memory used by the entry arrays in bytes
+        """
+        return self.size * ENTRY_BYTES
@@ -0,0 +1,434 @@
+"""
+Neural-network value evaluation, trained offline on self-play games
+
+A small MLP reads a position as 4 planes of 32 squares (men and kings for the side to
+move, then for the opponent), always seen from the side to move, so one network plays
+both colors. It outputs the expected result for the side to move in [-1, 1], which is
+scaled into search score units.
+
+Inference runs on the CPU with the Linear layers quantized to int8, and always in
+batches: the search hands it every child of a depth-1 node at once (see
+SearchEngine.search_frontier), and parallel search workers send their batches through
+one shared queue to an InferenceServer, which merges the requests of all workers into a
+single forward pass.
+
+torch is only needed for training and inference and is imported on first use, so importing
+this module (and the game, which imports it only when a network is given) stays cheap.
+Generating training data does not need it.
+
+    python -m src.checkers_game.value_net generate --games 2000 --output value_data.npz
+    python -m src.checkers_game.value_net train --data value_data.npz --output value_net.pt
+    python -m src.checkers_game.value_net bench --model value_net.pt
+"""
+import argparse
+import multiprocessing
+import queue
+import random
+import threading
+from time import perf_counter
+import numpy as np
+from .search import SearchEngine, OPPONENT
+from .board import Board
+
+INPUT_SIZE = 4 * 32
+HIDDEN_SIZES = (128, 64)
+VALUE_SCALE = 1000 # Search score of a certain win, far below WIN_THRESHOLD so it never looks forced
+BATCH_SIZE = 256 # Most positions the inference server puts in one forward pass
+MAX_WAIT_MS = 1.0 # How long the inference server waits for more requests to fill a batch
+_SHIFTS = np.arange(32, dtype=np.uint32)
+
+
+def require_torch():
+    """
+    Import torch, which the value network needs and nothing else does
+
+    Returns:
+        module: torch, raises ImportError if it is not installed
+    """
+    try:
+        import torch
+    except ImportError: # The value network is optional
+        raise ImportError("The value network needs torch, install it with: pip install torch") from None
+    return torch
+
+
+def encode_positions(masks, color):
+    """
+    Turn positions into network inputs, seen from the side to move
+
+    Args:
+        masks, np.ndarray: (positions, 4) uint32 masks of red men, red kings, black men, black kings
+        color, str or np.ndarray: The color to move, one for all positions or 'red'/'black' per position
+
+    Returns:
+        np.ndarray: (positions, 128) float32 inputs
+    """
+    masks = np.asarray(masks, dtype=np.uint32).reshape(-1, 4)
+    planes = ((masks[..., None] >> _SHIFTS) & 1).astype(np.float32)
+    # Black to move: rotate the board 180 degrees and swap the colors so the side to move is always first
+    black = np.broadcast_to(np.asarray(color) == 'black', (len(masks),))
+    planes[black] = planes[black][:, [2, 3, 0, 1], ::-1]
+    return planes.reshape(len(masks), INPUT_SIZE)
+
+
+def build_model(hidden_sizes=HIDDEN_SIZES):
+    """
+    Build an untrained value network
+
+    Args:
+        hidden_sizes, tuple: The width of each hidden layer
+
+    Returns:
+        nn.Sequential: The network, 128 inputs to one tanh output
+    """
+    nn = require_torch().nn
+    layers = []
+    width = INPUT_SIZE
+    for size in hidden_sizes:
+        layers += [nn.Linear(width, size), nn.ReLU()]
+        width = size
+    layers += [nn.Linear(width, 1), nn.Tanh()]
+    return nn.Sequential(*layers)
+
+
+def load_model(path, quantize=True):
+    """
+    Load a trained network for CPU inference
+
+    Args:
+        path, str: The file written by train
+        quantize, bool: Whether to quantize the Linear layers to int8
+
+    Returns:
+        nn.Module: The network in eval mode
+    """
+    torch = require_torch()
+    saved = torch.load(path, map_location='cpu')
+    model = build_model(tuple(saved['hidden_sizes']))
+    model.load_state_dict(saved['state_dict'])
+    model.eval()
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+class ValueNetEvaluator:
+    def __init__(self, path, quantize=True, threads=1):
+        """
+        Load a value network as a search evaluator, see SearchEngine's evaluator argument
+
+        Args:
+            path, str: The file written by train
+            quantize, bool: Whether to run the Linear layers in int8
+            threads, int: CPU threads for each forward pass
+        """
+        self.torch = require_torch()
+        self.torch.set_num_threads(threads)
+        self.model = load_model(path, quantize)
+
+    def evaluate_batch(self, masks, color):
+        """
+        Score a stack of positions for the color to move in them
+
+        Args:
+            masks, np.ndarray: (positions, 4) uint32 masks of red men, red kings, black men, black kings
+            color, str or np.ndarray: The color to move, one for all positions or one per position
+
+        Returns:
+            np.ndarray: int32 scores for the side to move
+        """
+        inputs = self.torch.from_numpy(encode_positions(masks, color))
+        with self.torch.inference_mode():
+            values = self.model(inputs).numpy().reshape(-1)
+        return np.rint(values * VALUE_SCALE).astype(np.int32)
+
+    def evaluate_position(self, board, color):
+        """
+        Score one position, prefer evaluate_batch where there are several
+
+        Args:
+            board, BitBoard: The position
+            color, str: The color to move
+
+        Returns:
+            int: The score for the color to move
+        """
+        masks = [(board.red_men, board.red_kings, board.black_men, board.black_kings)]
+        return int(self.evaluate_batch(masks, color)[0])
+
+
+class InferenceServer:
+    def __init__(self, path, quantize=True, batch_size=BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, clients=1):
+        """
+        Serve value-network requests from search worker processes on a background thread
+        Requests from all workers are merged into one forward pass
+
+        Args:
+            path, str: The file written by train
+            quantize, bool: Whether to run the Linear layers in int8
+            batch_size, int: Most positions per forward pass, requests are never split
+            max_wait_ms, float: How long to wait for more requests before running a partial batch
+            clients, int: The number of RemoteEvaluators that will be connected
+
+        Attributes:
+            requests: The queue shared by every worker, of (client id, masks, colors)
+            responses: One queue per client for its scores
+            batches: The number of forward passes run
+            positions: The number of positions scored
+        """
+        self.evaluator = ValueNetEvaluator(path, quantize)
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = multiprocessing.Queue()
+        self.responses = [multiprocessing.Queue() for _ in range(clients)]
+        self.next_client = multiprocessing.Value('i', 0)
+        self.batches = 0
+        self.positions = 0
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def client_args(self):
+        """
+        Get what a worker process needs to build its RemoteEvaluator, pass these to the process
+
+        Returns:
+            tuple: (requests queue, response queues, client counter)
+        """
+        return self.requests, self.responses, self.next_client
+
+    def serve(self):
+        """
+        Answer requests until a None request arrives
+        """
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            pending = [request]
+            size = len(request[1])
+            deadline = perf_counter() + self.max_wait
+            # Gather more requests while the batch has room and the wait is short
+            while size < self.batch_size:
+                try:
+                    request = self.requests.get(timeout=max(deadline - perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.answer(pending)
+                    return
+                pending.append(request)
+                size += len(request[1])
+            self.answer(pending)
+
+    def answer(self, pending):
+        """
+        Score a batch of requests in one forward pass and send each client its scores
+
+        Args:
+            pending, list of tuples: (client id, masks, colors) requests
+        """
+        masks = np.concatenate([masks for _, masks, _ in pending])
+        colors = np.concatenate([colors for _, _, colors in pending])
+        scores = self.evaluator.evaluate_batch(masks, colors)
+        self.batches += 1
+        self.positions += len(masks)
+        start = 0
+        for client, request_masks, _ in pending:
+            self.responses[client].put(scores[start:start + len(request_masks)])
+            start += len(request_masks)
+
+    def close(self):
+        """
+        Stop the serving thread
+        """
+        self.requests.put(None)
+        self.thread.join()
+
+
+class RemoteEvaluator:
+    def __init__(self, requests, responses, next_client):
+        """
+        Evaluate through an InferenceServer, for use inside a search worker process
+
+        Args:
+            requests, multiprocessing.Queue: The server's shared request queue
+            responses, list of multiprocessing.Queue: The server's response queues
+            next_client, multiprocessing.Value: Counter used to claim a response queue
+        """
+        with next_client.get_lock():
+            self.client = next_client.value
+            next_client.value += 1
+        self.requests = requests
+        self.response = responses[self.client]
+
+    def evaluate_batch(self, masks, color):
+        """
+        Score a stack of positions for the color to move in them, see ValueNetEvaluator.evaluate_batch
+        """
+        masks = np.asarray(masks, dtype=np.uint32).reshape(-1, 4)
+        colors = np.broadcast_to(np.asarray(color, dtype='<U5'), (len(masks),))
+        self.requests.put((self.client, masks, colors))
+        return self.response.get()
+
+    def evaluate_position(self, board, color):
+        """
+        Score one position, see ValueNetEvaluator.evaluate_position
+        """
+        masks = [(board.red_men, board.red_kings, board.black_men, board.black_kings)]
+        return int(self.evaluate_batch(masks, color)[0])
+
+
+def _play_training_game(task):
+    """
+    Play one self-play game and label its positions with the result
+
+    Args:
+        task, tuple: (seed, search depth, chance of a random move, maximum plies)
+
+    Returns:
+        list of tuples: (red men, red kings, black men, black kings, color to move, result for the side to move)
+    """
+    seed, depth, randomness, max_plies = task
+    rng = random.Random(seed)
+    engine = SearchEngine(table_size_mb=1)
+    board = Board(mode='classic').to_bitboard()
+    color = 'red'
+    positions = []
+    winner = None
+    for _ in range(max_plies):
+        moves = board.find_legal_moves(color)
+        if not moves:
+            winner = OPPONENT[color]
+            break
+        positions.append((board.red_men, board.red_kings, board.black_men, board.black_kings, color))
+        if rng.random() < randomness:
+            move = rng.choice(moves)
+        else:
+            _, move = engine.search(board, color, depth)
+        board.make_move(move)
+        color = OPPONENT[color]
+    return [masks + (0 if winner is None else 1 if winner == masks[4] else -1,) for masks in positions]
+
+
+def generate(games, output, depth=3, randomness=0.1, max_plies=200, seed=0, processes=None):
+    """
+    Play self-play games across a process pool and save their positions with results
+
+    Args:
+        games, int: The number of games
+        output, str: The .npz file to write
+        depth, int: The search depth for each move
+        randomness, float: The chance of playing a random move, so the games branch out
+        max_plies, int: Games still going after this many moves count as draws
+        seed, int: Base seed, game i uses seed + i
+        processes, int: Worker processes, defaults to the number of cores
+
+    Returns:
+        int: The number of positions written
+    """
+    tasks = [(seed + i, depth, randomness, max_plies) for i in range(games)]
+    rows = []
+    with multiprocessing.Pool(processes) as pool:
+        for game in pool.imap_unordered(_play_training_game, tasks):
+            rows.extend(game)
+    masks = np.array([row[:4] for row in rows], dtype=np.uint32).reshape(-1, 4)
+    colors = np.array([row[4] == 'black' for row in rows], dtype=np.uint8)
+    results = np.array([row[5] for row in rows], dtype=np.int8)
+    np.savez_compressed(output, masks=masks, black_to_move=colors, results=results)
+    return len(rows)
+
+
+def train(data, output, epochs=10, batch_size=512, learning_rate=1e-3, hidden_sizes=HIDDEN_SIZES, seed=0):
+    """
+    Train a value network on generated positions
+
+    Args:
+        data, str: The .npz file written by generate
+        output, str: The file to save the network to
+        epochs, int: Passes over the data
+        batch_size, int: Positions per training step
+        learning_rate, float: Adam learning rate
+        hidden_sizes, tuple: The width of each hidden layer
+        seed, int: Seed for the initial weights and the shuffling
+
+    Returns:
+        float: The mean squared error over the last epoch
+    """
+    torch = require_torch()
+    torch.manual_seed(seed)
+    saved = np.load(data)
+    colors = np.where(saved['black_to_move'] == 1, 'black', 'red')
+    inputs = torch.from_numpy(encode_positions(saved['masks'], colors))
+    targets = torch.from_numpy(saved['results'].astype(np.float32)).unsqueeze(1)
+
+    model = build_model(hidden_sizes)
+    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+    loss_fn = torch.nn.MSELoss()
+    generator = torch.Generator().manual_seed(seed)
+    for epoch in range(epochs):
+        order = torch.randperm(len(inputs), generator=generator)
+        total = 0.0
+        for start in range(0, len(inputs), batch_size):
+            batch = order[start:start + batch_size]
+            optimizer.zero_grad()
+            loss = loss_fn(model(inputs[batch]), targets[batch])
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(batch)
+        mse = total / len(inputs)
+        print(f"Epoch {epoch + 1}: mse {mse:.4f}")
+    torch.save({'hidden_sizes': list(hidden_sizes), 'state_dict': model.state_dict()}, output)
+    return mse
+
+
+def bench(path, positions=4096, batch_size=BATCH_SIZE):
+    """
+    Time inference with and without int8 quantization
+
+    Args:
+        path, str: The file written by train
+        positions, int: The number of random positions to score
+        batch_size, int: Positions per forward pass
+
+    Returns:
+        dict: Positions per second for the float and int8 networks
+    """
+    rng = np.random.default_rng(0)
+    masks = rng.integers(0, 2 ** 32, size=(positions, 4), dtype=np.uint32) & np.uint32(0x0F0F0F0F)
+    report = {}
+    for quantize in (False, True):
+        evaluator = ValueNetEvaluator(path, quantize)
+        start = perf_counter()
+        for i in range(0, positions, batch_size):
+            evaluator.evaluate_batch(masks[i:i + batch_size], 'red')
+        report['int8' if quantize else 'float32'] = round(positions / (perf_counter() - start))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate data for, train and time the value network")
+    commands = parser.add_subparsers(dest='command', required=True)
+    parser_generate = commands.add_parser('generate', help="Play self-play games and save labelled positions")
+    parser_generate.add_argument('--games', type=int, default=1000, help="Number of games")
+    parser_generate.add_argument('--depth', type=int, default=3, help="Search depth for each move")
+    parser_generate.add_argument('--randomness', type=float, default=0.1, help="Chance of a random move")
+    parser_generate.add_argument('--seed', type=int, default=0, help="Base seed")
+    parser_generate.add_argument('--processes', type=int, help="Worker processes, defaults to the number of cores")
+    parser_generate.add_argument('--output', default='value_data.npz', help="File to write")
+    parser_train = commands.add_parser('train', help="Train the network on generated positions")
+    parser_train.add_argument('--data', default='value_data.npz', help="File written by generate")
+    parser_train.add_argument('--epochs', type=int, default=10, help="Passes over the data")
+    parser_train.add_argument('--output', default='value_net.pt', help="File to save the network to")
+    parser_bench = commands.add_parser('bench', help="Time float and int8 inference")
+    parser_bench.add_argument('--model', default='value_net.pt', help="File written by train")
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        count = generate(args.games, args.output, depth=args.depth, randomness=args.randomness,
+                         seed=args.seed, processes=args.processes)
+        print(f"Wrote {count} positions to {args.output}")
+    elif args.command == 'train':
+        train(args.data, args.output, epochs=args.epochs)
+    else:
+        for name, rate in bench(args.model).items():
+            print(f"{name}: {rate:,} positions/s")
@@ -0,0 +1,57 @@
+"""
+Zobrist keys for hashing checkers positions
+
+A position's hash is the XOR of one random 64-bit key per (piece type, square), so a
+move updates it with a few XORs instead of rehashing the board. The keys come from a
+fixed seed so hashes are the same across runs and processes.
+The side to move is not part of the piece hash, the search XORs SIDE_KEYS[color] in.
+"""
+import random
+
+# Piece types, used to index PIECE_KEYS
+RED_MAN = 0
+RED_KING = 1
+BLACK_MAN = 2
+BLACK_KING = 3
+
+_rng = random.Random(0xC4EC4E55)
+PIECE_KEYS = tuple(tuple(_rng.getrandbits(64) for _ in range(32)) for _ in range(4))
+SIDE_KEYS = {'red': 0, 'black': _rng.getrandbits(64)}
+
+
+def piece_type(color, king):
+    """
+    Get the piece type index for a color and king status
+
+    Args:
+        color, str: 'red' or 'black'
+        king, bool: Whether the piece is a king
+
+    Returns:
+        int: The piece type (RED_MAN, RED_KING, BLACK_MAN or BLACK_KING)
+    """
+    if color == 'red':
+        return RED_KING if king else RED_MAN
+    return BLACK_KING if king else BLACK_MAN
+
+
+def hash_masks(red_men, red_kings, black_men, black_kings):
+    """
+    Hash a position from scratch
+
+    Args:
+        red_men, int: Mask of red men
+        red_kings, int: Mask of red kings
+        black_men, int: Mask of black men
+        black_kings, int: Mask of black kings
+
+    Returns:
+        int: The 64-bit Zobrist hash of the pieces
+    """
+    key = 0
+    for kind, mask in enumerate((red_men, red_kings, black_men, black_kings)):
+        keys = PIECE_KEYS[kind]
+        for square in range(32):
+            if (mask >> square) & 1:
+                key ^= keys[square]
+    return key
@@ -1,7 +1,12 @@
 import sys
+import os
 sys.path.append('..')
 import robot_client as rc
 from checkers_game.game import Game
+from checkers_game.ponder import Ponderer
+from checkers_game.engine_worker import EngineWorker
+from checkers_game.position import Position
+from checkers_game.pdn import PdnRecorder, find_move
 from voice_clone import voice_clone
 from time import sleep
 import pygame
@@ -59,14 +64,17 @@ def adapt_to_robot(message, game):
 
     return message
 
-def robot_turn(game, message, socket, speaking = True, delay = 0):
+def robot_turn(game, message, socket, speaking = True, delay = 0, audio_started = False):
     """
     Robot's turn
+
+    Args:
+        audio_started, bool: Whether the smack talk was already started while the move was searched
     """
     message = adapt_to_robot(message, game)
     print(message)
     #play the audio
-    if speaking:
+    if speaking and not audio_started:
         print(voice_clone.play_premade_audio())
     if socket: 
         # Send the message to the server
@@ -81,97 +89,141 @@ def robot_turn(game, message, socket, speaking = True, delay = 0):
     while speaking and pygame.mixer.music.get_busy():
         pass
 
-def play_with_robot(game, socket, cap, speaking = True, delay = 0, start_color = 'black', voice_controled = False):
+def play_with_robot(game, socket, cap, speaking = True, delay = 0, start_color = 'black', voice_controled = False, difficulty = "Prefer Jumps", move_time_ms = None, engine_worker = None, pdn_path = None, book_path = None):
     """
     Game loop for robot play
+
+    Args:
+        difficulty, str: The AI difficulty the robot plays with
+        move_time_ms, int: Per-move time budget for Minimax in milliseconds, searches to a fixed depth if None
+        engine_worker, EngineWorker: Runs the robot's search in the background so the smack talk starts right away, None to search first
+        pdn_path, str: PDN file to append the game to, None to not record it
+        book_path, str: Opening book for games rebuilt from the camera, the game passed in opens its own
+
+    If the game has a ponderer, the robot's Minimax answers are searched while the user makes their move
+    """
+    recorder = PdnRecorder(pdn_path, start=Position.from_board(game.board, game.turn), headers={'Event': 'Robot game'}) if pdn_path else None
+    if recorder: game.sinks.append(recorder)
+    try:
+        return robot_game_loop(game, socket, cap, speaking, delay, start_color, voice_controled, difficulty, move_time_ms, engine_worker, book_path)
+    finally:
+        if recorder:
+            game.sinks.remove(recorder)
+            recorder.close()
+
+def robot_game_loop(game, socket, cap, speaking, delay, start_color, voice_controled, difficulty, move_time_ms, engine_worker, book_path):
+    """
+    Play turns with the robot until the game ends or the user exits, see play_with_robot
     """
     message = ""
-    while True:
-        if game.turn == start_color:
-            # message = game.ai_turn(difficulty="Random")
-            # message = game.ai_turn(difficulty="Prefer Jumps")
-            # message = game.ai_turn(difficulty="LLM")
-            # message = game.ai_turn(difficulty="Minimax", minimax_depth=3)
-
-            #if the robot is playing
-            user = True
-            if not user:
-                robot_turn(game, message, socket, speaking = speaking)
-            elif voice_controled:
-                print(start_color, "It's your turn")
-                #record audio for 5 seconds
-                audio_file = "move_audio.wav"
-                vc.record_audio(audio_file, 5)
-                #convert speech to text
-                text = vc.speech_to_text(audio_file)
-                if "exit" in text:
-                    return "exit"
-                game.user_turn(text)
-            elif cap:
-                #give the user 5 seconds to make a move
-                time = 10
-                print(start_color, "You have", time ,"seconds to make a move")
-                for i in range(time):
-                    sleep(1)
-                    print(time-i)
-                # Capture the frame
-                frame = tp.capture_frame(cap)
-                piece_locations = tp.cv_process_image(frame)
-                try: 
-                    layout = tp.return_board_layout(piece_locations)
-                except:
-                    print("Error: Could not process image.")
-                    continue
-                #switch turns
-                start_player = game.turn
-                game = Game(board_mode = mode, layout = layout, start_player = start_player)
-                if game.check_winner():
-                    message = "exit"
-                    print("Game over!")
+    first_game = game
+    try:
+        while True:
+            if game.turn == start_color:
+                # message = game.ai_turn(difficulty="Random")
+                # message = game.ai_turn(difficulty="Prefer Jumps")
+                # message = game.ai_turn(difficulty="LLM")
+                # message = game.ai_turn(difficulty="Minimax", time_limit_ms=move_time_ms)
+
+                #search the robot's answers while the user thinks
+                game.start_pondering()
+
+                #if the robot is playing
+                user = True
+                if not user:
+                    robot_turn(game, message, socket, speaking = speaking)
+                elif voice_controled:
+                    print(start_color, "It's your turn")
+                    #record audio for 5 seconds
+                    audio_file = "move_audio.wav"
+                    vc.record_audio(audio_file, 5)
+                    #convert speech to text
+                    text = vc.speech_to_text(audio_file)
+                    if "exit" in text:
+                        return "exit"
+                    game.user_turn(text)
+                elif cap:
+                    #give the user 5 seconds to make a move
+                    time = 10
+                    print(start_color, "You have", time ,"seconds to make a move")
+                    for i in range(time):
+                        sleep(1)
+                        print(time-i)
+                    # Capture the frame
+                    frame = tp.capture_frame(cap)
+                    piece_locations = tp.cv_process_image(frame)
+                    try: 
+                        layout = tp.return_board_layout(piece_locations)
+                    except:
+                        print("Error: Could not process image.")
+                        continue
+                    #play the move the camera sees, so the game record keeps every move
+                    move = find_move(game.board, game.turn, Position.from_layout(layout))
+                    if move is not None:
+                        game.notify('on_turn', game.turn)
+                        game.make_move_sequence(*move)
+                    else:
+                        #not one legal move away, start over from what the camera sees
+                        start_player = game.turn
+                        game.close()
+                        game = Game(board_mode = mode, layout = layout, start_player = start_player, ponderer = game.ponderer, sinks = game.sinks, book_path = book_path)
+                    if game.check_winner():
+                        message = "exit"
+                        print("Game over!")
+                        if socket: client_socket.send(message.encode('utf-8'))
+                        return message
+                else:
+                    user_input = input("Enter your move (e.g., 'a3 b4'): ")
+                    if user_input == "exit":
+                        return "exit"
+                    game.user_turn(user_input)
+            else:
+                # message = game.ai_turn(difficulty="Random")
+                audio_started = False
+                if engine_worker:
+                    #search in the background and start talking while it finishes
+                    future = engine_worker.submit(game, difficulty=difficulty, time_limit_ms=move_time_ms)
+                    if speaking:
+                        print(voice_clone.play_premade_audio())
+                        audio_started = True
+                    message = future.result()
+                else:
+                    message = game.ai_turn(difficulty=difficulty, time_limit_ms=move_time_ms)
+                # user_input = input("Enter your move (e.g., 'a3 b4'): ")
+                # if user_input == "exit":
+                #     return "exit"
+                # game.user_turn(user_input)
+
+                #if the robot is playing
+                user = False
+                if not user:
+                    robot_turn(game, message, socket, speaking = speaking, audio_started = audio_started)
+
+            if game.check_winner():
+                message = "exit"
+                print("Game over!")
+                if socket: client_socket.send(message.encode('utf-8'))
+                return message
+
+            game.switch_turn()
+            game.board.draw_board()
+            sleep(delay)
+
+            #see if user wants to exit
+            # exit_message = input("Do you want to continue? (y/n): ")
+            exit_message = "y"
+            if exit_message != "n":
+                if exit_message == "away":
+                    message = "away"
                     if socket: client_socket.send(message.encode('utf-8'))
-                    return message
+                continue
             else:
-                user_input = input("Enter your move (e.g., 'a3 b4'): ")
-                if user_input == "exit":
-                    return "exit"
-                game.user_turn(user_input)
-        else:
-            # message = game.ai_turn(difficulty="Random")
-            message = game.ai_turn(difficulty="Prefer Jumps")
-            # message = game.ai_turn(difficulty="LLM")
-            # message = game.ai_turn(difficulty="Minimax", minimax_depth=3)
-            # user_input = input("Enter your move (e.g., 'a3 b4'): ")
-            # if user_input == "exit":
-            #     return "exit"
-            # game.user_turn(user_input)
-
-            #if the robot is playing
-            user = False
-            if not user:
-                robot_turn(game, message, socket, speaking = speaking)
-
-        if game.check_winner():
-            message = "exit"
-            print("Game over!")
-            if socket: client_socket.send(message.encode('utf-8'))
-            return message
-
-        game.switch_turn()
-        game.board.draw_board()
-        sleep(delay)
-
-        #see if user wants to exit
-        # exit_message = input("Do you want to continue? (y/n): ")
-        exit_message = "y"
-        if exit_message != "n":
-            if exit_message == "away":
-                message = "away"
+                message = "exit"
                 if socket: client_socket.send(message.encode('utf-8'))
-            continue
-        else:
-            message = "exit"
-            if socket: client_socket.send(message.encode('utf-8'))
-            return message
+                return message
+    finally:
+        #games rebuilt from the camera are closed here, the caller closes the one it passed in
+        if game is not first_game: game.close()
 
 if __name__ == "__main__":
     # client_socket = rc.connect_to_robot()
@@ -182,6 +234,11 @@ if __name__ == "__main__":
 
     voice_controled = True
     user_player = 'black'
+    difficulty = "Prefer Jumps" # 'Random', 'Prefer Jumps', 'Minimax', 'MCTS' or 'LLM'
+    move_time_ms = 2000 # robot's thinking time per move for Minimax and MCTS
+    ponder = difficulty == "Minimax" # search on the user's time, only Minimax can use it
+    pdn_path = "robot_games.pdn" # archive of the robot's games, None to not record them
+    book_path = "book.bin" if os.path.exists("book.bin") else None # opening book built by opening_book.py, used by Minimax
 
     #start the game
     if cap:
@@ -192,11 +249,13 @@ if __name__ == "__main__":
     else:
         mode = 'classic'
         layout = None
-    game = Game(board_mode = mode, layout = layout, start_player = user_player)
+    ponderer = Ponderer() if ponder else None
+    engine_worker = EngineWorker()
+    game = Game(board_mode = mode, layout = layout, start_player = user_player, ponderer = ponderer, book_path = book_path)
     game.board.draw_board()
 
     try:
-        if play_with_robot(game, client_socket, cap, speaking=True, delay=0.5, start_color=user_player, voice_controled=voice_controled) == "exit":
+        if play_with_robot(game, client_socket, cap, speaking=True, delay=0.5, start_color=user_player, voice_controled=voice_controled, difficulty=difficulty, move_time_ms=move_time_ms, engine_worker=engine_worker, pdn_path=pdn_path, book_path=book_path) == "exit":
             if client_socket: client_socket.send("exit".encode('utf-8'))
             print("Exiting game")
             if client_socket: client_socket.close()
@@ -210,3 +269,8 @@ if __name__ == "__main__":
         if cap: 
             cap.release()
             cv2.destroyAllWindows()
+
+    finally:
+        engine_worker.shutdown()
+        game.close()
+        if ponderer: ponderer.close()